@@ -1,22 +1,45 @@
 import os
 from flask import jsonify, Flask, render_template
-from flask_sqlalchemy import SQLAlchemy
 from flask_restplus import Resource, apidoc
 
 from app.api_flask import ApiFlask
+from app.utils.database import Database
 from app.utils.decorators import parse_query_parameters
 
-db = SQLAlchemy()
+db = Database()
 
 
 def create_app(env=None):
     from app.config import get_config
     from app.routes import register_routes
     from app.errors import register_error_handlers
+    from app.utils.authorize import init_authorize
+    from app.utils.admission import init_admission
+    from app.utils.compression import init_compression
+    from app.utils.database import init_replica_sync
+    from app.utils.health import init_health
+    from app.utils.metrics import init_metrics
+    from app.utils.profiling import init_profiling
+    from app.utils.startup import init_startup_profile
+    from app.utils.swagger import init_swagger_export
     # Creamos la aplicación de Flask
     app = Flask(__name__, template_folder='./templates')
     config = get_config(env)
     app.config.from_object(config)
+    # Parseamos la llave pública una única vez
+    init_authorize(app)
+    # Configuramos la compresión de las respuestas
+    init_compression(app)
+    # Medimos las peticiones y las servimos en `/metrics`
+    init_metrics(app)
+    # Perfilamos las peticiones que lo piden con `X-Profile`
+    init_profiling(app)
+    # Limitamos las peticiones concurrentes de cada proceso
+    init_admission(app)
+    # Registramos el comando `flask startup-profile`
+    init_startup_profile(app)
+    # Servimos las sondas `/livez` y `/readyz`
+    init_health(app)
     # Creamos el objeto `api`
     api_title = os.environ.get('APP_TITLE', config.TITLE)
     api_version = os.environ.get('APP_VERSION', config.VERSION)
@@ -52,10 +75,14 @@ def create_app(env=None):
     )
     # Registramos las rutas
     register_routes(api, app)
+    # Registramos el comando `flask export-swagger`
+    init_swagger_export(app, api)
     # Registramos loa error_handlers
     register_error_handlers(app)
     # Inicializamos la base de datos
     db.init_app(app)
+    # Registramos el comando `flask replica-sync`
+    init_replica_sync(app, db)
    
     # Configuración de página de documentación
     @api.documentation
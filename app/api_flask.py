@@ -1,10 +1,101 @@
+import json
+
+from flask import Response, current_app, request
 from flask_restplus import Api
 
-from app.api_response import ApiResponse
+from app.api_response import ApiResponse, make_etag
+from app.utils.compression import gzip_bytes
+
+
+class StaticDocument(object):
+    """
+    Document served with the same bytes on every request, kept along with
+    its gzip compressed version and its `ETag`.
+
+    Args:
+        body (bytes): Content of the document.
+        content_type (str): `Content-Type` of the document.
+    """
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.gzipped = gzip_bytes(body, 9)
+        self.etag = make_etag(body)
+
+    def to_response(self, max_age):
+        """Builds the response of the current request, compressed if the
+        client accepts `gzip`, or a `304 Not Modified` if it has the same
+        version.
+
+        Args:
+            max_age (int): `Cache-Control` max age in seconds.
+        """
+        if request.accept_encodings['gzip']:
+            response = Response(self.gzipped, content_type=self.content_type)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(self.etag + '-gzip')
+        else:
+            response = Response(self.body, content_type=self.content_type)
+            response.set_etag(self.etag)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(request)
 
 
 class ApiFlask(Api):
+    """
+    `flask_restplus.Api` that renders :class:`ApiResponse` values, and serves
+    the Swagger spec and the documentation page from per process caches.
+
+    Both documents are built on their first request, since they need a
+    request context to build their urls, and then served with an `ETag`, a
+    long `Cache-Control` and a gzip compressed version.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Rendered documents. Concurrent first requests may render a
+        # document twice, but they produce the same bytes.
+        self._documents = {}
+        super().__init__(*args, **kwargs)
+
     def make_response(self, rv, *args, **kwargs):
         if isinstance(rv, ApiResponse):
             return rv.to_response()
         return Api.make_response(self, rv, *args, **kwargs)
+
+    def _register_specs(self, app_or_blueprint):
+        # Replaces the `SwaggerView` resource, which encodes the spec again
+        # on every request.
+        if self._add_specs:
+            app_or_blueprint.add_url_rule('/swagger.json', 'specs', self.render_specs)
+            self.endpoints.add('specs')
+
+    def get_specs_document(self):
+        """Returns the Swagger spec as a :class:`StaticDocument`, or `None` if
+        it could not be generated."""
+        document = self._documents.get('specs')
+        if document is None:
+            schema = self.__schema__
+            if 'error' in schema:
+                return None
+            # Sorted keys give every process the same bytes, and `ETag`.
+            body = json.dumps(schema, separators=(',', ':'), sort_keys=True).encode('utf-8')
+            document = self._documents['specs'] = StaticDocument(body, 'application/json')
+        return document
+
+    def render_specs(self):
+        document = self.get_specs_document()
+        if document is None:
+            return Response(json.dumps(self.__schema__), status=500, content_type='application/json')
+        return document.to_response(current_app.config['DOCS_MAX_AGE'])
+
+    def render_doc(self):
+        document = self._documents.get('doc')
+        if document is None:
+            body = Api.render_doc(self)
+            if not isinstance(body, str):
+                return body
+            document = self._documents['doc'] = StaticDocument(body.encode('utf-8'), 'text/html; charset=utf-8')
+        return document.to_response(current_app.config['DOCS_MAX_AGE'])
@@ -1,3 +1,6 @@
+import gzip
+import json
+
 from flask import Response
 
 from app.api_flask import ApiFlask
@@ -13,3 +16,39 @@ def test_api_flask_make_response(api, app):
         response = api.make_response(api_response)
         expected = isinstance(response, Response)
         assert expected == True
+
+def test_swagger_spec_is_cached(app):
+    client = app.test_client()
+    response = client.get('/swagger.json')
+    assert response.status_code == 200
+    assert 'paths' in json.loads(response.data)
+    assert response.headers['Cache-Control'] == 'public, max-age=3600'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    etag = response.headers['ETag']
+    assert client.get('/swagger.json').data == response.data
+    assert client.get('/swagger.json', headers={'If-None-Match': etag}).status_code == 304
+
+def test_swagger_spec_gzip(app):
+    client = app.test_client()
+    plain = client.get('/swagger.json')
+    response = client.get('/swagger.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] != plain.headers['ETag']
+    assert gzip.decompress(response.data) == plain.data
+
+def test_docs_page_is_cached(app):
+    client = app.test_client()
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'redoc' in response.data
+    assert client.get('/', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_export_swagger(app, tmpdir):
+    output = str(tmpdir.join('static', 'swagger.json'))
+    result = app.test_cli_runner().invoke(args=['export-swagger', output])
+    assert result.exit_code == 0, result.output
+    with open(output, 'rb') as file:
+        body = file.read()
+    with open(output + '.gz', 'rb') as file:
+        assert gzip.decompress(file.read()) == body
+    assert app.test_client().get('/swagger.json').data == body
@@ -1,33 +1,182 @@
-from flask import json, Response, request
+import hashlib
+from collections.abc import Iterator
+from urllib.parse import urlencode
+from flask import current_app, g, json, Response, request, stream_with_context
 from marshmallow import fields, Schema
 from flask_restplus import fields as f
 
+from app.utils.compression import get_compressor
+from app.utils.metrics import add_serialization_time, start_serialization
 from app.utils.query import Query
 
+
+def make_etag(*values):
+    """Builds an `ETag` value from the `repr` of the given values."""
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
 class ApiResponse(object):
-    def __init__(self, value, status=200):
+    def __init__(self, value, status=200, paginate=True):
         self.value = value
         self.status = status
+        self.paginate = paginate
+
+    @staticmethod
+    def not_modified():
+        """
+        Returns `True` if the `If-None-Match` or `If-Modified-Since` headers of
+        the request match the `g.etag` and `g.last_modified` validators. When
+        `If-None-Match` is sent, `If-Modified-Since` is ignored.
+        """
+        etag = g.get('etag', None)
+        if request.if_none_match:
+            return etag is not None and request.if_none_match.contains_weak(etag)
+        last_modified = g.get('last_modified', None)
+        if request.if_modified_since and last_modified is not None:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def add_validators(self, response):
+        """Adds the `ETag` and `Last-Modified` headers stored on `g`."""
+        if g.get('etag', None) is not None:
+            response.set_etag(g.etag)
+        if g.get('last_modified', None) is not None:
+            response.last_modified = g.last_modified
+        return response
 
     def to_response(self):
+        if self.status == 304:
+            return self.add_validators(Response(status=304))
         if self.value == None:
             return Response('', status=self.status, mimetype='application/json')
-        if self.status == 400:
-            return Response(json.dumps(self.value), status=self.status,
-                    mimetype='application/json')
+        if self.status >= 400:
+            return get_compressor().compress_response(Response(json.dumps(self.value),
+                status=self.status, mimetype='application/json'))
+        if isinstance(self.value, Iterator):
+            return self.to_streamed_response()
         data = {}
         if isinstance(self.value, dict):
             data['item'] = self.value
         if isinstance(self.value, list):
             data['items'] = self.value
             data['count'] = len(self.value)
+            if self.paginate:
+                self.add_pagination(data)
+        start = start_serialization()
+        body = json.dumps(data)
+        add_serialization_time(start)
+        response = Response(body, status=self.status, mimetype='application/json')
+        if self.status == 200:
+            self.add_validators(response)
+        return get_compressor().compress_response(response)
+
+    def to_streamed_response(self):
+        """
+        Builds a response that writes the list of items as they come out of
+        the `value` iterator, so the memory used doesn't depend on the amount
+        of items. The envelope is the same as the one of a list response, with
+        the `items` key first since the rest of the keys are only known once
+        every item was sent.
+
+        Streamed bodies are always compressed when the client accepts it,
+        since their size is not known in advance.
+        """
+        buffer_size = current_app.config['STREAM_BUFFER_SIZE']
+
+        def generate():
+            yield '{"items": ['
+            count = 0
+            buffer = []
+            for item in self.value:
+                buffer.append(json.dumps(item))
+                count += 1
+                if len(buffer) == buffer_size:
+                    yield ('' if count == len(buffer) else ', ') + ', '.join(buffer)
+                    buffer = []
+            if buffer:
+                yield ('' if count == len(buffer) else ', ') + ', '.join(buffer)
+            data = dict(count=count)
             self.add_pagination(data)
-        return Response(json.dumps(data), status=self.status, mimetype='application/json')
+            yield '], ' + json.dumps(data)[1:]
+        compressor = get_compressor()
+        if not compressor.accepts():
+            response = Response(stream_with_context(generate()), status=self.status,
+                mimetype='application/json')
+        else:
+            response = Response(compressor.compress_stream(stream_with_context(generate())),
+                status=self.status, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        if compressor.min_size is not None:
+            response.vary.add('Accept-Encoding')
+        return response
 
     def add_pagination(self, data):
-        page = int(Query.get_param('page'))
-        per_page = Query.get_param('per_page')
+        if g.get('missing', None) is not None:
+            # Items requested by `ids` aren't paginated
+            data["missing"] = g.missing
+            return
+        if g.get('total', None) is not None:
+            data["total"] = g.total
+        pagination = Query.get_param('pagination')
+        if pagination == 'cursor':
+            self.add_cursor_pagination(data)
+        elif pagination == 'offset':
+            self.add_offset_pagination(data)
+        else:
+            self.add_page_pagination(data)
+        self.add_link_params(data)
+
+    def add_link_params(self, data):
+        """Keeps the `total` and `stream` options, the ordering, the `fields`
+        and the filters on the pagination links. Cursors already carry their
+        ordering."""
+        params = ''.join(f'&{name}=true' for name, param in (('total', 'want_total'), ('stream', 'stream'))
+            if Query.get_bool_param(param))
+        if Query.get_param('pagination') != 'cursor':
+            order = [(name, Query.get_param(name)) for name in ('order_by', 'order_dir')
+                if Query.get_param(name) is not None]
+            if order:
+                params += '&' + urlencode(order)
+        fields = Query.get_list_param('fields')
+        if fields:
+            params += '&' + urlencode(dict(fields=','.join(fields)))
+        filters = g.get('filters', None)
+        if filters:
+            params += '&' + urlencode(sorted(filters.items()))
+        if params:
+            for key in ('prev', 'next', 'current'):
+                if key in data:
+                    data[key] += params
+
+    def add_page_pagination(self, data):
+        page = Query.get_int_param('page')
+        per_page = Query.get_per_page(Query.get_bool_param('stream'))
         if page > 1:
             data["prev"] = request.base_url + f'?page={page - 1}&per_page={per_page}'
         data["next"] = request.base_url + f'?page={page + 1}&per_page={per_page}'
         data["current"] = request.base_url + f'?page={page}&per_page={per_page}'
+
+    def add_offset_pagination(self, data):
+        page = Query.get_int_param('page')
+        per_page = Query.get_per_page(Query.get_bool_param('stream'))
+        if page > 1:
+            data["prev"] = request.base_url + f'?pagination=offset&page={page - 1}&per_page={per_page}'
+        if g.get('has_next', False):
+            data["next"] = request.base_url + f'?pagination=offset&page={page + 1}&per_page={per_page}'
+        data["current"] = request.base_url + f'?pagination=offset&page={page}&per_page={per_page}'
+
+    def add_cursor_pagination(self, data):
+        per_page = Query.get_per_page(Query.get_bool_param('stream'))
+        cursor = Query.get_param('cursor')
+        next_cursor = g.get('next_cursor', None)
+        prev_cursor = g.get('prev_cursor', None)
+        if prev_cursor is not None:
+            data["prev"] = request.base_url + f'?cursor={prev_cursor}&per_page={per_page}'
+        if next_cursor is not None:
+            data["next"] = request.base_url + f'?cursor={next_cursor}&per_page={per_page}'
+        if cursor is not None:
+            data["current"] = request.base_url + f'?cursor={cursor}&per_page={per_page}'
+        else:
+            data["current"] = request.base_url + f'?pagination=cursor&per_page={per_page}'
+            for name in ('order_by', 'order_dir'):
+                if Query.get_param(name) is not None:
+                    data["current"] += f'&{name}={Query.get_param(name)}'
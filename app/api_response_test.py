@@ -1,7 +1,11 @@
-from flask import Response
+import gzip
+from datetime import datetime
+from flask import Response, g, json, request
+import pytest
 
 from app.api_response import ApiResponse
 from app.test.fixtures import app
+from app.utils.query import Query
 
 def test_api_response_to_response_returns_a_response_object(app):
     with app.test_request_context('/healthz'):
@@ -38,5 +42,171 @@ def test_api_response_to_response_multiple_value_body(app):
         expected = ApiResponse(value=[{'ok': True}, {'ok': False}]).to_response()
         assert expected.data == b'{"count": 2, "current": "http://localhost/healthz?page=1&per_page=3", "items": [{"ok": true}, {"ok": false}], "next": "http://localhost/healthz?page=2&per_page=3"}'
 
+def test_api_response_to_response_without_pagination(app):
+    with app.test_request_context('/healthz'):
+        expected = ApiResponse(value=[{'ok': True}], paginate=False).to_response()
+        assert expected.data == b'{"count": 1, "items": [{"ok": true}]}'
+
+def test_api_response_to_response_cursor_pagination(app):
+    with app.test_request_context('/healthz?pagination=cursor&order_by=name'):
+        Query.parse_request(request)
+        g.next_cursor = 'NEXT'
+        g.prev_cursor = None
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['next'] == 'http://localhost/healthz?cursor=NEXT&per_page=3'
+        assert expected['current'] == 'http://localhost/healthz?pagination=cursor&per_page=3&order_by=name'
+        assert 'prev' not in expected
+
+def test_api_response_to_response_cursor_pagination_last_page(app):
+    with app.test_request_context('/healthz?cursor=CURRENT'):
+        Query.parse_request(request)
+        g.next_cursor = None
+        g.prev_cursor = 'PREV'
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['prev'] == 'http://localhost/healthz?cursor=PREV&per_page=3'
+        assert expected['current'] == 'http://localhost/healthz?cursor=CURRENT&per_page=3'
+        assert 'next' not in expected
+
+def test_api_response_links_keep_fields(app):
+    with app.test_request_context('/healthz?pagination=cursor&fields=name,purpose'):
+        Query.parse_request(request)
+        g.next_cursor = 'NEXT'
+        g.prev_cursor = None
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['next'] == 'http://localhost/healthz?cursor=NEXT&per_page=3&fields=name%2Cpurpose'
+
+def test_api_response_links_validate_per_page(app):
+    with app.test_request_context('/healthz?per_page=abc'):
+        Query.parse_request(request)
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['next'] == 'http://localhost/healthz?page=2&per_page=3'
+    with app.test_request_context('/healthz?per_page=1000'):
+        Query.parse_request(request)
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['next'] == f'http://localhost/healthz?page=2&per_page={app.config["MAX_PER_PAGE"]}'
+
+def test_api_response_to_response_offset_pagination(app):
+    with app.test_request_context('/healthz?pagination=offset&page=2'):
+        Query.parse_request(request)
+        g.has_next = False
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['prev'] == 'http://localhost/healthz?pagination=offset&page=1&per_page=3'
+        assert expected['current'] == 'http://localhost/healthz?pagination=offset&page=2&per_page=3'
+        assert 'next' not in expected
+
+def test_api_response_to_response_total(app):
+    with app.test_request_context('/healthz?total=true'):
+        Query.parse_request(request)
+        g.total = 42
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert expected['total'] == 42
+        assert expected['count'] == 1
+
+def test_api_response_to_response_without_total(app):
+    with app.test_request_context('/healthz?total=false'):
+        Query.parse_request(request)
+        assert g.want_total is False
+        expected = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert 'total' not in expected
+        assert 'total' not in expected['next']
+
+def test_api_response_to_response_streams_iterators(app):
+    app.config['STREAM_BUFFER_SIZE'] = 2
+    with app.test_request_context('/healthz?stream=true&pagination=offset'):
+        Query.parse_request(request)
+        g.has_next = True
+        response = ApiResponse(value=iter([{'ok': True}, {'ok': False}, {'ok': None}])).to_response()
+        assert response.is_streamed
+        body = b''.join(response.iter_encoded())
+        assert body.startswith(b'{"items": [{"ok": true}, {"ok": false}, {"ok": null}], "count": 3')
+        expected = json.loads(body)
+        assert expected['next'] == 'http://localhost/healthz?pagination=offset&page=2&per_page=3&stream=true'
+
+def test_api_response_to_response_streams_empty_iterators(app):
+    with app.test_request_context('/healthz?stream=true'):
+        Query.parse_request(request)
+        response = ApiResponse(value=iter([])).to_response()
+        expected = json.loads(b''.join(response.iter_encoded()))
+        assert expected['items'] == []
+        assert expected['count'] == 0
+
+def test_api_response_to_response_adds_validators(app):
+    with app.test_request_context('/healthz'):
+        g.etag = 'abc'
+        g.last_modified = datetime(2019, 8, 9, 10, 0, 0)
+        response = ApiResponse(value={'ok': True}).to_response()
+        assert response.headers['ETag'] == '"abc"'
+        assert response.headers['Last-Modified'] == 'Fri, 09 Aug 2019 10:00:00 GMT'
+
+def test_api_response_to_response_not_modified(app):
+    with app.test_request_context('/healthz'):
+        g.etag = 'abc'
+        response = ApiResponse(None, 304).to_response()
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == '"abc"'
+
+def test_api_response_not_modified_if_none_match(app):
+    with app.test_request_context('/healthz', headers={'If-None-Match': '"abc"'}):
+        g.etag = 'abc'
+        assert ApiResponse.not_modified() is True
+        g.etag = 'def'
+        assert ApiResponse.not_modified() is False
+
+def test_api_response_not_modified_if_modified_since(app):
+    headers = {'If-Modified-Since': 'Fri, 09 Aug 2019 10:00:00 GMT'}
+    with app.test_request_context('/healthz', headers=headers):
+        g.last_modified = datetime(2019, 8, 9, 10, 0, 0, 500)
+        assert ApiResponse.not_modified() is True
+        g.last_modified = datetime(2019, 8, 9, 10, 0, 1)
+        assert ApiResponse.not_modified() is False
+
+def test_api_response_not_modified_without_headers(app):
+    with app.test_request_context('/healthz'):
+        g.etag = 'abc'
+        assert ApiResponse.not_modified() is False
+
+def test_api_response_to_response_missing_ids(app):
+    with app.test_request_context('/healthz'):
+        g.missing = [3]
+        expected = ApiResponse(value=[{'ok': True}]).to_response()
+        assert expected.data == b'{"count": 1, "items": [{"ok": true}], "missing": [3]}'
+
+def test_api_response_to_response_keeps_filters_on_links(app):
+    with app.test_request_context('/healthz'):
+        g.filters = {'name__eq': 'Yin Yang'}
+        data = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert data['next'] == 'http://localhost/healthz?page=2&per_page=3&name__eq=Yin+Yang'
+
+@pytest.mark.parametrize('pagination', ['', 'pagination=offset&'])
+def test_api_response_to_response_keeps_order_on_links(app, pagination):
+    with app.test_request_context(f'/healthz?{pagination}order_by=name,id&order_dir=desc'):
+        Query.parse_request(request)
+        g.has_next = True
+        g.filters = {'name__eq': 'Yin Yang'}
+        data = json.loads(ApiResponse(value=[{'ok': True}]).to_response().data)
+        assert data['next'] == f'http://localhost/healthz?{pagination}page=2&per_page=3' \
+            '&order_by=name%2Cid&order_dir=desc&name__eq=Yin+Yang'
+
+def test_api_response_to_response_compresses_big_bodies(app):
+    items = [{'name': f'Entity {index}'} for index in range(200)]
+    with app.test_request_context('/healthz', headers={'Accept-Encoding': 'gzip'}):
+        g.etag = 'abc'
+        response = ApiResponse(value=items, paginate=False).to_response()
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['ETag'] == 'W/"abc"'
+        assert json.loads(gzip.decompress(response.data))['items'] == items
 
+def test_api_response_to_response_skips_small_bodies(app):
+    with app.test_request_context('/healthz', headers={'Accept-Encoding': 'gzip'}):
+        response = ApiResponse(value={'ok': True}).to_response()
+        assert 'Content-Encoding' not in response.headers
 
+def test_api_response_to_response_compresses_streams(app):
+    with app.test_request_context('/healthz?stream=true', headers={'Accept-Encoding': 'gzip'}):
+        Query.parse_request(request)
+        response = ApiResponse(value=iter([{'ok': True}, {'ok': False}])).to_response()
+        assert response.headers['Content-Encoding'] == 'gzip'
+        expected = json.loads(gzip.decompress(b''.join(response.iter_encoded())))
+        assert expected['items'] == [{'ok': True}, {'ok': False}]
@@ -15,11 +15,71 @@ class BaseConfig:
     DEBUG = False
     TESTING = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Options of `sqlalchemy.create_engine`, e.g. `pool_size`, `max_overflow`,
+    # `pool_recycle` or `pool_pre_ping`
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # PRAGMAs run on each new SQLite connection, in order
+    SQLITE_PRAGMAS = {}
+    # Binds of `SQLALCHEMY_BINDS` that serve the reads of `GET` requests
+    READ_REPLICAS = []
+    # Seconds the reads of a client go to the primary after it writes
+    READ_YOUR_WRITES_WINDOW = 5
     PAGE = 1
     PER_PAGE = 20
     MAX_PER_PAGE = 100
+    PAGINATION = 'page'
+    TOTAL_COUNT_TTL = 60
+    STREAM_MAX_PER_PAGE = 10000
+    STREAM_CHUNK_SIZE = 500
+    STREAM_BUFFER_SIZE = 100
+    BULK_CHUNK_SIZE = 1000
+    BULK_MAX_ITEMS = 10000
     AUDIENCE = os.environ.get('AUDIENCE', 'api')
     PUBLIC_KEY = PUBLIC_KEY
+    AUTH_CACHE_SIZE = 1024
+    AUTH_CACHE_TTL = 300
+    AUTH_NEGATIVE_CACHE_TTL = 5
+    DOCS_MAX_AGE = 3600
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_CACHE_SIZE = 256
+    # Directory shared by the worker processes to sum their metrics. `None`
+    # serves the metrics of the process that answers `/metrics`
+    METRICS_DIR = None
+    METRICS_FLUSH_INTERVAL = 1.0
+    # Profiles every request, logging its SQL statements and adding a
+    # `Server-Timing` header
+    PROFILE_REQUESTS = False
+    # Header that profiles a single request. Its value must be the
+    # `PROFILE_TOKEN`, or anything in debug mode
+    PROFILE_HEADER = 'X-Profile'
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+    # Statements run more times by a request are logged as a warning
+    PROFILE_REPEATED_STATEMENTS = 5
+    # Per process limits of the concurrent reads and writes. Requests over
+    # the limits wait on a bounded queue, and are answered with a `503` when
+    # it is full or they wait more than `ADMISSION_QUEUE_TIMEOUT` seconds
+    ADMISSION_CONTROL = False
+    ADMISSION_READ_LIMIT = 3
+    ADMISSION_WRITE_LIMIT = 1
+    ADMISSION_QUEUE_SIZE = 4
+    ADMISSION_QUEUE_TIMEOUT = 1.0
+    # Requests that waited longer in front of the app, per `X-Request-Start`
+    ADMISSION_MAX_QUEUE_TIME = 5.0
+    ADMISSION_RETRY_AFTER = 1
+    ADMISSION_EXEMPT = ['/healthz', '/livez', '/readyz', '/metrics']
+    # Seconds a page of a `list_cache` is served. Each process only sees its
+    # own writes, so this bounds how stale pages are after the writes of the
+    # other workers
+    LIST_CACHE_MAX_AGE = 5
+    # Seconds a request waits for the identical read of another one before
+    # making its own, below `ADMISSION_QUEUE_TIMEOUT`
+    SINGLE_FLIGHT_TIMEOUT = 0.5
+    # Seconds the result of the `/readyz` checks is kept
+    READINESS_TTL = 5
+    # Migrations whose `head` the database must be at to be ready. `None`
+    # skips the check
+    ALEMBIC_CONFIG = os.path.join(os.path.dirname(basedir), 'alembic.ini')
    
 class DevelopmentConfig(BaseConfig):
     CONFIG_NAME = 'dev'
@@ -33,10 +93,31 @@ class TestingConfig(BaseConfig):
     TESTING = True
     PER_PAGE = 3
     SQLALCHEMY_DATABASE_URI = 'sqlite:///{0}/db/app-test.db'.format(basedir)
+    # The test databases are created with `db.create_all`
+    ALEMBIC_CONFIG = None
     
 class ProductionConfig(BaseConfig):
     CONFIG_NAME = 'prod'
     SQLALCHEMY_DATABASE_URI = "sqlite:///{0}/db/app-prod.db".format(basedir)
+    # One connection for each `uwsgi` thread, checked before it is used
+    SQLALCHEMY_ENGINE_OPTIONS = dict(
+        pool_size=2,
+        max_overflow=2,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+    )
+    # With WAL readers don't block the writer, nor the writer the readers.
+    # `busy_timeout` goes first, so the other PRAGMAs wait for locks too.
+    SQLITE_PRAGMAS = dict(
+        busy_timeout=5000,
+        journal_mode='WAL',
+        synchronous='NORMAL',
+        mmap_size=268435456,
+        cache_size=-65536,
+    )
+    METRICS_DIR = os.environ.get('METRICS_DIR', '/tmp/flask-metrics')
+    # Sized for the 8 `uwsgi` threads, and the 4 connections of the pool
+    ADMISSION_CONTROL = True
 
 EXPORT_CONFIGS = [
   DevelopmentConfig,
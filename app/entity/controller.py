@@ -3,7 +3,7 @@ from flask_restplus import Namespace, Resource, fields
 from flask.wrappers import Response
 
 from app.api_response import ApiResponse
-from app.utils.decorators import parse_query_parameters
+from app.utils.decorators import conditional, parse_query_parameters
 from app.utils.query import Query
 from .service import EntityService
 from .model import Entity
@@ -46,14 +46,16 @@ class EntityResource(Resource):
     """
     
     @api.response(200, 'Entity List', interfaces.many_response_model)
-    @api.doc(params=Query.index_query_params)
+    @api.doc(params={**Query.index_query_params, **interfaces.filter_params})
     @parse_query_parameters
     def get(self) -> ApiResponse:
         """
         Returns the list of entities
         """
-        entities = EntityService.get_all()
-        return ApiResponse(interfaces.many_schema.dump(entities).data)
+        entities = EntityService.get_serialized_all(interfaces)
+        if ApiResponse.not_modified():
+            return ApiResponse(None, 304)
+        return ApiResponse(entities)
 
     @api.expect(interfaces.create_model)
     @api.response(200, 'New Entity', interfaces.single_response_model)
@@ -77,7 +79,61 @@ class EntityResource(Resource):
         body = interfaces.single_schema.load(json_data).data
         print(json_data)
         entity = EntityService.create(body)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(interfaces.dump(entity))
+
+
+@api.route("/bulk")
+@api.response(400, 'Bad Request', interfaces.error_response_model)
+@api.doc(responses={
+    401: 'Unauthorized',
+    403: 'Forbidden',
+    500: 'Internal server error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+})
+class EntityBulkResource(Resource):
+    """
+    Entity bulk operations
+    """
+
+    @api.expect([interfaces.create_model])
+    @api.doc(params={'return_ids': {
+        'description': 'Set to `true` to include the `id` of the new entities. Rows are then inserted one at a time.'
+    }})
+    @api.response(200, 'Result of each Entity', interfaces.bulk_response_model)
+    def post(self) -> ApiResponse:
+        """
+        Creates many Entity in a single transaction
+
+        Each item is validated on its own. The invalid ones are reported with a
+        `400` status and the rest are created.
+        """
+        items, errors = interfaces.load_many(request.get_json())
+        return_ids = request.args.get('return_ids', '').lower() in ('true', '1', 'yes')
+        results = EntityService.bulk_create(items, return_ids=return_ids) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
+
+    @api.expect([interfaces.bulk_update_model])
+    @api.response(200, 'Result of each Entity', interfaces.bulk_response_model)
+    def patch(self) -> ApiResponse:
+        """
+        Updates many Entity in a single transaction
+        """
+        items, errors = interfaces.load_many(request.get_json(), with_id=True)
+        results = EntityService.bulk_update(items) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
+
+    @api.expect([fields.Integer])
+    @api.response(200, 'Result of each Entity', interfaces.bulk_response_model)
+    def delete(self) -> ApiResponse:
+        """
+        Deletes many Entity in a single transaction
+
+        The body is the list of ids to delete.
+        """
+        items, errors = interfaces.load_ids(request.get_json())
+        results = EntityService.bulk_delete(items) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
 
 
 @api.route("/<int:id>")
@@ -92,12 +148,14 @@ class EntityResource(Resource):
 })
 class EntityIdResource(Resource):
     @api.response(200, 'Wanted entity', interfaces.single_response_model)
+    @api.doc(params={'fields': Query.index_query_params['fields']})
+    @parse_query_parameters
+    @conditional(EntityService)
     def get(self, id: int) -> Entity:
         """
         Get a single Entity
         """
-        entity = EntityService.get_by_id(id)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(EntityService.get_serialized_by_id(id, interfaces))
 
     @api.response(204, 'No Content')
     def delete(self, id: int) -> Response:
@@ -115,4 +173,4 @@ class EntityIdResource(Resource):
         """Update a single Entity"""
         body = interfaces.single_schema.load(request.json).data
         entity = EntityService.update(id, body)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(interfaces.dump(entity))
@@ -71,6 +71,7 @@ def fake_update(id: int, changes) -> Entity:
 
 
 class TestEntityIdResource:
+    @patch.object(EntityService, "get_validators", lambda id: (None, None))
     @patch.object(EntityService, "get_by_id", lambda id: make_entity(id=id))
     def test_get(self, client: FlaskClient):  # noqa
         with client:
@@ -80,6 +81,31 @@ class TestEntityIdResource:
             print(f"expected = ", expected)
             assert result == expected
 
+    @patch.object(EntityService, "get_validators", lambda id: (None, None))
+    @patch.object(EntityService, "get_by_id", lambda id: make_entity(id=id))
+    def test_get_with_fields(self, client: FlaskClient):  # noqa
+        with client:
+            result = client.get(f"/api/{BASE_ROUTE}/123?fields=id,camelCase").get_json()
+            assert result == dict(item=dict(id=123, camelCase='Something'))
+
+    @patch.object(EntityService, "get_validators", lambda id: (None, None))
+    @patch.object(EntityService, "get_by_id", lambda id: make_entity(id=id))
+    def test_get_with_unknown_field(self, client: FlaskClient):  # noqa
+        with client:
+            result = client.get(f"/api/{BASE_ROUTE}/123?fields=unknown")
+            assert result.status_code == 400
+
+    @patch.object(EntityService, "get_validators", lambda id: ('abc', None))
+    @patch.object(EntityService, "get_by_id", lambda id: make_entity(id=id))
+    def test_get_not_modified(self, client: FlaskClient):  # noqa
+        with client:
+            result = client.get(f"/api/{BASE_ROUTE}/123", headers={'If-None-Match': '"abc"'})
+            assert result.status_code == 304
+            assert result.data == b''
+            result = client.get(f"/api/{BASE_ROUTE}/123", headers={'If-None-Match': '"def"'})
+            assert result.status_code == 200
+            assert result.headers['ETag'] == '"abc"'
+
     @patch.object(EntityService, "delete_by_id", lambda id: id)
     def test_delete(self, client: FlaskClient):  # noqa
         with client:
@@ -94,3 +120,38 @@ class TestEntityIdResource:
             result = client.put(f"/api/{BASE_ROUTE}/123", json=updates).get_json()
             expected = dict(item=dict(**{**updates, **dict(id=123)}))
             assert result == expected
+
+
+class TestEntityBulkResource:
+    @patch.object(EntityService, "bulk_create", lambda items, return_ids: [
+        dict(index=index, status=201) for index, _ in items])
+    def test_post(self, client: FlaskClient):  # noqa
+        with client:
+            body = [dict(name='Yin'), dict(name=3), dict(camelCase='Yang')]
+            result = client.post(f"/api/{BASE_ROUTE}/bulk", json=body).get_json()
+            assert result == dict(count=3, items=[
+                dict(index=0, status=201),
+                dict(index=1, status=400, errors=dict(name=['Not a valid string.'])),
+                dict(index=2, status=201),
+            ])
+
+    @patch.object(EntityService, "bulk_update", lambda items: [
+        dict(index=index, id=body['id'], status=200) for index, body in items])
+    def test_patch(self, client: FlaskClient):  # noqa
+        with client:
+            body = [dict(id=1, purpose='New purpose'), dict(purpose='New purpose')]
+            result = client.patch(f"/api/{BASE_ROUTE}/bulk", json=body).get_json()
+            assert [item['status'] for item in result['items']] == [200, 400]
+
+    @patch.object(EntityService, "bulk_delete", lambda items: [
+        dict(index=index, id=id, status=204) for index, id in items])
+    def test_delete(self, client: FlaskClient):  # noqa
+        with client:
+            result = client.delete(f"/api/{BASE_ROUTE}/bulk", json=[1, 2]).get_json()
+            assert [item['status'] for item in result['items']] == [204, 204]
+
+    def test_post_invalid_body(self, client: FlaskClient):  # noqa
+        with client:
+            result = client.post(f"/api/{BASE_ROUTE}/bulk", json=dict(name='Yin'))
+            assert result.status_code == 400
+            assert result.get_json()['code'] == 'InvalidBody'
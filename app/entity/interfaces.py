@@ -1,4 +1,4 @@
-from app.utils.base_interfaces_test import BaseInterfaces, marshmallow_fields, restplus_fields
+from app.utils.base_interfaces import BaseInterfaces, marshmallow_fields, restplus_fields
 
 class EntityInterfaces(BaseInterfaces):
     __name__ = 'Entity'
@@ -23,4 +23,13 @@ class EntityInterfaces(BaseInterfaces):
         )
     )
     create_model_keys = ['name', 'purpose', 'camelCase']
-    update_model_keys = ['purpose', 'camelCase']
\ No newline at end of file
+    update_model_keys = ['purpose', 'camelCase']
+    compiled_dump = True
+    # Every allowed filter is backed by the primary key or by an index that
+    # starts with its column.
+    filters = dict(
+        id=['eq', 'in', 'gt', 'gte', 'lt', 'lte'],
+        name=['eq', 'in', 'gt', 'gte', 'lt', 'lte', 'startswith'],
+        purpose=['eq', 'in', 'startswith'],
+        camelCase=['eq', 'in'],
+    )
@@ -0,0 +1,48 @@
+import json
+import pytest
+from flask_restplus import Namespace
+
+from .interfaces import EntityInterfaces
+from .model import Entity
+
+
+@pytest.fixture
+def interfaces():
+    return EntityInterfaces(Namespace('Test', description="Test resources"))
+
+
+def make_entities():
+    return [
+        Entity(id=1, name="Yin", purpose="thing 1", snake_case="snake"),
+        Entity(id=2, name="Yang", purpose=None),
+        Entity(id=3, name="Ünïcode", purpose="", snake_case="camel"),
+        Entity(),
+        dict(id=4, name="From a dict", snake_case="dict"),
+        dict(id='not an int', purpose=b'bytes'),
+    ]
+
+
+def test_interfaces_use_the_compiled_dumper(interfaces):
+    assert interfaces.dumper is not None
+
+
+def test_compiled_dump_matches_marshmallow_single(interfaces):
+    for entity in make_entities() + [None]:
+        expected = interfaces.single_schema.dump(entity).data
+        actual = interfaces.dump(entity)
+        assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_compiled_dump_matches_marshmallow_many(interfaces):
+    entities = make_entities()
+    expected = interfaces.many_schema.dump(entities).data
+    actual = interfaces.dump(entities, many=True)
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_filters_are_backed_by_indexes():
+    leading = {index.columns.values()[0].name for index in Entity.__table__.indexes}
+    leading.update(column.name for column in Entity.__table__.primary_key.columns)
+    for field in EntityInterfaces.filters:
+        attribute = EntityInterfaces.get_fields_attributes([field])[0]
+        assert attribute in leading, field
@@ -1,4 +1,5 @@
-from sqlalchemy import Integer, Column, String
+from datetime import datetime
+from sqlalchemy import Integer, Column, String, Index, DateTime
 from app import db  # noqa
 
 
@@ -6,11 +7,23 @@ class Entity(db.Model):  # type: ignore
     """Entity Model"""
 
     __tablename__ = "entity"
+    # Composite indexes that back keyset pagination on each sortable column.
+    __table_args__ = (
+        Index("ix_entity_name_id", "name", "id"),
+        Index("ix_entity_purpose_id", "purpose", "id"),
+        Index("ix_entity_snake_case_id", "snake_case", "id"),
+        # Backs `purpose` filters ordered by `name`, and `order_by=purpose,name`.
+        Index("ix_entity_purpose_name_id", "purpose", "name", "id"),
+    )
 
     id = Column(Integer(), primary_key=True)
     name = Column(String(255))
     purpose = Column(String(255))
     snake_case = Column(String(255))
+    # Bumped on every update. Together with `updated_at` they are the
+    # validators of the `ETag` and `Last-Modified` headers.
+    version = Column(Integer(), nullable=False, default=1, server_default='1')
+    updated_at = Column(DateTime(), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def update(self, changes):
         for key, val in changes.items():
@@ -1,4 +1,5 @@
 from app.utils.base_service import BaseService
+from app.utils.cache import LRUCache
 from .model import Entity
 from .interfaces import EntityInterfaces
 
@@ -6,3 +7,7 @@ from .interfaces import EntityInterfaces
 class EntityService(BaseService):
     model = Entity
     interfaces = EntityInterfaces
+    cache = LRUCache(max_size=1024, ttl=60)
+    list_cache = LRUCache(max_size=256, ttl=30)
+    stale_while_revalidate = True
+    single_flight = True
@@ -1,7 +1,15 @@
+import threading
+import time
+from unittest.mock import patch
 from flask import g
+import pytest
+from sqlalchemy import event
 
+from app.errors import ApiException
 from app.test.fixtures import app, db  # noqa
+from app.utils.cache import LRUCache, flights, revalidations
 from .model import Entity
+from .controller import interfaces
 from .service import EntityService  # noqa
 
 
@@ -52,6 +60,119 @@ def test_get_all_ordered_by_invalid_column_doesnt_fail(db, app):  # noqa
         results = EntityService.get_all()
         assert len(results) == 2
 
+def test_get_all_by_cursor(db, app):  # noqa
+    with app.app_context():
+        g.pagination = 'cursor'
+        g.order_by = 'name'
+        g.per_page = 2
+        for id, name in enumerate(['c', 'a', 'b', 'a']):
+            db.session.add(Entity(id=id + 1, name=name, purpose="thing"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [2, 4]
+        assert g.prev_cursor is None
+        g.cursor = g.next_cursor
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [3, 1]
+        assert g.next_cursor is None
+        g.cursor = g.prev_cursor
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [2, 4]
+
+def test_get_all_by_cursor_loads_cursor_columns(db, app):  # noqa
+    with app.app_context():
+        g.pagination = 'cursor'
+        g.order_by = 'purpose'
+        g.per_page = 1
+        for id, purpose in enumerate(['b', 'a', 'c']):
+            db.session.add(Entity(id=id + 1, name="Yin", purpose=purpose))
+        db.session.commit()
+        EntityService.get_all()
+        # Links followed by the clients carry the cursor only
+        g.cursor = g.next_cursor
+        g.order_by = None
+        g.fields = 'name'
+        db.session.expunge_all()
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            results = EntityService.get_all()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert [result.id for result in results] == [1]
+        assert 'purpose' in results[0].__dict__
+        assert g.next_cursor is not None
+        assert len(statements) == 1
+
+def test_get_all_by_offset_without_count(db, app):  # noqa
+    with app.app_context():
+        g.pagination = 'offset'
+        g.per_page = 2
+        g.page = 2
+        for id in range(1, 6):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [3, 4]
+        assert g.has_next is True
+        g.page = 3
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [5]
+        assert g.has_next is False
+
+def test_get_all_with_total(db, app):  # noqa
+    with app.app_context():
+        g.want_total = True
+        for id in range(1, 6):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert len(results) == 3
+        assert g.total == 5
+
+def test_get_all_stream(db, app):  # noqa
+    with app.app_context():
+        g.stream = 'true'
+        g.per_page = 150
+        for id in range(1, 201):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert not isinstance(results, list)
+        assert [result.id for result in results] == list(range(1, 151))
+        assert g.has_next is True
+
+def test_get_all_loads_only_requested_fields(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'purpose'
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        db.session.expunge_all()
+        results = EntityService.get_all()
+        assert [result.purpose for result in results] == ["thing"]
+        assert 'id' in results[0].__dict__
+        assert 'name' not in results[0].__dict__
+
+def test_get_all_unknown_field(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'id,unknown'
+        with pytest.raises(ApiException):
+            EntityService.get_all()
+
+def test_get_by_id_loads_only_requested_fields(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'name'
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        db.session.expunge_all()
+        result = EntityService.get_by_id(1)
+        assert result.name == "Yin"
+        assert 'purpose' not in result.__dict__
+
 def test_update(db):  # noqa
     yin = Entity(id=1, name="Yin", purpose="thing 1")
     db.session.add(yin)
@@ -61,6 +182,7 @@ def test_update(db):  # noqa
     result = Entity.query.get(yin.id)
     assert result.name == "Yin"
     assert result.purpose == "New purpose"
+    assert result.version == 2
 
 
 def test_delete_by_id(db):  # noqa
@@ -82,4 +204,387 @@ def test_create(db):  # noqa
     results = Entity.query.all()
     assert len(results) == 1
     for k in yin.keys():
-        assert getattr(results[0], k) == yin[k]
\ No newline at end of file
+        assert getattr(results[0], k) == yin[k]
+
+
+def test_bulk_create(db):  # noqa
+    items = [(0, dict(name="Yin", snake_case="yin")), (2, dict(name="Yang", purpose="thing"))]
+    results = EntityService.bulk_create(items)
+    assert results == [dict(index=0, status=201), dict(index=2, status=201)]
+    entities = Entity.query.order_by(Entity.id).all()
+    assert [(entity.name, entity.snake_case, entity.purpose) for entity in entities] == [
+        ("Yin", "yin", None), ("Yang", None, "thing")]
+
+
+def test_bulk_create_return_ids(db):  # noqa
+    results = EntityService.bulk_create([(0, dict(name="Yin")), (1, dict(name="Yang"))], return_ids=True)
+    assert [result['id'] for result in results] == [entity.id for entity in Entity.query.order_by(Entity.id)]
+
+
+def test_bulk_create_in_chunks(db, app):  # noqa
+    app.config['BULK_CHUNK_SIZE'] = 2
+    results = EntityService.bulk_create([(index, dict(name=str(index))) for index in range(5)])
+    assert len(results) == 5
+    assert Entity.query.count() == 5
+
+
+def test_bulk_update(db):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing 1"))
+    db.session.add(Entity(id=2, name="Yang", purpose="thing 2"))
+    db.session.commit()
+    items = [(0, dict(id=1, name="should not change", purpose="New purpose")), (1, dict(id=3, purpose="x"))]
+    results = EntityService.bulk_update(items)
+    assert results == [dict(index=0, id=1, status=200), dict(index=1, id=3, status=404)]
+    db.session.expunge_all()
+    result = Entity.query.get(1)
+    assert result.name == "Yin"
+    assert result.purpose == "New purpose"
+    assert Entity.query.get(2).purpose == "thing 2"
+
+
+def test_bulk_delete(db):  # noqa
+    for id in range(1, 4):
+        db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+    db.session.commit()
+    results = EntityService.bulk_delete([(0, 1), (1, 3), (2, 4)])
+    assert [result['status'] for result in results] == [204, 204, 404]
+    assert [entity.id for entity in Entity.query.all()] == [2]
+
+
+def test_bulk_write_rolls_back_on_error(db):  # noqa
+    def write(chunk):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.flush()
+        db.session.bulk_insert_mappings(Entity, chunk)
+    with pytest.raises(ApiException):
+        EntityService.bulk_write([dict(id=1, name="Yang")], write)
+    assert Entity.query.count() == 0
+
+
+def test_bulk_update_increments_version(db):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing 1"))
+    db.session.add(Entity(id=2, name="Yang", purpose="thing 2"))
+    db.session.commit()
+    EntityService.bulk_update([(0, dict(id=1, purpose="New purpose")), (1, dict(id=2, snake_case="yang"))])
+    db.session.expunge_all()
+    assert [(entity.version, entity.purpose) for entity in Entity.query.order_by(Entity.id)] == [
+        (2, "New purpose"), (2, "thing 2")]
+
+
+def test_get_validators(db):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+    db.session.commit()
+    etag, last_modified = EntityService.get_validators(1)
+    assert last_modified is not None
+    EntityService.update(1, dict(purpose="New purpose"))
+    assert EntityService.get_validators(1)[0] != etag
+    assert EntityService.get_validators(2) == (None, None)
+
+
+def test_get_all_sets_etag(db, app):  # noqa
+    with app.app_context():
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_all()
+        etag = g.etag
+        EntityService.update(1, dict(purpose="New purpose"))
+        EntityService.get_all()
+        assert g.etag != etag
+
+
+def test_get_serialized_by_id_is_cached(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        item = EntityService.get_serialized_by_id(1, interfaces)
+        with patch.object(EntityService, 'get_by_id') as get_by_id:
+            assert EntityService.get_serialized_by_id(1, interfaces) == item
+            g.fields = 'name'
+            assert EntityService.get_serialized_by_id(1, interfaces) == dict(name="Yin")
+            get_by_id.assert_not_called()
+        assert EntityService.cache.stats()['hits'] == 2
+
+
+def test_cached_item_is_checked_against_its_etag(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_by_id(1, interfaces)
+        # Written by another process, which can't invalidate this cache
+        db.session.execute("UPDATE entity SET name = 'Yang', version = version + 1 WHERE id = 1")
+        db.session.commit()
+        assert EntityService.get_serialized_by_id(1, interfaces)['name'] == "Yang"
+        assert EntityService.cache.stats()['hits'] == 1
+
+
+def test_cache_is_skipped_by_pinned_clients(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_by_id(1, interfaces)
+        g.consistency_token = time.time() + 5
+        with patch.object(EntityService, 'get_validators') as get_validators:
+            assert EntityService.get_serialized_by_id(1, interfaces)['name'] == "Yin"
+            get_validators.assert_not_called()
+        assert EntityService.cache.stats()['hits'] == 0
+
+
+def test_get_serialized_by_id_unknown_field(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'cache', LRUCache()):
+        g.fields = 'unknown'
+        with pytest.raises(ApiException):
+            EntityService.get_serialized_by_id(1, interfaces)
+
+
+def test_writes_invalidate_cache(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'cache', LRUCache()):
+        for id in (1, 2, 3):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        for id in (1, 2, 3):
+            EntityService.get_serialized_by_id(id, interfaces)
+        EntityService.update(1, dict(purpose="New purpose"))
+        assert EntityService.get_serialized_by_id(1, interfaces)['purpose'] == "New purpose"
+        EntityService.bulk_update([(0, dict(id=2, purpose="Bulk purpose"))])
+        assert EntityService.get_serialized_by_id(2, interfaces)['purpose'] == "Bulk purpose"
+        EntityService.delete_by_id(3)
+        assert EntityService.cache.get(3) is None
+
+
+def test_get_serialized_all_is_cached(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()):
+        g.order_by = 'name'
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        items = EntityService.get_serialized_all(interfaces)
+        with patch.object(EntityService, 'get_all') as get_all:
+            g.order_dir = 'ASC'
+            assert EntityService.get_serialized_all(interfaces) == items
+            get_all.assert_not_called()
+
+
+def test_get_serialized_all_restores_pagination(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()):
+        g.pagination = 'offset'
+        for id in range(1, 5):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_all(interfaces)
+        etag = g.etag
+        del g.has_next
+        del g.etag
+        EntityService.get_serialized_all(interfaces)
+        assert g.has_next is True
+        assert g.etag == etag
+
+
+def test_get_serialized_all_invalidated_by_writes(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_all(interfaces)
+        EntityService.create(dict(name="Yang"))
+        assert len(EntityService.get_serialized_all(interfaces)) == 2
+        EntityService.bulk_delete([(0, 1)])
+        assert len(EntityService.get_serialized_all(interfaces)) == 1
+
+
+def test_list_cache_max_age(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_all(interfaces)
+        # Written by another process, which can't invalidate this cache
+        db.session.execute("INSERT INTO entity (id, name, version) VALUES (2, 'Yang', 1)")
+        db.session.commit()
+        assert len(EntityService.get_serialized_all(interfaces)) == 1
+        app.config['LIST_CACHE_MAX_AGE'] = 0
+        assert len(EntityService.get_serialized_all(interfaces)) == 2
+
+
+def test_list_cache_is_skipped_by_pinned_clients(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_all(interfaces)
+        db.session.execute("INSERT INTO entity (id, name, version) VALUES (2, 'Yang', 1)")
+        db.session.commit()
+        g.consistency_token = time.time() + 5
+        assert len(EntityService.get_serialized_all(interfaces)) == 2
+        assert len(EntityService.list_cache) == 1
+
+
+def test_get_serialized_all_stale_while_revalidate(db, app):  # noqa
+    with app.app_context(), patch.object(EntityService, 'list_cache', LRUCache()), \
+            patch.object(EntityService, 'stale_while_revalidate', True):
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        EntityService.get_serialized_all(interfaces)
+        EntityService.create(dict(name="Yang"))
+        # Read by another client, which is not pinned to its writes
+        g.pop('consistency_token')
+        key = EntityService.get_list_cache_key()
+        assert revalidations.start(key)
+        try:
+            assert len(EntityService.get_serialized_all(interfaces)) == 1
+        finally:
+            revalidations.finish(key)
+        assert len(EntityService.get_serialized_all(interfaces)) == 2
+        assert len(EntityService.get_serialized_all(interfaces)) == 2
+
+
+def test_get_list_cache_key_is_normalized(app):  # noqa
+    with app.app_context():
+        g.per_page = 1000
+        g.order_by = 'unknown'
+        g.order_dir = 'desc'
+        g.fields = 'purpose,name'
+        key = EntityService.get_list_cache_key()
+        g.per_page = 100
+        g.order_by = None
+        g.order_dir = None
+        g.fields = 'name,purpose'
+        assert EntityService.get_list_cache_key() == key
+
+
+def test_get_many(db, app):  # noqa
+    app.config['BULK_CHUNK_SIZE'] = 2
+    for id in range(1, 6):
+        db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+    db.session.commit()
+    items, missing = EntityService.get_many([4, 9, 1, 4, 5, 2])
+    assert [item.id for item in items] == [4, 1, 5, 2]
+    assert missing == [9]
+
+
+def test_get_all_by_ids(db, app):  # noqa
+    with app.app_context():
+        g.ids = '3,1,7'
+        for id in range(1, 6):
+            db.session.add(Entity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [3, 1]
+        assert g.missing == [7]
+
+
+@pytest.mark.parametrize('ids', ['1,a', ','.join(['1'] * 10001)])
+def test_get_all_by_invalid_ids(db, app, ids):  # noqa
+    with app.app_context():
+        g.ids = ids
+        with pytest.raises(ApiException):
+            EntityService.get_all()
+
+
+def test_get_all_filtered(db, app):  # noqa
+    with app.app_context():
+        g.filters = {'purpose__eq': 'thing', 'id__gt': '1'}
+        g.want_total = True
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.add(Entity(id=2, name="Yang", purpose="thing"))
+        db.session.add(Entity(id=3, name="Yong", purpose="other"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [2]
+        assert g.total == 1
+
+
+def test_get_all_filter_not_allowed(db, app):  # noqa
+    with app.app_context():
+        g.filters = {'name__contains': 'Y'}
+        with pytest.raises(ApiException):
+            EntityService.get_all()
+
+
+def test_get_all_ordered_by_many_columns(db, app):  # noqa
+    with app.app_context():
+        g.order_by = 'purpose,name'
+        g.order_dir = 'desc'
+        db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+        db.session.add(Entity(id=2, name="Yang", purpose="thing"))
+        db.session.add(Entity(id=3, name="Yong", purpose="other"))
+        db.session.commit()
+        results = EntityService.get_all()
+        assert [result.id for result in results] == [1, 2, 3]
+
+
+def run_concurrently(app, name, func, write=None):  # noqa
+    """Runs `func` on two threads, the second one starting while the first
+    waits inside the `name` method of `EntityService`, after `write` if
+    given. Returns the arguments of each call of the method, and the result
+    of each thread."""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    method = getattr(EntityService, name).__func__
+
+    def slow_method(cls, *args):
+        calls.append(args)
+        result = method(cls, *args)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+        return result
+
+    results = [None, None]
+
+    def target(index):
+        with app.app_context():
+            results[index] = func()
+
+    with patch.object(EntityService, name, classmethod(slow_method)):
+        first = threading.Thread(target=target, args=(0,))
+        first.start()
+        assert started.wait(5)
+        if write is not None:
+            with app.app_context():
+                write()
+        second = threading.Thread(target=target, args=(1,))
+        second.start()
+        if write is None:
+            deadline = time.monotonic() + 5
+            while not any(flight.followers for flight in flights._flights.values()):
+                assert time.monotonic() < deadline
+                time.sleep(0.001)
+        else:
+            second.join(5)
+        release.set()
+        first.join(5)
+        second.join(5)
+    return calls, results
+
+
+def test_get_serialized_by_id_single_flight(db, app):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+    db.session.commit()
+    with patch.object(EntityService, 'cache', None):
+        calls, results = run_concurrently(app, 'get_by_id',
+            lambda: EntityService.get_serialized_by_id(1, interfaces))
+    assert calls == [(1,)]
+    assert results[0] == results[1] and results[0]['name'] == 'Yin'
+
+
+def test_get_serialized_all_single_flight(db, app):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+    db.session.commit()
+
+    def get_page():
+        g.ids = '1,2'
+        return EntityService.get_serialized_all(interfaces), g.missing
+
+    with patch.object(EntityService, 'list_cache', None):
+        calls, results = run_concurrently(app, 'get_many', get_page)
+    assert calls == [([1, 2],)]
+    assert results[0] == results[1]
+    assert [item['name'] for item in results[0][0]] == ['Yin']
+    assert results[0][1] == [2]
+
+
+def test_single_flight_is_broken_by_writes(db, app):  # noqa
+    db.session.add(Entity(id=1, name="Yin", purpose="thing"))
+    db.session.commit()
+    with patch.object(EntityService, 'list_cache', None):
+        calls, results = run_concurrently(app, 'get_all', lambda: EntityService.get_serialized_all(interfaces),
+            write=lambda: EntityService.create(dict(name='Yang', purpose='thing')))
+    assert len(calls) == 2
+    assert [len(items) for items in results] == [1, 2]
@@ -4,7 +4,7 @@ from flask.wrappers import Response
 
 from app.api_response import ApiResponse
 from app.utils.authorize import authorize
-from app.utils.decorators import parse_query_parameters
+from app.utils.decorators import conditional, parse_query_parameters
 from app.utils.query import Query
 from .service import ProtectedEntityService
 from .model import ProtectedEntity
@@ -46,7 +46,7 @@ class ProtectedEntityResource(Resource):
     """
     
     @api.doc(security='apiKey')
-    @api.doc(params=Query.index_query_params)
+    @api.doc(params={**Query.index_query_params, **interfaces.filter_params})
     @api.response(200, 'ProtectedEntity List', interfaces.many_response_model)
     @parse_query_parameters
     @authorize
@@ -54,8 +54,10 @@ class ProtectedEntityResource(Resource):
         """
         Returns the list of entities
         """
-        entities = ProtectedEntityService.get_all()
-        return ApiResponse(interfaces.many_schema.dump(entities).data)
+        entities = ProtectedEntityService.get_serialized_all(interfaces)
+        if ApiResponse.not_modified():
+            return ApiResponse(None, 304)
+        return ApiResponse(entities)
 
     @api.doc(security='apiKey')
     @api.response(200, 'New ProtectedEntity', interfaces.single_response_model)
@@ -81,7 +83,67 @@ class ProtectedEntityResource(Resource):
         body = interfaces.single_schema.load(json_data).data
         print(json_data)
         entity = ProtectedEntityService.create(body)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(interfaces.dump(entity))
+
+
+@api.route("/bulk")
+@api.response(400, 'Bad Request', interfaces.error_response_model)
+@api.doc(responses={
+    401: 'Unauthorized',
+    403: 'Forbidden',
+    500: 'Internal server error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+})
+class ProtectedEntityBulkResource(Resource):
+    """
+    ProtectedEntity bulk operations
+    """
+
+    @api.doc(security='apiKey')
+    @api.expect([interfaces.create_model])
+    @api.doc(params={'return_ids': {
+        'description': 'Set to `true` to include the `id` of the new entities. Rows are then inserted one at a time.'
+    }})
+    @api.response(200, 'Result of each ProtectedEntity', interfaces.bulk_response_model)
+    @authorize
+    def post(self) -> ApiResponse:
+        """
+        Creates many ProtectedEntity in a single transaction
+
+        Each item is validated on its own. The invalid ones are reported with a
+        `400` status and the rest are created.
+        """
+        items, errors = interfaces.load_many(request.get_json())
+        return_ids = request.args.get('return_ids', '').lower() in ('true', '1', 'yes')
+        results = ProtectedEntityService.bulk_create(items, return_ids=return_ids) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
+
+    @api.doc(security='apiKey')
+    @api.expect([interfaces.bulk_update_model])
+    @api.response(200, 'Result of each ProtectedEntity', interfaces.bulk_response_model)
+    @authorize
+    def patch(self) -> ApiResponse:
+        """
+        Updates many ProtectedEntity in a single transaction
+        """
+        items, errors = interfaces.load_many(request.get_json(), with_id=True)
+        results = ProtectedEntityService.bulk_update(items) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
+
+    @api.doc(security='apiKey')
+    @api.expect([fields.Integer])
+    @api.response(200, 'Result of each ProtectedEntity', interfaces.bulk_response_model)
+    @authorize
+    def delete(self) -> ApiResponse:
+        """
+        Deletes many ProtectedEntity in a single transaction
+
+        The body is the list of ids to delete.
+        """
+        items, errors = interfaces.load_ids(request.get_json())
+        results = ProtectedEntityService.bulk_delete(items) + errors
+        return ApiResponse(sorted(results, key=lambda result: result['index']), paginate=False)
 
 
 @api.route("/<int:id>")
@@ -96,14 +158,15 @@ class ProtectedEntityResource(Resource):
 })
 class ProtectedEntityIdResource(Resource):
     @api.response(200, 'Wanted entity', interfaces.single_response_model)
-    @api.doc(security='apiKey')
+    @api.doc(security='apiKey', params={'fields': Query.index_query_params['fields']})
     @authorize
+    @parse_query_parameters
+    @conditional(ProtectedEntityService)
     def get(self, id: int) -> ProtectedEntity:
         """
         Get a single ProtectedEntity
         """
-        entity = ProtectedEntityService.get_by_id(id)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(ProtectedEntityService.get_serialized_by_id(id, interfaces))
 
     @api.response(204, 'No Content')
     @api.doc(security='apiKey')
@@ -125,4 +188,4 @@ class ProtectedEntityIdResource(Resource):
         """Update a single ProtectedEntity"""
         body = interfaces.single_schema.load(request.json).data
         entity = ProtectedEntityService.update(id, body)
-        return ApiResponse(interfaces.single_schema.dump(entity).data)
+        return ApiResponse(interfaces.dump(entity))
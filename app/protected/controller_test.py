@@ -71,6 +71,7 @@ def fake_update(id: int, changes) -> ProtectedEntity:
 
 
 class TestProtectedEntityIdResource:
+    @patch.object(ProtectedEntityService, "get_validators", lambda id: (None, None))
     @patch.object(ProtectedEntityService, "get_by_id", lambda id: make_entity(id=id))
     def test_get(self, client: FlaskClient):  # noqa
         with client:
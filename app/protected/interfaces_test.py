@@ -0,0 +1,48 @@
+import json
+import pytest
+from flask_restplus import Namespace
+
+from .interfaces import ProtectedEntityInterfaces
+from .model import ProtectedEntity
+
+
+@pytest.fixture
+def interfaces():
+    return ProtectedEntityInterfaces(Namespace('Test', description="Test resources"))
+
+
+def make_entities():
+    return [
+        ProtectedEntity(id=1, name="Yin", purpose="thing 1", snake_case="snake"),
+        ProtectedEntity(id=2, name="Yang", purpose=None),
+        ProtectedEntity(id=3, name="Ünïcode", purpose="", snake_case="camel"),
+        ProtectedEntity(),
+        dict(id=4, name="From a dict", snake_case="dict"),
+        dict(id='not an int', purpose=b'bytes'),
+    ]
+
+
+def test_interfaces_use_the_compiled_dumper(interfaces):
+    assert interfaces.dumper is not None
+
+
+def test_compiled_dump_matches_marshmallow_single(interfaces):
+    for entity in make_entities() + [None]:
+        expected = interfaces.single_schema.dump(entity).data
+        actual = interfaces.dump(entity)
+        assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_compiled_dump_matches_marshmallow_many(interfaces):
+    entities = make_entities()
+    expected = interfaces.many_schema.dump(entities).data
+    actual = interfaces.dump(entities, many=True)
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_filters_are_backed_by_indexes():
+    leading = {index.columns.values()[0].name for index in ProtectedEntity.__table__.indexes}
+    leading.update(column.name for column in ProtectedEntity.__table__.primary_key.columns)
+    for field in ProtectedEntityInterfaces.filters:
+        attribute = ProtectedEntityInterfaces.get_fields_attributes([field])[0]
+        assert attribute in leading, field
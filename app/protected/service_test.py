@@ -1,7 +1,12 @@
+from unittest.mock import patch
 from flask import g
+import pytest
 
+from app.errors import ApiException
 from app.test.fixtures import app, db  # noqa
+from app.utils.cache import LRUCache, revalidations
 from .model import ProtectedEntity
+from .controller import interfaces
 from .service import ProtectedEntityService  # noqa
 
 
@@ -52,6 +57,90 @@ def test_get_all_ordered_by_invalid_column_doesnt_fail(db, app):  # noqa
         results = ProtectedEntityService.get_all()
         assert len(results) == 2
 
+def test_get_all_by_cursor(db, app):  # noqa
+    with app.app_context():
+        g.pagination = 'cursor'
+        g.order_by = 'name'
+        g.per_page = 2
+        for id, name in enumerate(['c', 'a', 'b', 'a']):
+            db.session.add(ProtectedEntity(id=id + 1, name=name, purpose="thing"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [2, 4]
+        assert g.prev_cursor is None
+        g.cursor = g.next_cursor
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [3, 1]
+        assert g.next_cursor is None
+        g.cursor = g.prev_cursor
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [2, 4]
+
+def test_get_all_by_offset_without_count(db, app):  # noqa
+    with app.app_context():
+        g.pagination = 'offset'
+        g.per_page = 2
+        g.page = 2
+        for id in range(1, 6):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [3, 4]
+        assert g.has_next is True
+        g.page = 3
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [5]
+        assert g.has_next is False
+
+def test_get_all_with_total(db, app):  # noqa
+    with app.app_context():
+        g.want_total = True
+        for id in range(1, 6):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert len(results) == 3
+        assert g.total == 5
+
+def test_get_all_stream(db, app):  # noqa
+    with app.app_context():
+        g.stream = 'true'
+        g.per_page = 150
+        for id in range(1, 201):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert not isinstance(results, list)
+        assert [result.id for result in results] == list(range(1, 151))
+        assert g.has_next is True
+
+def test_get_all_loads_only_requested_fields(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'purpose'
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        db.session.expunge_all()
+        results = ProtectedEntityService.get_all()
+        assert [result.purpose for result in results] == ["thing"]
+        assert 'id' in results[0].__dict__
+        assert 'name' not in results[0].__dict__
+
+def test_get_all_unknown_field(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'id,unknown'
+        with pytest.raises(ApiException):
+            ProtectedEntityService.get_all()
+
+def test_get_by_id_loads_only_requested_fields(db, app):  # noqa
+    with app.app_context():
+        g.fields = 'name'
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        db.session.expunge_all()
+        result = ProtectedEntityService.get_by_id(1)
+        assert result.name == "Yin"
+        assert 'purpose' not in result.__dict__
+
 def test_update(db):  # noqa
     yin = ProtectedEntity(id=1, name="Yin", purpose="thing 1")
     db.session.add(yin)
@@ -61,6 +150,7 @@ def test_update(db):  # noqa
     result = ProtectedEntity.query.get(yin.id)
     assert result.name == "Yin"
     assert result.purpose == "New purpose"
+    assert result.version == 2
 
 
 def test_delete_by_id(db):  # noqa
@@ -82,4 +172,256 @@ def test_create(db):  # noqa
     results = ProtectedEntity.query.all()
     assert len(results) == 1
     for k in yin.keys():
-        assert getattr(results[0], k) == yin[k]
\ No newline at end of file
+        assert getattr(results[0], k) == yin[k]
+
+
+def test_bulk_create(db):  # noqa
+    items = [(0, dict(name="Yin", snake_case="yin")), (2, dict(name="Yang", purpose="thing"))]
+    results = ProtectedEntityService.bulk_create(items)
+    assert results == [dict(index=0, status=201), dict(index=2, status=201)]
+    entities = ProtectedEntity.query.order_by(ProtectedEntity.id).all()
+    assert [(entity.name, entity.snake_case, entity.purpose) for entity in entities] == [
+        ("Yin", "yin", None), ("Yang", None, "thing")]
+
+
+def test_bulk_create_return_ids(db):  # noqa
+    results = ProtectedEntityService.bulk_create([(0, dict(name="Yin")), (1, dict(name="Yang"))], return_ids=True)
+    assert [result['id'] for result in results] == [entity.id for entity in ProtectedEntity.query.order_by(ProtectedEntity.id)]
+
+
+def test_bulk_create_in_chunks(db, app):  # noqa
+    app.config['BULK_CHUNK_SIZE'] = 2
+    results = ProtectedEntityService.bulk_create([(index, dict(name=str(index))) for index in range(5)])
+    assert len(results) == 5
+    assert ProtectedEntity.query.count() == 5
+
+
+def test_bulk_update(db):  # noqa
+    db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing 1"))
+    db.session.add(ProtectedEntity(id=2, name="Yang", purpose="thing 2"))
+    db.session.commit()
+    items = [(0, dict(id=1, name="should not change", purpose="New purpose")), (1, dict(id=3, purpose="x"))]
+    results = ProtectedEntityService.bulk_update(items)
+    assert results == [dict(index=0, id=1, status=200), dict(index=1, id=3, status=404)]
+    db.session.expunge_all()
+    result = ProtectedEntity.query.get(1)
+    assert result.name == "Yin"
+    assert result.purpose == "New purpose"
+    assert ProtectedEntity.query.get(2).purpose == "thing 2"
+
+
+def test_bulk_delete(db):  # noqa
+    for id in range(1, 4):
+        db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+    db.session.commit()
+    results = ProtectedEntityService.bulk_delete([(0, 1), (1, 3), (2, 4)])
+    assert [result['status'] for result in results] == [204, 204, 404]
+    assert [entity.id for entity in ProtectedEntity.query.all()] == [2]
+
+
+def test_bulk_write_rolls_back_on_error(db):  # noqa
+    def write(chunk):
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.flush()
+        db.session.bulk_insert_mappings(ProtectedEntity, chunk)
+    with pytest.raises(ApiException):
+        ProtectedEntityService.bulk_write([dict(id=1, name="Yang")], write)
+    assert ProtectedEntity.query.count() == 0
+
+
+def test_bulk_update_increments_version(db):  # noqa
+    db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing 1"))
+    db.session.add(ProtectedEntity(id=2, name="Yang", purpose="thing 2"))
+    db.session.commit()
+    ProtectedEntityService.bulk_update([(0, dict(id=1, purpose="New purpose")), (1, dict(id=2, snake_case="yang"))])
+    db.session.expunge_all()
+    assert [(entity.version, entity.purpose) for entity in ProtectedEntity.query.order_by(ProtectedEntity.id)] == [
+        (2, "New purpose"), (2, "thing 2")]
+
+
+def test_get_validators(db):  # noqa
+    db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+    db.session.commit()
+    etag, last_modified = ProtectedEntityService.get_validators(1)
+    assert last_modified is not None
+    ProtectedEntityService.update(1, dict(purpose="New purpose"))
+    assert ProtectedEntityService.get_validators(1)[0] != etag
+    assert ProtectedEntityService.get_validators(2) == (None, None)
+
+
+def test_get_all_sets_etag(db, app):  # noqa
+    with app.app_context():
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        ProtectedEntityService.get_all()
+        etag = g.etag
+        ProtectedEntityService.update(1, dict(purpose="New purpose"))
+        ProtectedEntityService.get_all()
+        assert g.etag != etag
+
+
+def test_get_serialized_by_id_is_cached(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'cache', LRUCache()):
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        item = ProtectedEntityService.get_serialized_by_id(1, interfaces)
+        with patch.object(ProtectedEntityService, 'get_by_id') as get_by_id:
+            assert ProtectedEntityService.get_serialized_by_id(1, interfaces) == item
+            g.fields = 'name'
+            assert ProtectedEntityService.get_serialized_by_id(1, interfaces) == dict(name="Yin")
+            get_by_id.assert_not_called()
+        assert ProtectedEntityService.cache.stats()['hits'] == 2
+
+
+def test_get_serialized_by_id_unknown_field(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'cache', LRUCache()):
+        g.fields = 'unknown'
+        with pytest.raises(ApiException):
+            ProtectedEntityService.get_serialized_by_id(1, interfaces)
+
+
+def test_writes_invalidate_cache(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'cache', LRUCache()):
+        for id in (1, 2, 3):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        for id in (1, 2, 3):
+            ProtectedEntityService.get_serialized_by_id(id, interfaces)
+        ProtectedEntityService.update(1, dict(purpose="New purpose"))
+        assert ProtectedEntityService.get_serialized_by_id(1, interfaces)['purpose'] == "New purpose"
+        ProtectedEntityService.bulk_update([(0, dict(id=2, purpose="Bulk purpose"))])
+        assert ProtectedEntityService.get_serialized_by_id(2, interfaces)['purpose'] == "Bulk purpose"
+        ProtectedEntityService.delete_by_id(3)
+        assert ProtectedEntityService.cache.get(3) is None
+
+
+def test_get_serialized_all_is_cached(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'list_cache', LRUCache()):
+        g.order_by = 'name'
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        items = ProtectedEntityService.get_serialized_all(interfaces)
+        with patch.object(ProtectedEntityService, 'get_all') as get_all:
+            g.order_dir = 'ASC'
+            assert ProtectedEntityService.get_serialized_all(interfaces) == items
+            get_all.assert_not_called()
+
+
+def test_get_serialized_all_restores_pagination(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'list_cache', LRUCache()):
+        g.pagination = 'offset'
+        for id in range(1, 5):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        ProtectedEntityService.get_serialized_all(interfaces)
+        etag = g.etag
+        del g.has_next
+        del g.etag
+        ProtectedEntityService.get_serialized_all(interfaces)
+        assert g.has_next is True
+        assert g.etag == etag
+
+
+def test_get_serialized_all_invalidated_by_writes(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'list_cache', LRUCache()):
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        ProtectedEntityService.get_serialized_all(interfaces)
+        ProtectedEntityService.create(dict(name="Yang"))
+        assert len(ProtectedEntityService.get_serialized_all(interfaces)) == 2
+        ProtectedEntityService.bulk_delete([(0, 1)])
+        assert len(ProtectedEntityService.get_serialized_all(interfaces)) == 1
+
+
+def test_get_serialized_all_stale_while_revalidate(db, app):  # noqa
+    with app.app_context(), patch.object(ProtectedEntityService, 'list_cache', LRUCache()), \
+            patch.object(ProtectedEntityService, 'stale_while_revalidate', True):
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.commit()
+        ProtectedEntityService.get_serialized_all(interfaces)
+        ProtectedEntityService.create(dict(name="Yang"))
+        # Read by another client, which is not pinned to its writes
+        g.pop('consistency_token')
+        key = ProtectedEntityService.get_list_cache_key()
+        assert revalidations.start(key)
+        try:
+            assert len(ProtectedEntityService.get_serialized_all(interfaces)) == 1
+        finally:
+            revalidations.finish(key)
+        assert len(ProtectedEntityService.get_serialized_all(interfaces)) == 2
+        assert len(ProtectedEntityService.get_serialized_all(interfaces)) == 2
+
+
+def test_get_list_cache_key_is_normalized(app):  # noqa
+    with app.app_context():
+        g.per_page = 1000
+        g.order_by = 'unknown'
+        g.order_dir = 'desc'
+        g.fields = 'purpose,name'
+        key = ProtectedEntityService.get_list_cache_key()
+        g.per_page = 100
+        g.order_by = None
+        g.order_dir = None
+        g.fields = 'name,purpose'
+        assert ProtectedEntityService.get_list_cache_key() == key
+
+
+def test_get_many(db, app):  # noqa
+    app.config['BULK_CHUNK_SIZE'] = 2
+    for id in range(1, 6):
+        db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+    db.session.commit()
+    items, missing = ProtectedEntityService.get_many([4, 9, 1, 4, 5, 2])
+    assert [item.id for item in items] == [4, 1, 5, 2]
+    assert missing == [9]
+
+
+def test_get_all_by_ids(db, app):  # noqa
+    with app.app_context():
+        g.ids = '3,1,7'
+        for id in range(1, 6):
+            db.session.add(ProtectedEntity(id=id, name="Yin", purpose="thing"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [3, 1]
+        assert g.missing == [7]
+
+
+@pytest.mark.parametrize('ids', ['1,a', ','.join(['1'] * 10001)])
+def test_get_all_by_invalid_ids(db, app, ids):  # noqa
+    with app.app_context():
+        g.ids = ids
+        with pytest.raises(ApiException):
+            ProtectedEntityService.get_all()
+
+
+def test_get_all_filtered(db, app):  # noqa
+    with app.app_context():
+        g.filters = {'purpose__eq': 'thing', 'id__gt': '1'}
+        g.want_total = True
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.add(ProtectedEntity(id=2, name="Yang", purpose="thing"))
+        db.session.add(ProtectedEntity(id=3, name="Yong", purpose="other"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [2]
+        assert g.total == 1
+
+
+def test_get_all_filter_not_allowed(db, app):  # noqa
+    with app.app_context():
+        g.filters = {'name__contains': 'Y'}
+        with pytest.raises(ApiException):
+            ProtectedEntityService.get_all()
+
+
+def test_get_all_ordered_by_many_columns(db, app):  # noqa
+    with app.app_context():
+        g.order_by = 'purpose,name'
+        g.order_dir = 'desc'
+        db.session.add(ProtectedEntity(id=1, name="Yin", purpose="thing"))
+        db.session.add(ProtectedEntity(id=2, name="Yang", purpose="thing"))
+        db.session.add(ProtectedEntity(id=3, name="Yong", purpose="other"))
+        db.session.commit()
+        results = ProtectedEntityService.get_all()
+        assert [result.id for result in results] == [1, 2, 3]
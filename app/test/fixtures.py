@@ -2,9 +2,11 @@ import pytest
 
 from app import create_app
 from app.api_flask import ApiFlask
+from app.utils.cache import clear_caches
 
 @pytest.fixture
 def app():
+    clear_caches()
     return create_app('test')[0]
 
 @pytest.fixture
@@ -0,0 +1,23 @@
+import time
+
+import rsa
+from jose import jwt
+from jose.backends import RSAKey
+
+
+def generate_keypair(bits=1024):
+    """Generates an RSA keypair to sign and verify test tokens.
+
+    Returns:
+        A tuple with the PEM encoded public key and private key.
+    """
+    _, private_key = rsa.newkeys(bits)
+    private_pem = private_key.save_pkcs1().decode('utf-8')
+    public_pem = RSAKey(private_pem, 'RS256').public_key().to_pem().decode('utf-8')
+    return public_pem, private_pem
+
+
+def make_token(private_pem, audience='api', expires_in=60, **claims):
+    """Signs a `RS256` token for the given audience."""
+    claims = dict(aud=audience, exp=int(time.time()) + expires_in, **claims)
+    return jwt.encode(claims, private_pem, algorithm='RS256')
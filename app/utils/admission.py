@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+from app.errors import ApiException
+from app.utils.metrics import get_metrics
+
+# Methods served by the reads budget
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class Budget(object):
+    """
+    Concurrency limit of one kind of request, with a bounded wait queue.
+
+    Requests over the `limit` wait for a slot up to `timeout` seconds, and
+    are rejected right away when `queue_size` requests are already waiting.
+    Freed slots are handed over to the waiting requests in arrival order,
+    so new requests can't take them first.
+
+    Args:
+        limit (int): Maximum amount of requests running at once.
+        queue_size (int): Maximum amount of requests waiting for a slot.
+        timeout (float): Maximum seconds a request waits for a slot.
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.active = 0
+        # Events of the waiting requests, in arrival order
+        self.waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+    def acquire(self):
+        """Takes a slot, waiting for one if needed.
+
+        Returns:
+            `None` if a slot was taken, or the reason the request was
+            rejected: `queue_full` or `timeout`.
+        """
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                return None
+            if len(self.waiters) >= self.queue_size:
+                return 'queue_full'
+            granted = threading.Event()
+            self.waiters.append(granted)
+        if granted.wait(self.timeout):
+            return None
+        with self.lock:
+            # The slot may have been handed over while timing out
+            if granted.is_set():
+                return None
+            self.waiters.remove(granted)
+            return 'timeout'
+
+    def release(self):
+        """Frees a slot, handing it over to the oldest waiting request."""
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft().set()
+            else:
+                self.active -= 1
+
+
+class AdmissionControl(object):
+    """
+    Per process budgets for reads and writes, so slow writes can't take
+    the threads the reads need, nor the other way around.
+
+    Requests that can't get a slot are answered right away with a
+    `503 Service Unavailable` and a `Retry-After` header, instead of piling
+    up until every client times out. Requests that already waited more than
+    `max_queue_time` seconds in front of the app, measured from the
+    `X-Request-Start` header set by `nginx`, are rejected too, since their
+    client has probably given up.
+
+    Args:
+        read_limit (int): Concurrent reads.
+        write_limit (int): Concurrent writes.
+        queue_size (int): Requests waiting for each budget.
+        queue_timeout (float): Seconds a request waits for a slot.
+        max_queue_time (float, optional): Seconds a request may wait before
+            reaching the app. `None` disables the check.
+        retry_after (int): Seconds sent on the `Retry-After` header.
+        exempt (:obj:`list` of :obj:`str`): Paths that always get through.
+    """
+
+    def __init__(self, read_limit, write_limit, queue_size, queue_timeout, max_queue_time=None,
+            retry_after=1, exempt=()):
+        self.reads = Budget(read_limit, queue_size, queue_timeout)
+        self.writes = Budget(write_limit, queue_size, queue_timeout)
+        self.max_queue_time = max_queue_time
+        self.retry_after = retry_after
+        self.exempt = frozenset(exempt)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            read_limit=config['ADMISSION_READ_LIMIT'],
+            write_limit=config['ADMISSION_WRITE_LIMIT'],
+            queue_size=config['ADMISSION_QUEUE_SIZE'],
+            queue_timeout=config['ADMISSION_QUEUE_TIMEOUT'],
+            max_queue_time=config['ADMISSION_MAX_QUEUE_TIME'],
+            retry_after=config['ADMISSION_RETRY_AFTER'],
+            exempt=config['ADMISSION_EXEMPT'],
+        )
+
+    def admit(self):
+        """Takes a slot of the budget of the current request, storing it on
+        `g.admission_budget`.
+
+        Returns:
+            `None` if the request was admitted, or the reason it was rejected.
+        """
+        if request.path in self.exempt:
+            return None
+        if self.max_queue_time is not None and queue_time() > self.max_queue_time:
+            return 'queue_time'
+        budget = self.reads if request.method in READ_METHODS else self.writes
+        reason = budget.acquire()
+        if reason is None:
+            g.admission_budget = budget
+        return reason
+
+    def reject(self, reason):
+        """Builds the `503` response of a rejected request."""
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.inc('http_requests_shed_total', (('reason', reason),))
+        response = ApiException('The server is overloaded, try again later', status=503,
+            code='Overloaded').to_response()
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+
+def queue_time():
+    """Returns the seconds since `nginx` received the current request, from
+    its `X-Request-Start: t=<seconds>` header, or `0` without it."""
+    value = request.headers.get('X-Request-Start', '')
+    try:
+        start = float(value[2:] if value.startswith('t=') else value)
+    except ValueError:
+        return 0.0
+    return max(time.time() - start, 0.0)
+
+
+def init_admission(app):
+    """Limits the concurrent requests of each process when
+    `ADMISSION_CONTROL` is enabled.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    if not app.config['ADMISSION_CONTROL']:
+        return
+    admission = app.extensions['admission'] = AdmissionControl.from_config(app.config)
+
+    @app.before_request
+    # pylint: disable=unused-variable
+    def admit_request():
+        reason = admission.admit()
+        if reason is not None:
+            return admission.reject(reason)
+        return None
+
+    @app.teardown_request
+    # pylint: disable=unused-variable
+    def release_request(exception=None):
+        # Runs once streamed responses are sent
+        budget = g.pop('admission_budget', None)
+        if budget is not None:
+            budget.release()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from app.test.fixtures import app, db  # noqa
+from .admission import Budget, init_admission
+
+
+def enable(app, **config):  # noqa
+    app.config.update(ADMISSION_CONTROL=True, **config)
+    init_admission(app)
+    return app.test_client()
+
+
+def test_budget_admits_up_to_the_limit():
+    budget = Budget(limit=2, queue_size=0, timeout=0.01)
+    assert budget.acquire() is None
+    assert budget.acquire() is None
+    assert budget.acquire() == 'queue_full'
+    budget.release()
+    assert budget.acquire() is None
+
+
+def test_budget_waits_for_a_slot():
+    budget = Budget(limit=1, queue_size=1, timeout=1)
+    budget.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(budget.acquire()))
+    waiter.start()
+    while not budget.waiting:
+        time.sleep(0.001)
+    # The queue is full
+    assert budget.acquire() == 'queue_full'
+    budget.release()
+    waiter.join()
+    assert results == [None]
+    assert budget.active == 1
+
+
+def test_budget_hands_freed_slots_to_waiting_requests():
+    budget = Budget(limit=1, queue_size=1, timeout=1)
+    budget.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(budget.acquire()))
+    waiter.start()
+    while not budget.waiting:
+        time.sleep(0.001)
+    budget.release()
+    # The slot already belongs to the waiting request
+    budget.timeout = 0.01
+    assert budget.acquire() == 'timeout'
+    waiter.join()
+    assert results == [None]
+
+
+def test_budget_wait_times_out():
+    budget = Budget(limit=1, queue_size=1, timeout=0.01)
+    budget.acquire()
+    start = time.monotonic()
+    assert budget.acquire() == 'timeout'
+    assert time.monotonic() - start < 0.5
+    assert budget.waiting == 0
+
+
+def test_overloaded_requests_are_rejected(app, db):  # noqa
+    client = enable(app, ADMISSION_READ_LIMIT=0, ADMISSION_QUEUE_SIZE=0)
+    response = client.get('/api/entity/')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json() == dict(message='The server is overloaded, try again later', code='Overloaded')
+    # Exempt paths always get through
+    assert client.get('/healthz').status_code == 200
+    assert client.get('/metrics').status_code == 200
+    assert 'http_requests_shed_total{reason="queue_full"} 1' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_reads_and_writes_have_separate_budgets(app, db):  # noqa
+    client = enable(app, ADMISSION_WRITE_LIMIT=0, ADMISSION_QUEUE_SIZE=0)
+    assert client.post('/api/entity/', json=dict(name='Yin')).status_code == 503
+    assert client.get('/api/entity/').status_code == 200
+
+
+def test_slots_are_released(app, db):  # noqa
+    client = enable(app, ADMISSION_READ_LIMIT=1, ADMISSION_QUEUE_SIZE=0)
+    for _ in range(3):
+        assert client.get('/api/entity/').status_code == 200
+    assert app.extensions['admission'].reads.active == 0
+
+
+def test_requests_that_waited_too_long_are_rejected(app, db):  # noqa
+    client = enable(app, ADMISSION_MAX_QUEUE_TIME=1.0)
+    headers = {'X-Request-Start': f't={time.time() - 2:.3f}'}
+    assert client.get('/api/entity/', headers=headers).status_code == 503
+    headers = {'X-Request-Start': f't={time.time():.3f}'}
+    assert client.get('/api/entity/', headers=headers).status_code == 200
+
+
+def test_admission_control_is_disabled_by_default(app):  # noqa
+    assert 'admission' not in app.extensions
@@ -1,34 +1,157 @@
-import os
-import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from flask import request, current_app
-from jose import jwt
-from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError, JWKError
+from jose import jwk, jwt
+from jose.exceptions import JWTError, JWKError
 
-from app.api_response import ApiResponse
 from app.errors import ApiException
+from app.utils.metrics import add_auth_time, get_metrics
+
+
+class TokenVerifier(object):
+    """
+    Verifies `RS256` JWT tokens and remembers the result.
+
+    The public key is parsed once when the verifier is created. Verified
+    tokens are kept on a bounded LRU, indexed by their `sha256` digest, until
+    their `exp` claim is reached (or `ttl` seconds, whatever comes first), so
+    clients that reuse the same token don't pay for the RSA verification on
+    every request. Rejected tokens are remembered for `negative_ttl` seconds
+    so floods of bad tokens are also cheap.
+
+    Args:
+        public_key (str): PEM encoded public key.
+        audience (str): Expected audience of the tokens.
+        cache_size (int, optional): Maximum amount of remembered tokens. `0`
+            disables the cache.
+        ttl (float, optional): Maximum time in seconds a verified token is
+            remembered.
+        negative_ttl (float, optional): Time in seconds a rejected token is
+            remembered.
+    """
+
+    algorithm = 'RS256'
+
+    def __init__(self, public_key, audience, cache_size=1024, ttl=300, negative_ttl=5):
+        self.public_key = public_key
+        self.audience = audience
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.key = None
+        self.key_error = None
+        if public_key:
+            try:
+                # A JWK dictionary is rebuilt from its integers without
+                # parsing the PEM again on each `jwt.decode` call.
+                self.key = jwk.construct(public_key, self.algorithm).to_dict()
+            # pylint: disable=broad-except
+            except Exception as error:
+                # Each `jose` backend raises its own errors for malformed keys.
+                self.key_error = JWKError(error)
+        self._verified = OrderedDict()
+        self._rejected = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['PUBLIC_KEY'],
+            config['AUDIENCE'],
+            cache_size=config.get('AUTH_CACHE_SIZE', 1024),
+            ttl=config.get('AUTH_CACHE_TTL', 300),
+            negative_ttl=config.get('AUTH_NEGATIVE_CACHE_TTL', 5),
+        )
+
+    def verify(self, token):
+        """Verifies a token.
+
+        Args:
+            token (str): JWT token.
+
+        Returns:
+            `None` if the token is valid.
+
+        Raises:
+            ApiException: If the token is not valid.
+        """
+        if self.key is None:
+            raise ApiException(str(self.key_error), code='NotAuthorized')
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        if self.cache_size > 0:
+            with self._lock:
+                expires = self._verified.get(digest)
+                if expires is not None:
+                    if now < expires:
+                        self._verified.move_to_end(digest)
+                        return None
+                    del self._verified[digest]
+                rejected = self._rejected.get(digest)
+                if rejected is not None:
+                    if now < rejected[0]:
+                        raise ApiException(rejected[1])
+                    del self._rejected[digest]
+        try:
+            claims = jwt.decode(token, self.key, algorithms=[self.algorithm], audience=self.audience)
+        except (JWTError, JWKError) as error:
+            self._remember(self._rejected, digest, (now + self.negative_ttl, str(error)))
+            raise ApiException(str(error))
+        expires = now + self.ttl
+        if isinstance(claims.get('exp'), (int, float)):
+            expires = min(expires, claims['exp'])
+        self._remember(self._verified, digest, expires)
+        return None
+
+    def _remember(self, cache, digest, value):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            cache[digest] = value
+            cache.move_to_end(digest)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+            self._rejected.clear()
+
+
+def init_authorize(app):
+    """Creates the application's :class:`TokenVerifier`.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    app.extensions['authorize'] = TokenVerifier.from_config(app.config)
+
 
 def authorize(func):
     @wraps(func)
     def authorize_handler(*args, **kwargs):
-        public_key = current_app.config['PUBLIC_KEY']
-        audience = current_app.config['AUDIENCE']
+        verifier = current_app.extensions.get('authorize')
+        if verifier is None:
+            init_authorize(current_app)
+            verifier = current_app.extensions['authorize']
         token = request.headers.get('X-API-Key')
-        if not public_key:
+        if not verifier.public_key:
             raise ApiException(f'Public key is undefined', code='NotAuthorized')
-        if not audience:
+        if not verifier.audience:
             raise ApiException(f'Audience is undefined', code='NotAuthorized')
         if not token:
             raise ApiException(f'Authorization not found', code='NotAuthorized')
+        start = time.perf_counter()
         try:
-            jwt.decode(token, public_key, algorithms=['RS256'], audience=audience)
-        except JWTClaimsError as error:
-            raise ApiException(error)
-        except ExpiredSignatureError as error:
-            raise ApiException(error)
-        except JWTError as error:
-            raise ApiException(error)
-        except JWKError as error:
-            raise ApiException(error)
+            verifier.verify(token)
+        finally:
+            elapsed = time.perf_counter() - start
+            add_auth_time(elapsed)
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.observe('auth_verification_seconds', value=elapsed)
         return func(*args, **kwargs)
-    return authorize_handler
\ No newline at end of file
+    return authorize_handler
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+import pytest
+from jose import jwt
+
+from app.errors import ApiException
+from app.test.keys import generate_keypair, make_token
+from .authorize import TokenVerifier
+
+PUBLIC_KEY, PRIVATE_KEY = generate_keypair()
+
+
+@pytest.fixture
+def verifier():
+    return TokenVerifier(PUBLIC_KEY, 'api', cache_size=2)
+
+
+def test_verify_valid_token(verifier):
+    assert verifier.verify(make_token(PRIVATE_KEY)) is None
+
+
+def test_verify_invalid_audience(verifier):
+    with pytest.raises(ApiException):
+        verifier.verify(make_token(PRIVATE_KEY, audience='other'))
+
+
+def test_verify_expired_token(verifier):
+    with pytest.raises(ApiException):
+        verifier.verify(make_token(PRIVATE_KEY, expires_in=-10))
+
+
+def test_verify_caches_valid_tokens(verifier):
+    token = make_token(PRIVATE_KEY)
+    with patch('app.utils.authorize.jwt.decode', wraps=jwt.decode) as decode:
+        verifier.verify(token)
+        verifier.verify(token)
+        assert decode.call_count == 1
+
+
+def test_verify_caches_rejected_tokens(verifier):
+    token = make_token(PRIVATE_KEY, audience='other')
+    with patch('app.utils.authorize.jwt.decode', wraps=jwt.decode) as decode:
+        for _ in range(3):
+            with pytest.raises(ApiException):
+                verifier.verify(token)
+        assert decode.call_count == 1
+
+
+def test_verify_expires_cached_tokens(verifier):
+    token = make_token(PRIVATE_KEY, expires_in=1)
+    with patch('app.utils.authorize.jwt.decode', wraps=jwt.decode) as decode:
+        verifier.verify(token)
+        with patch('app.utils.authorize.time.time', return_value=make_expiration(token) + 1):
+            try:
+                verifier.verify(token)
+            except ApiException:
+                pass
+        assert decode.call_count == 2
+
+
+def test_verify_cache_is_bounded(verifier):
+    tokens = [make_token(PRIVATE_KEY, sub=str(index)) for index in range(3)]
+    with patch('app.utils.authorize.jwt.decode', wraps=jwt.decode) as decode:
+        for token in tokens:
+            verifier.verify(token)
+        verifier.verify(tokens[0])
+        assert decode.call_count == 4
+
+
+def test_verify_disabled_cache():
+    verifier = TokenVerifier(PUBLIC_KEY, 'api', cache_size=0)
+    token = make_token(PRIVATE_KEY)
+    with patch('app.utils.authorize.jwt.decode', wraps=jwt.decode) as decode:
+        verifier.verify(token)
+        verifier.verify(token)
+        assert decode.call_count == 2
+
+
+def test_verify_invalid_public_key():
+    verifier = TokenVerifier('not a key', 'api')
+    assert verifier.key_error is not None
+    with pytest.raises(ApiException):
+        verifier.verify(make_token(PRIVATE_KEY))
+
+
+def make_expiration(token):
+    return jwt.get_unverified_claims(token)['exp']
@@ -1,6 +1,15 @@
+from collections import OrderedDict
+from collections.abc import Iterator
+from flask import current_app
 from marshmallow import fields as marshmallow_fields, Schema
 from flask_restplus import fields as restplus_fields
 
+from app.errors import ApiException
+from app.utils.dumper import CompiledDumper
+from app.utils.filters import LIST_OPERATORS, SEPARATOR
+from app.utils.helpers import lazy_property
+from app.utils.metrics import add_serialization_time, start_serialization
+
 class BaseInterfaces(object):
     """
     This class simplifies the creation of `marshmallo` schemas, and 
@@ -20,26 +29,248 @@ class BaseInterfaces(object):
         update_model_keys (:list:str): List of field names that creates the entity's update model.
         create_model (flask_restplus.Namespace.model): Entity's create model.
         update_model (flask_restplus.Namespace.model): Entity's update model.
+        bulk_update_model (flask_restplus.Namespace.model): Entity's update model, including its `id`.
         model (flask_resplus.Namespace.model): Entity's model.
         single_response_model (flask_restplus.Namespace.model): Single entity's response model.
         many_response_model (flask_restplus.Namespace.model): Multiple entity's response model.
         error_response_model (flask_restplus.Namespace.model): Error response model.
+        bulk_response_model (flask_restplus.Namespace.model): Bulk operations response model.
+        dumper (CompiledDumper): Compiled serializer, or `None` if `compiled_dump` is `False`.
+        filters (dict): Allowed filters. Maps each field name to the list of
+            operators it can be filtered with, e.g. `dict(name=['eq', 'in'])`.
+            Every allowed filter should be backed by an index. Defaults to no
+            filters.
+        filter_params (dict): `flask_restplus` documentation of the allowed filters.
+        compiled_dump (bool): When `True`, `dump` uses a :class:`CompiledDumper`
+            generated from the `marshmallow` schema instead of the schema itself.
+            The output is the same, but it is faster on lists. Defaults to `False`.
+
+    The fields of each interfaces class are collected once, when the class is
+    defined. Schemas and models are built the first time they are used.
     """
 
+    compiled_dump = False
+    filters = {}
+    # Fields of the class sorted by name, collected when the class is defined
+    _fields = OrderedDict()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = OrderedDict(
+            (key, value) for key, value in ((key, getattr(cls, key)) for key in dir(cls) if not key.startswith('__'))
+            if type(value) is dict and (value.get('m') is not None or value.get('r') is not None)
+        )
+
     def __init__(self, api, name=''):
         self._api = api
         self.__name__ = getattr(self, '__name__', None) or name
-        self._schema = self.create_marshmallow_schema()
-        self.single_schema = self._schema()
-        self.many_schema = self._schema(many=True)
+        self._projections = {}
         self.create_model_keys = getattr(self, 'create_model_keys', None) or self.get_restplus_fields_keys()
-        self.create_model = self._api.model(self.__name__ + 'Create', self.get_restplus_fields(self.create_model_keys))
         self.update_model_keys = getattr(self, 'update_model_keys', None) or self.create_model_keys
-        self.update_model = self._api.model(self.__name__ + 'Update', self.get_restplus_fields(self.update_model_keys))
-        self.model = self._api.model(self.__name__, self.get_restplus_fields(self.get_restplus_fields_keys()))
-        self.single_response_model = self.create_single_response_model()
-        self.many_response_model = self.create_many_response_model()
-        self.error_response_model = self.create_error_response_model()
+
+    @lazy_property
+    def _schema(self):
+        return self.create_marshmallow_schema()
+
+    @lazy_property
+    def single_schema(self):
+        return self._schema()
+
+    @lazy_property
+    def many_schema(self):
+        return self._schema(many=True)
+
+    @lazy_property
+    def dumper(self):
+        return CompiledDumper(self.single_schema) if self.compiled_dump else None
+
+    @lazy_property
+    def create_model(self):
+        return self._api.model(self.__name__ + 'Create', self.get_restplus_fields(self.create_model_keys))
+
+    @lazy_property
+    def update_model(self):
+        return self._api.model(self.__name__ + 'Update', self.get_restplus_fields(self.update_model_keys))
+
+    @lazy_property
+    def bulk_update_model(self):
+        return self._api.model(self.__name__ + 'BulkUpdate', self.get_restplus_fields(['id'] + self.update_model_keys))
+
+    @lazy_property
+    def model(self):
+        return self._api.model(self.__name__, self.get_restplus_fields(self.get_restplus_fields_keys()))
+
+    @lazy_property
+    def single_response_model(self):
+        return self.create_single_response_model()
+
+    @lazy_property
+    def many_response_model(self):
+        return self.create_many_response_model()
+
+    @lazy_property
+    def error_response_model(self):
+        return self.create_error_response_model()
+
+    @lazy_property
+    def bulk_response_model(self):
+        return self.create_bulk_response_model()
+
+    @lazy_property
+    def filter_params(self):
+        return self.create_filter_params()
+
+    def dump(self, obj, many=False, fields=None):
+        """Serializes an entity, or a list of entities.
+
+        Args:
+            obj: Entity, or list of entities, to serialize. If `many` is `True`
+                and `obj` is an iterator, the entities are serialized lazily.
+            many (bool, optional): Whether `obj` is a list of entities.
+            fields (:obj:`list` of :obj:`str`, optional): Names of the fields to
+                include. Defaults to all the fields.
+
+        Returns:
+            The serialized data, or an iterator of serialized entities.
+        """
+        schema, dumper = self.get_serializer(fields)
+        if many and isinstance(obj, Iterator):
+            if dumper is not None:
+                return map(dumper.dump_one, obj)
+            return (schema.dump(item).data for item in obj)
+        start = start_serialization()
+        if dumper is not None:
+            data = dumper.dump(obj, many=many)
+        else:
+            data = schema.dump(obj, many=many).data
+        add_serialization_time(start)
+        return data
+
+    def load_many(self, json_data, with_id=False):
+        """Validates the list of entities sent to a bulk endpoint.
+
+        Args:
+            json_data: Request body. It must be a list of entities.
+            with_id (bool, optional): Whether each entity must include its `id`.
+
+        Returns:
+            A tuple with the list of `(index, data)` of the valid entities, and
+            the list of results of the invalid ones.
+
+        Raises:
+            ApiException: If the body is not a list, or it has more than
+                `BULK_MAX_ITEMS` items.
+        """
+        self.check_bulk_body(json_data, 'items')
+        items = []
+        errors = []
+        for index, value in enumerate(json_data):
+            data, error = self.single_schema.load(value)
+            if with_id and not error and not self.is_id(value.get('id')):
+                error = dict(id=['Missing or invalid id.'])
+            if error:
+                errors.append(dict(index=index, status=400, errors=error))
+                continue
+            if with_id:
+                data['id'] = value['id']
+            items.append((index, data))
+        return items, errors
+
+    def load_ids(self, json_data):
+        """Validates the list of ids sent to a bulk endpoint.
+
+        Args:
+            json_data: Request body. It must be a list of ids.
+
+        Returns:
+            A tuple with the list of `(index, id)` of the valid ids, and the
+            list of results of the invalid ones.
+
+        Raises:
+            ApiException: If the body is not a list, or it has more than
+                `BULK_MAX_ITEMS` ids.
+        """
+        self.check_bulk_body(json_data, 'ids')
+        items = []
+        errors = []
+        for index, value in enumerate(json_data):
+            if self.is_id(value):
+                items.append((index, value))
+            else:
+                errors.append(dict(index=index, status=400, errors=dict(id=['Invalid id.'])))
+        return items, errors
+
+    @staticmethod
+    def check_bulk_body(json_data, kind):
+        if not isinstance(json_data, list):
+            raise ApiException(f'The body must be a list of {kind}', code='InvalidBody')
+        limit = current_app.config['BULK_MAX_ITEMS']
+        if len(json_data) > limit:
+            raise ApiException(f'Too many {kind}, the limit is {limit}', code='TooManyItems')
+
+    @staticmethod
+    def is_id(value):
+        return type(value) is int and value > 0
+
+    def get_serializer(self, fields=None):
+        """Returns the `marshmallow` schema and the compiled dumper that serialize
+        only the given fields. They are created once for each set of fields.
+
+        Args:
+            fields (:obj:`list` of :obj:`str`, optional): Names of the fields to
+                include. Defaults to all the fields.
+
+        Returns:
+            A tuple with the `marshmallow.Schema` instance and the
+            :class:`CompiledDumper`, or `None` if `compiled_dump` is `False`.
+        """
+        if not fields:
+            return self.single_schema, self.dumper
+        key = tuple(sorted(set(fields)))
+        serializer = self._projections.get(key)
+        if serializer is None:
+            self.get_fields_attributes(key)
+            schema = self._schema(only=key)
+            serializer = (schema, CompiledDumper(schema) if self.compiled_dump else None)
+            self._projections[key] = serializer
+        return serializer
+
+    @classmethod
+    def get_fields_attributes(cls, fields):
+        """Maps interface field names to the model attributes they are read from,
+        e.g. `camelCase` to `snake_case`.
+
+        Args:
+            fields (:obj:`list` of :obj:`str`): Names of the fields.
+
+        Returns:
+            The list of attribute names.
+
+        Raises:
+            ApiException: If a field is not a `marshmallow` field of the interface.
+        """
+        attributes = []
+        for field in fields:
+            value = cls._fields.get(field)
+            if value is None or value.get('m') is None:
+                raise ApiException(f'Unknown field {field}', code='InvalidField')
+            attributes.append(value['m'].attribute or field)
+        return attributes
+
+    def create_filter_params(self):
+        """Documents each allowed filter as a query parameter.
+
+        Returns:
+            A dictionary to use with `api.doc(params=...)`.
+        """
+        params = {}
+        for field, operators in sorted(self.filters.items()):
+            for operator in operators:
+                description = f'Filters `{field}` with the `{operator}` operator.'
+                if operator in LIST_OPERATORS:
+                    description += ' Takes a comma separated list of values.'
+                params[f'{field}{SEPARATOR}{operator}'] = dict(description=description)
+        return params
 
     def get_restplus_fields(self, keys):
         """Returns a dictionary of `flask_restplus fields.
@@ -51,7 +282,7 @@ class BaseInterfaces(object):
             A dictionary with its keys as the names of the wanted `flask_restplus``
             fields, and its values with their configuration.
         """
-        return {key: getattr(self, key).get('r') for key in self.get_restplus_fields_keys() if key in keys}
+        return {key: value['r'] for key, value in self._fields.items() if value.get('r') is not None and key in keys}
 
     def get_restplus_fields_keys(self):
         """Gets the list of the `flask_restplus` configured fields.
@@ -59,10 +290,7 @@ class BaseInterfaces(object):
         Returns:
             The list of `flask_restplus` fields.
         """
-        return [field for field in self.attributes() if
-            type(getattr(self, field)) is dict
-            and getattr(self, field).get('r') is not None
-        ]
+        return [key for key, value in self._fields.items() if value.get('r') is not None]
 
     def get_marshmallow_fields_keys(self):
         """Gets the list of the `marshmallow` configured fields.
@@ -70,10 +298,7 @@ class BaseInterfaces(object):
         Returns:
             The list of `marshmallow` fields.
         """
-        return [field for field in self.attributes() if
-            type(getattr(self, field)) is dict
-            and getattr(self, field).get('m') is not None
-        ]
+        return [key for key, value in self._fields.items() if value.get('m') is not None]
 
     def attributes(self):
         """
@@ -109,8 +334,8 @@ class BaseInterfaces(object):
         Returns:
             A `marshmallow.Schema` class.
         """
-        fields_keys = self.get_marshmallow_fields_keys()
-        return type(self.__name__ + 'MarshmallowSchema', (Schema,), {field_key: getattr(self, field_key).get('m') for field_key in fields_keys})
+        return type(self.__name__ + 'MarshmallowSchema', (Schema,),
+            {key: value['m'] for key, value in self._fields.items() if value.get('m') is not None})
 
     def create_single_response_model(self):
         """Creates the single response model.
@@ -131,11 +356,32 @@ class BaseInterfaces(object):
         return self._api.model(self.__name__ + 'ManyResponse', dict(
             items=restplus_fields.List(restplus_fields.Nested(self.model)),
             count=restplus_fields.Integer,
+            total=restplus_fields.Integer(description='Total amount of items. Only included when `total=true`.'),
+            missing=restplus_fields.List(restplus_fields.Integer,
+                description='Requested `ids` that don\'t exist. Only included when `ids` are requested.'),
             current=restplus_fields.Url(example="https://api/example/?page=2&per_page=10&order_by=id&order_dir=asc"),
             prev=restplus_fields.Url(example="https://api/example/?page=1&per_page=10&order_by=id&order_dir=asc"),
             next=restplus_fields.Url(example="https://api/example/?page=3&per_page=10&order_by=id&order_dir=asc")
         ))
 
+    def create_bulk_response_model(self):
+        """Creates the bulk operations response model.
+
+        Returns:
+            A `flask_resplus.Namespace.model` with the result of each item of a
+            bulk operation.
+        """
+        result = self._api.model(self.__name__ + 'BulkResult', dict(
+            index=restplus_fields.Integer(description='Position of the item on the request body', example=0),
+            id=restplus_fields.Integer(description='Identifier of the item, when known', example=123),
+            status=restplus_fields.Integer(description='HTTP status of the item operation', example=201),
+            errors=restplus_fields.Raw(description='Validation errors of the item'),
+        ))
+        return self._api.model(self.__name__ + 'BulkResponse', dict(
+            items=restplus_fields.List(restplus_fields.Nested(result)),
+            count=restplus_fields.Integer,
+        ))
+
     def create_error_response_model(self):
         """Creates the error response model
         
@@ -2,6 +2,8 @@ import inspect
 import pytest
 from flask_restplus import Namespace
 
+from app.errors import ApiException
+from app.test.fixtures import app  # noqa
 from .base_interfaces import BaseInterfaces, marshmallow_fields, restplus_fields
 
 class ChildInterfaces(BaseInterfaces):
@@ -92,8 +94,81 @@ def test_single_response_model_is_valid(child):
 
 def test_many_response_model_is_valid(child):
     print(child.many_response_model)
-    assert str(child.many_response_model) == 'Model(TestManyResponse,{items,count,current,prev,next})'
+    assert str(child.many_response_model) == 'Model(TestManyResponse,{items,count,total,missing,current,prev,next})'
 
 def test_error_response_model_is_valid(child):
     print(child.error_response_model)
-    assert str(child.error_response_model) == 'Model(TestErrorResponse,{message})'
\ No newline at end of file
+    assert str(child.error_response_model) == 'Model(TestErrorResponse,{message})'
+
+def test_dump_uses_marshmallow_by_default(child):
+    assert child.dumper is None
+    assert child.dump(dict(id=1)) == dict(id=1, admin=False)
+    assert child.dump([dict(id=1)], many=True) == [dict(id=1, admin=False)]
+
+def test_compiled_dump_matches_marshmallow(api):
+    class CompiledChildInterfaces(ChildInterfaces):
+        compiled_dump = True
+    compiled = CompiledChildInterfaces(api)
+    values = [
+        dict(id='not an int'),
+        dict(id=1),
+        dict(id=1, first_name='Example', admin=True),
+        dict(id='2', first_name=3, admin='no'),
+        dict(admin=None),
+    ]
+    assert compiled.dumper is not None
+    for value in values:
+        assert compiled.dump(value) == compiled.single_schema.dump(value).data
+    assert compiled.dump(values, many=True) == compiled.many_schema.dump(values).data
+
+def test_dump_only_requested_fields(child):
+    value = dict(id=1, first_name='Example', admin=True)
+    assert child.dump(value, fields=['firstName']) == dict(firstName='Example')
+    assert child.dump([value], many=True, fields=['id', 'admin']) == [dict(id=1, admin=True)]
+
+def test_dump_unknown_field(child):
+    with pytest.raises(ApiException):
+        child.dump(dict(id=1), fields=['unknown'])
+
+def test_get_fields_attributes(child):
+    assert child.get_fields_attributes(['firstName', 'admin']) == ['first_name', 'admin']
+
+def test_load_many(app, child):
+    with app.app_context():
+        items, errors = child.load_many([dict(firstName='Yin', admin=False), dict(firstName=3), dict(admin=True)])
+        assert items == [(0, dict(first_name='Yin', admin=False)), (2, dict(admin=True))]
+        assert [error['index'] for error in errors] == [1]
+        assert errors[0]['status'] == 400
+
+def test_load_many_with_id(app, child):
+    with app.app_context():
+        items, errors = child.load_many([dict(id=1, admin=True), dict(admin=False), dict(id='1')], with_id=True)
+        assert items == [(0, dict(id=1, admin=True))]
+        assert [error['index'] for error in errors] == [1, 2]
+
+def test_load_ids(app, child):
+    with app.app_context():
+        items, errors = child.load_ids([1, 'a', 3, None])
+        assert items == [(0, 1), (2, 3)]
+        assert [error['index'] for error in errors] == [1, 3]
+
+@pytest.mark.parametrize('body', [None, dict(id=1), list(range(10001))])
+def test_load_many_invalid_body(app, child, body):
+    with app.app_context():
+        with pytest.raises(ApiException):
+            child.load_many(body)
+
+def test_filter_params(api):
+    class FilteredInterfaces(ChildInterfaces):
+        filters = dict(firstName=['eq', 'in'])
+    assert list(FilteredInterfaces(api).filter_params) == ['firstName__eq', 'firstName__in']
+
+def test_fields_are_collected_on_class_definition():
+    assert list(ChildInterfaces._fields) == ['admin', 'firstName', 'id']
+    assert BaseInterfaces._fields == {}
+
+def test_schemas_are_built_on_first_use(api):
+    child = ChildInterfaces(api)
+    assert '_schema' not in vars(child) and 'model' not in vars(child)
+    assert child.single_schema is child.single_schema
+    assert '_schema' in vars(child)
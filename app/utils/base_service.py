@@ -1,4 +1,25 @@
+import time
+from collections import OrderedDict
+from flask import current_app, g
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+
 from app import db
+from app.api_response import ApiResponse, make_etag
+from app.errors import ApiException
+from app.utils.pagination import (
+    Cursor,
+    keyset_cursors,
+    keyset_paginate,
+    keyset_query,
+    offset_paginate,
+    row_counts,
+    stream_rows,
+)
+from app.utils.cache import flights, generations, revalidations
+from app.utils.filters import compile_filter, parse_filter
+from app.utils.metadata import get_metadata
 from app.utils.query import Query
 
 class BaseService:
@@ -6,33 +27,489 @@ class BaseService:
     model = None
     # The interface must be configured for each service
     interfaces = None
+    # Optional cache of serialized items, e.g. `LRUCache(max_size=1024, ttl=60)`.
+    # Each hit is checked against the current `ETag` of the item
+    cache = None
+    # Optional cache of serialized pages of items. Pages are served for up
+    # to `LIST_CACHE_MAX_AGE` seconds after writes made by other processes
+    list_cache = None
+    # Serve stale pages from `list_cache` while one request rebuilds them
+    stale_while_revalidate = False
+    # Concurrent identical reads share one query and its serialized result
+    single_flight = False
+    # Pagination values stored on `g` by `get_all`, cached with each page
+    list_state = ('has_next', 'next_cursor', 'prev_cursor', 'total', 'missing', 'etag')
+    # Query metadata of the model, built once when the service is defined
+    metadata = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model is not None:
+            cls.metadata = get_metadata(cls.model, cls.interfaces)
 
     @classmethod
     def get_all(cls):
         """
         Returns all the items paginated. The `page`, `per_page`, and `max_per_page`
         are gotten from Flask scope.
+
+        The requested filters are applied, and `order_by` can list many
+        columns separated by commas.
+
+        When `pagination` is `cursor` the page is fetched by seeking on
+        `(order_by, id)` instead, and the cursors of the adjacent pages are
+        stored on `g.next_cursor` and `g.prev_cursor`. When it is `offset` the
+        rows are not counted, and `g.has_next` tells if there is a next page.
+        If `total` is requested, the cached row count is stored on `g.total`.
+        The `ETag` of the page is stored on `g.etag`.
+
+        When `stream` is requested the rows are returned as a lazy iterator
+        that fetches them from the database in chunks, and the pagination
+        values are stored on `g` once the iterator is exhausted.
+
+        When `ids` are requested those items are returned instead of a page,
+        and the ids that don't exist are stored on `g.missing`.
         """
-        query = cls.model.query
-        order_by = Query.get_param('order_by')
-        order_dir = Query.get_param('order_dir')
-        table_name = cls.model.__tablename__
-        columns = [column.name for column in cls.model.metadata.tables[table_name].columns]
-        if order_by is not None and order_by in columns:
-            if order_dir == 'desc':
-                query = query.order_by(getattr(cls.model, order_by).desc())
+        db.use_replica()
+        ids = cls.get_ids()
+        if ids is not None:
+            items, g.missing = cls.get_many(ids)
+            g.etag = cls.get_list_etag(items)
+            return items
+        metadata = cls.metadata
+        order_by = cls.get_order_by(metadata.column_set)
+        pagination = Query.get_param('pagination')
+        stream = Query.get_bool_param('stream')
+        if pagination == 'cursor':
+            # The ordering of a followed cursor comes from the cursor itself
+            cursor = cls.get_cursor(order_by)
+            query = cls.apply_filters(cls.project(cls.model.query, cursor.columns))
+            items = cls.get_all_by_cursor(query, cursor, stream)
+        else:
+            query = cls.apply_filters(cls.project(cls.model.query, order_by))
+            if order_by:
+                descending = Query.get_param('order_dir') == 'desc'
+                query = query.order_by(*[metadata.order(column, descending) for column in order_by])
+            if pagination == 'offset' or stream:
+                items = cls.get_all_by_offset(query, stream)
             else:
-                query = query.order_by(getattr(cls.model, order_by).asc())
-        return query.paginate(
-            page=Query.get_param('page'),
-            per_page=Query.get_param('per_page'),
-            error_out=False,
-            max_per_page=Query.get_param('max_per_page')
-        ).items
+                items = query.paginate(
+                    page=Query.get_int_param('page'),
+                    per_page=Query.get_int_param('per_page'),
+                    error_out=False,
+                    max_per_page=Query.get_int_param('max_per_page')
+                ).items
+        if Query.get_bool_param('want_total'):
+            filters = cls.get_filters()
+            g.total = row_counts.get(
+                (metadata.table_name,) + filters if filters else metadata.table_name,
+                cls.apply_filters(cls.model.query),
+                current_app.config['TOTAL_COUNT_TTL'],
+            )
+        if isinstance(items, list):
+            g.etag = cls.get_list_etag(items)
+        return items
+
+    @classmethod
+    def get_serialized_all(cls, interfaces):
+        """
+        Returns the serialized page of items, reading it from `cls.list_cache`
+        when the service has one. Pages are cached along with the pagination
+        values of `g`, and are stale once the table is written by this
+        process, or `LIST_CACHE_MAX_AGE` seconds after they were built, which
+        bounds how long the writes of other processes go unseen. Pages read
+        from a replica are not cached, and clients that must see their own
+        writes skip the cache. With
+        `stale_while_revalidate` a stale page is still served while a single
+        request rebuilds it. With `single_flight` concurrent requests for the
+        same page share its query. Streamed responses are never cached.
+
+        Without a cache, serialization is skipped when the request will be
+        answered with a `304 Not Modified`.
+
+        Args:
+            interfaces (BaseInterfaces): Interfaces used to serialize the items.
+
+        Returns:
+            The list of serialized items, or an iterator when streaming.
+        """
+        fields = Query.get_list_param('fields')
+        if (cls.list_cache is None and not cls.single_flight) or Query.get_bool_param('stream'):
+            items = cls.get_all()
+            if isinstance(items, list) and ApiResponse.not_modified():
+                return []
+            return interfaces.dump(items, many=True, fields=fields)
+        key = cls.get_list_cache_key()
+        generation = generations.get(cls.metadata.table_name)
+        if cls.list_cache is None or cls.reads_own_writes():
+            return cls.build_list_cache_entry(key, generation, interfaces, fields)
+        entry = cls.list_cache.get(key)
+        if entry is not None and entry['generation'] == generation \
+                and time.monotonic() - entry['built_at'] < current_app.config['LIST_CACHE_MAX_AGE']:
+            return cls.use_list_cache_entry(entry)
+        if entry is not None and cls.stale_while_revalidate:
+            if not revalidations.start(key):
+                return cls.use_list_cache_entry(entry)
+            try:
+                return cls.build_list_cache_entry(key, generation, interfaces, fields)
+            finally:
+                revalidations.finish(key)
+        return cls.build_list_cache_entry(key, generation, interfaces, fields)
+
+    @staticmethod
+    def use_list_cache_entry(entry):
+        for name, value in entry['state'].items():
+            setattr(g, name, value)
+        return entry['items']
+
+    @classmethod
+    def build_list_cache_entry(cls, key, generation, interfaces, fields):
+        def read():
+            items = interfaces.dump(cls.get_all(), many=True, fields=fields)
+            state = {name: g.get(name, None) for name in cls.list_state if g.get(name, None) is not None}
+            return dict(items=items, generation=generation, state=state, built_at=time.monotonic())
+        entry, shared = cls.coalesce(('list',) + key, read)
+        if shared:
+            return cls.use_list_cache_entry(entry)
+        # Pages read from a lagging replica would hide the latest writes
+        if cls.list_cache is not None and not db.reading_replica() and not cls.reads_own_writes():
+            cls.list_cache.set(key, entry)
+        return entry['items']
+
+    @classmethod
+    def coalesce(cls, key, read):
+        """
+        Calls `read`, or with `single_flight` waits for the result of the
+        identical call of a concurrent request instead. The calls are
+        identified by `key` along with the generation of the table, so those
+        that start after a write don't share the result of one that started
+        before it, and with the bind they read from. Requests pinned to the
+        primary after a write never share results. Requests that wait more
+        than `SINGLE_FLIGHT_TIMEOUT` seconds make their own read.
+
+        Args:
+            key (tuple): Identifier of the read, e.g. the normalized query
+                parameters.
+            read (callable): Function that runs the read.
+
+        Returns:
+            A tuple with the result of `read`, and `True` if it was shared by
+            another request.
+        """
+        if not cls.single_flight or cls.reads_own_writes():
+            return read(), False
+        db.use_replica()
+        table = cls.metadata.table_name
+        return flights.do((table, generations.get(table), g.get('read_bind', None)) + key, read,
+            current_app.config['SINGLE_FLIGHT_TIMEOUT'])
+
+    @staticmethod
+    def reads_own_writes():
+        """
+        Returns `True` if the current request wrote, or its client is pinned
+        to the primary after a recent write, so its reads must not be served
+        from the caches of this process, which may not have seen the write.
+        """
+        return g.get('consistency_token', None) is not None or db.is_pinned()
+
+    @classmethod
+    def get_list_cache_key(cls):
+        """
+        Builds the `list_cache` key of the request from the normalized query
+        parameters, so equivalent requests share the same page.
+        """
+        order_by = tuple(cls.get_order_by(cls.metadata.column_set))
+        fields = Query.get_list_param('fields')
+        return (
+            cls.metadata.table_name,
+            Query.get_param('pagination'),
+            Query.get_param('cursor'),
+            max(Query.get_int_param('page'), 1),
+            cls.get_per_page(),
+            order_by,
+            ('desc' if Query.get_param('order_dir') == 'desc' else 'asc') if order_by else None,
+            tuple(sorted(set(fields))) if fields else None,
+            Query.get_bool_param('want_total'),
+            tuple(cls.get_ids() or ()),
+            cls.get_filters(),
+        )
+
+    @staticmethod
+    def get_list_etag(items):
+        """
+        Returns the `ETag` of a page of items, built from the `id` and
+        `version` of each item and the pagination values stored on `g`.
+        """
+        return make_etag(
+            [(item.id, item.version, item.updated_at) for item in items],
+            g.get('has_next', None),
+            g.get('next_cursor', None),
+            g.get('prev_cursor', None),
+            g.get('total', None),
+        )
+
+    @classmethod
+    def get_validators(cls, id: int):
+        """
+        Returns the `ETag` and `Last-Modified` values of an item, reading only
+        its `version` and `updated_at` columns.
+
+        Returns:
+            A tuple with both values, or `(None, None)` if the item doesn't
+            exist.
+        """
+        db.use_replica()
+        # pylint: disable=no-member
+        row = db.session.query(cls.model.version, cls.model.updated_at).filter(cls.model.id == id).first()
+        etag = make_etag(id, row.version, row.updated_at) if row is not None else None
+        # Reused to check the cached item
+        g.validators = (cls.metadata.table_name, id, etag)
+        if row is None:
+            return None, None
+        return etag, row.updated_at
+
+    @classmethod
+    def get_etag(cls, id: int):
+        """
+        Returns the current `ETag` of an item, reusing the one read by
+        `get_validators` on the current request, or `None` if the item
+        doesn't exist.
+        """
+        validators = g.get('validators', None)
+        if validators is not None and validators[:2] == (cls.metadata.table_name, id):
+            return validators[2]
+        return cls.get_validators(id)[0]
+
+    @classmethod
+    def get_many(cls, ids):
+        """
+        Returns the items with the given ids, fetched with one
+        `WHERE id IN (...)` query for each chunk of `BULK_CHUNK_SIZE` ids.
+
+        Args:
+            ids (:obj:`list` of :obj:`int`): Identifiers of the items.
+
+        Returns:
+            A tuple with the list of items, in the order of `ids` and without
+            duplicates, and the list of ids that don't exist.
+        """
+        query = cls.project(cls.model.query)
+        ids = list(OrderedDict.fromkeys(ids))
+        chunk_size = current_app.config['BULK_CHUNK_SIZE']
+        found = {}
+        for start in range(0, len(ids), chunk_size):
+            for item in query.filter(cls.model.id.in_(ids[start:start + chunk_size])):
+                found[item.id] = item
+        return [found[id] for id in ids if id in found], [id for id in ids if id not in found]
+
+    @staticmethod
+    def get_ids():
+        """
+        Returns the requested `ids` as a list of integers, or `None`.
+
+        Raises:
+            ApiException: If an id is not an integer, or there are more than
+                `BULK_MAX_ITEMS` ids.
+        """
+        values = Query.get_list_param('ids')
+        if values is None:
+            return None
+        limit = current_app.config['BULK_MAX_ITEMS']
+        if len(values) > limit:
+            raise ApiException(f'Too many ids, the limit is {limit}', code='TooManyItems')
+        try:
+            return [int(value) for value in values]
+        except ValueError:
+            raise ApiException(f'Invalid ids {Query.get_param("ids")}', code='InvalidId')
+
+    @staticmethod
+    def get_order_by(columns):
+        """Returns the requested `order_by` columns that exist on the model."""
+        order_by = Query.get_list_param('order_by') or []
+        return list(OrderedDict.fromkeys(column for column in order_by if column in columns))
+
+    @staticmethod
+    def get_filters():
+        """Returns the requested filters as a sorted tuple of `(name, value)`."""
+        return tuple(sorted((Query.get_param('filters') or {}).items()))
+
+    @classmethod
+    def apply_filters(cls, query):
+        """
+        Applies the requested filters to a query. Each filter must be allowed
+        by the `filters` of the interfaces.
+
+        Args:
+            query (flask_sqlalchemy.BaseQuery): Base query.
+
+        Raises:
+            ApiException: If a filter is not allowed or its value is not valid.
+        """
+        for name, value in cls.get_filters():
+            field, operator = parse_filter(name)
+            attribute, schema_field = cls.metadata.get_filter(field, operator)
+            query = query.filter(compile_filter(attribute, operator, value,
+                schema_field, current_app.config['BULK_MAX_ITEMS']))
+        return query
+
+    @classmethod
+    def project(cls, query, order_by=()):
+        """
+        Loads only the columns needed by the requested `fields`, mapping the
+        interface field names to the model attributes. The primary key, the
+        `version` validators and the `order_by` columns are always loaded.
+
+        Args:
+            query (flask_sqlalchemy.BaseQuery): Base query.
+            order_by (:obj:`list` of :obj:`str`, optional): Ordering columns.
+
+        Raises:
+            ApiException: If a requested field doesn't exist.
+        """
+        fields = Query.get_list_param('fields')
+        if not fields:
+            return query
+        attributes = set(cls.interfaces.get_fields_attributes(fields))
+        attributes.update(('id', 'version', 'updated_at'))
+        attributes.update(order_by)
+        return query.options(load_only(*[column for column in cls.metadata.columns if column in attributes]))
+
+    @staticmethod
+    def get_per_page(stream=False):
+        """
+        Returns the requested `per_page` limited by `max_per_page`, or by
+        `stream_max_per_page` when the response is streamed.
+        """
+        return Query.get_per_page(stream)
+
+    @classmethod
+    def get_all_by_offset(cls, query, stream=False):
+        """
+        Returns a page of items without counting the rows of the table.
+
+        Args:
+            query (flask_sqlalchemy.BaseQuery): Ordered query.
+            stream (bool, optional): Return a lazy iterator instead of a list.
+        """
+        page = max(Query.get_int_param('page'), 1)
+        per_page = cls.get_per_page(stream)
+        if stream:
+            def done(first, last, has_more):
+                g.has_next = has_more
+            query = query.offset((page - 1) * per_page)
+            return stream_rows(query, per_page, current_app.config['STREAM_CHUNK_SIZE'], done)
+        items, g.has_next = offset_paginate(query, page, per_page)
+        return items
+
+    @classmethod
+    def get_cursor(cls, order_by):
+        """
+        Returns the requested cursor, or a cursor to the first page sorted by
+        the requested ordering.
+
+        Args:
+            order_by (:obj:`list` of :obj:`str`): Requested ordering columns.
+
+        Raises:
+            ApiException: If the cursor is invalid, or it sorts by columns
+                that don't exist on the model.
+        """
+        token = Query.get_param('cursor')
+        if token is not None:
+            cursor = Cursor.decode(token)
+        else:
+            cursor = Cursor(','.join(order_by) or 'id', Query.get_param('order_dir'))
+        if not cls.metadata.column_set.issuperset(cursor.columns):
+            raise ApiException('Invalid cursor', code='InvalidCursor')
+        return cursor
+
+    @classmethod
+    def get_all_by_cursor(cls, query, cursor, stream=False):
+        """
+        Returns a page of items using keyset pagination.
+
+        Args:
+            query (flask_sqlalchemy.BaseQuery): Base query.
+            cursor (Cursor): Page cursor.
+            stream (bool, optional): Return a lazy iterator instead of a list.
+                Pages read backward are always returned as a list, since
+                their rows are fetched in reverse order.
+        """
+        per_page = cls.get_per_page(stream)
+        if stream and cursor.forward:
+            def done(first, last, has_more):
+                next_cursor, prev_cursor = keyset_cursors(cursor, first, last, has_more)
+                g.next_cursor = next_cursor.encode() if next_cursor is not None else None
+                g.prev_cursor = prev_cursor.encode() if prev_cursor is not None else None
+            query = keyset_query(query, cls.model, cursor)
+            return stream_rows(query, per_page, current_app.config['STREAM_CHUNK_SIZE'], done)
+        items, next_cursor, prev_cursor = keyset_paginate(query, cls.model, cursor, per_page)
+        g.next_cursor = next_cursor.encode() if next_cursor is not None else None
+        g.prev_cursor = prev_cursor.encode() if prev_cursor is not None else None
+        return items
 
     @classmethod
     def get_by_id(cls, id: int):
-        return cls.model.query.get(id)
+        """
+        Returns an item, loading only the columns needed by the requested
+        `fields`. On `GET` requests it is read from a replica.
+        """
+        db.use_replica()
+        return cls.project(cls.model.query).get(id)
+
+    @classmethod
+    def get_serialized_by_id(cls, id: int, interfaces):
+        """
+        Returns a serialized item, reading it from `cls.cache` when the
+        service has one. Only the full item is cached; requests for some
+        `fields` are served from it when it is cached. Cached items are
+        stored with their `ETag`, and are only served while it matches the
+        current one, so the writes of other processes are never hidden.
+        Items read from a replica are not cached, and clients that must see
+        their own writes skip the cache. With `single_flight` concurrent
+        requests for the same item share its query.
+
+        Args:
+            id (int): Identifier of the item.
+            interfaces (BaseInterfaces): Interfaces used to serialize the item.
+
+        Returns:
+            The serialized item.
+        """
+        fields = Query.get_list_param('fields')
+        if cls.cache is None and not cls.single_flight:
+            return interfaces.dump(cls.get_by_id(id), fields=fields)
+        if fields:
+            cls.interfaces.get_fields_attributes(fields)
+        use_cache = cls.cache is not None and not cls.reads_own_writes()
+        entry = cls.cache.get(id) if use_cache else None
+        if entry is not None and entry['etag'] == cls.get_etag(id):
+            item = entry['item']
+            return item if not fields else {key: value for key, value in item.items() if key in fields}
+
+        def read():
+            model = cls.get_by_id(id)
+            if model is None:
+                return interfaces.dump(model, fields=fields), None
+            return interfaces.dump(model, fields=fields), make_etag(id, model.version, model.updated_at)
+        (item, etag), shared = cls.coalesce(('item', id, tuple(sorted(set(fields))) if fields else None), read)
+        if use_cache and etag is not None and not shared and not fields and not db.reading_replica():
+            cls.cache.set(id, dict(item=item, etag=etag))
+        return item
+
+    @classmethod
+    def invalidate(cls, *ids):
+        """
+        Removes the given items from `cls.cache`, and makes the pages of
+        `cls.list_cache` stale. Called after every write, so it also pins the
+        next reads of the client to the primary.
+        """
+        db.record_write()
+        generations.bump(cls.metadata.table_name)
+        if cls.cache is None:
+            return
+        for id in ids:
+            cls.cache.delete(id)
 
     @classmethod
     def update(cls, id: int, body):
@@ -42,8 +519,11 @@ class BaseService:
             return None
         model.update({ key: body[key] for key in update_keys if key in body})
         #model.update({ key: value for key, value in body.items() if key in update_keys })
+        # Incremented by the database, so concurrent updates aren't lost.
+        model.version = cls.model.version + 1
         # pylint: disable=no-member
         db.session.commit()
+        cls.invalidate(id)
         return model
 
     @classmethod
@@ -55,6 +535,7 @@ class BaseService:
         db.session.delete(model)
         # pylint: disable=no-member
         db.session.commit()
+        cls.invalidate(id)
         return [id]
 
     @classmethod
@@ -66,4 +547,145 @@ class BaseService:
         db.session.add(model)
         # pylint: disable=no-member
         db.session.commit()
+        cls.invalidate(model.id)
         return model
+
+    @classmethod
+    def bulk_create(cls, items, return_ids=False):
+        """
+        Creates many items in a single transaction. Rows are written in
+        chunks of `BULK_CHUNK_SIZE` with `bulk_insert_mappings`, which uses
+        `executemany` unless `return_ids` is set.
+
+        Args:
+            items (:obj:`list` of :obj:`tuple`): List of `(index, body)`.
+            return_ids (bool, optional): Whether to fetch the `id` of the new
+                rows. It requires inserting them one at a time.
+
+        Returns:
+            The list of results of each item.
+        """
+        attributes = cls.interfaces.get_fields_attributes(cls.interfaces.create_model_keys)
+        mappings = [{key: body[key] for key in attributes if key in body} for _, body in items]
+        cls.bulk_write(mappings, lambda chunk: db.session.bulk_insert_mappings(
+            cls.model, chunk, return_defaults=return_ids))
+        cls.invalidate()
+        results = []
+        for (index, _), mapping in zip(items, mappings):
+            result = dict(index=index, status=201)
+            if return_ids:
+                result['id'] = mapping.get('id')
+            results.append(result)
+        return results
+
+    @classmethod
+    def bulk_update(cls, items):
+        """
+        Updates many items in a single transaction, with one `executemany`
+        per chunk of `BULK_CHUNK_SIZE` rows. The `version` of each item is
+        incremented.
+
+        Args:
+            items (:obj:`list` of :obj:`tuple`): List of `(index, body)`. Each
+                body must include the `id` of the item.
+
+        Returns:
+            The list of results of each item. Items that don't exist get a
+            `404` status.
+        """
+        attributes = cls.interfaces.get_fields_attributes(cls.interfaces.update_model_keys)
+        existing = cls.get_existing_ids([body['id'] for _, body in items])
+        mappings = []
+        results = []
+        for index, body in items:
+            if body['id'] not in existing:
+                results.append(dict(index=index, id=body['id'], status=404))
+                continue
+            mapping = {key: body[key] for key in attributes if key in body}
+            if mapping:
+                mapping['id'] = body['id']
+                mappings.append(mapping)
+            results.append(dict(index=index, id=body['id'], status=200))
+        cls.bulk_write(mappings, cls.update_rows)
+        cls.invalidate(*[mapping['id'] for mapping in mappings])
+        return results
+
+    @classmethod
+    def update_rows(cls, rows):
+        """
+        Updates rows with one `executemany` for each set of updated columns,
+        incrementing their `version`. Unlike `bulk_update_mappings`, the new
+        version is computed by the database.
+
+        Args:
+            rows (:obj:`list` of :obj:`dict`): Column values of each row,
+                including its `id`.
+        """
+        table = cls.model.__table__
+        groups = OrderedDict()
+        for row in rows:
+            params = {key: value for key, value in row.items() if key != 'id'}
+            params['_id'] = row['id']
+            groups.setdefault(tuple(sorted(params)), []).append(params)
+        for params in groups.values():
+            statement = table.update().where(table.c.id == bindparam('_id')).values(version=table.c.version + 1)
+            # pylint: disable=no-member
+            db.session.execute(statement, params)
+
+    @classmethod
+    def bulk_delete(cls, items):
+        """
+        Deletes many items in a single transaction, with one `DELETE` per
+        chunk of `BULK_CHUNK_SIZE` ids.
+
+        Args:
+            items (:obj:`list` of :obj:`tuple`): List of `(index, id)`.
+
+        Returns:
+            The list of results of each item. Items that don't exist get a
+            `404` status.
+        """
+        existing = cls.get_existing_ids([id for _, id in items])
+        cls.bulk_write(sorted(existing), lambda chunk: cls.model.query.filter(
+            cls.model.id.in_(chunk)).delete(synchronize_session=False))
+        cls.invalidate(*existing)
+        return [dict(index=index, id=id, status=204 if id in existing else 404) for index, id in items]
+
+    @classmethod
+    def get_existing_ids(cls, ids):
+        """
+        Returns the set of `ids` that exist on the table, querying them in
+        chunks of `BULK_CHUNK_SIZE`.
+        """
+        ids = list(set(ids))
+        chunk_size = current_app.config['BULK_CHUNK_SIZE']
+        existing = set()
+        for start in range(0, len(ids), chunk_size):
+            # pylint: disable=no-member
+            query = db.session.query(cls.model.id).filter(cls.model.id.in_(ids[start:start + chunk_size]))
+            existing.update(id for id, in query)
+        return existing
+
+    @staticmethod
+    def bulk_write(rows, write):
+        """
+        Calls `write` with chunks of `BULK_CHUNK_SIZE` rows and commits them
+        all in a single transaction. Nothing is written if a chunk fails.
+
+        Args:
+            rows (list): Rows to write.
+            write (callable): Writes a chunk of rows on the session.
+
+        Raises:
+            ApiException: If the database rejects the changes.
+        """
+        chunk_size = current_app.config['BULK_CHUNK_SIZE']
+        try:
+            for start in range(0, len(rows), chunk_size):
+                write(rows[start:start + chunk_size])
+            # pylint: disable=no-member
+            db.session.commit()
+        except SQLAlchemyError as error:
+            # pylint: disable=no-member
+            db.session.rollback()
+            raise ApiException(str(getattr(error, 'orig', None) or error), code='BulkWriteError')
@@ -0,0 +1,218 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Every cache created on this process, so they can be cleared together.
+caches = weakref.WeakSet()
+
+
+class LRUCache(object):
+    """
+    Per process, thread safe, least recently used cache whose entries expire
+    after `ttl` seconds.
+
+    Services use it to keep already serialized items. Any object with the same
+    `get`, `set`, `delete` and `clear` methods can take its place, e.g. one
+    backed by a shared store.
+
+    Args:
+        max_size (int, optional): Maximum amount of entries. The least
+            recently used entry is dropped when it is exceeded.
+        ttl (float, optional): Time in seconds an entry is kept. `None` keeps
+            them until they are dropped or deleted.
+
+    Attributes:
+        hits (int): Amount of `get` calls that found a value.
+        misses (int): Amount of `get` calls that didn't find a value.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        caches.add(self)
+
+    def get(self, key, default=None):
+        """Returns the value stored on `key`, or `default` if it is missing or
+        expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] is None or now < entry[1]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the size and the hit/miss counters of the cache.
+
+        Returns:
+            A dictionary with the `size`, `max_size`, `hits`, `misses` and
+            `hit_ratio` of the cache.
+        """
+        with self._lock:
+            size = len(self._entries)
+            hits = self.hits
+            misses = self.misses
+        lookups = hits + misses
+        return dict(
+            size=size,
+            max_size=self.max_size,
+            hits=hits,
+            misses=misses,
+            hit_ratio=hits / lookups if lookups else None,
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def clear_caches():
+    """Clears every :class:`LRUCache` of the process."""
+    for cache in list(caches):
+        cache.clear()
+
+
+class Generations(object):
+    """
+    Per process counters that change on every write to a table. Cached
+    values built from a table store the generation they were built on, so a
+    write makes them stale without having to find and delete them.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return self._values.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + 1
+
+
+class Revalidations(object):
+    """
+    Keys of the stale cache entries that are being rebuilt, so only one
+    request rebuilds each of them while the rest keep using the stale value.
+    """
+
+    def __init__(self):
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def start(self, key):
+        """Returns `True` if no other request is rebuilding `key`."""
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
+    def finish(self, key):
+        with self._lock:
+            self._keys.discard(key)
+
+
+class Flight(object):
+    """A call in progress, whose result is shared with the callers that
+    wait for it."""
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """
+    Per process registry of the calls in progress. Concurrent calls with the
+    same key run only once, and every caller gets the same result, or the
+    same exception. Calls that start once it finished run again.
+
+    Callers wait for the running call up to `timeout` seconds, and then make
+    their own call, so a stuck call can't hold every waiting thread.
+
+    Args:
+        timeout (float, optional): Maximum seconds a caller waits for the
+            running call. `None` waits until it finishes.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        """Calls `func`, unless a call with the same `key` is in progress,
+        in which case its result is awaited instead.
+
+        Args:
+            key (hashable): Identifier of the call.
+            func (callable): Function that makes the call.
+            timeout (float, optional): Overrides the `timeout` of the
+                registry.
+
+        Returns:
+            A tuple with the result, and `True` if it was shared by another
+            call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+            else:
+                flight.followers += 1
+        if not leader:
+            if not flight.done.wait(timeout if timeout is not None else self.timeout):
+                return func(), False
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = func()
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def __len__(self):
+        return len(self._flights)
+
+
+generations = Generations()
+revalidations = Revalidations()
+flights = SingleFlight()
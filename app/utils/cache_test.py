@@ -0,0 +1,134 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from .cache import Generations, LRUCache, Revalidations, SingleFlight, clear_caches
+
+
+def test_get_missing_key():
+    cache = LRUCache()
+    assert cache.get('key') is None
+    assert cache.get('key', 1) == 1
+    assert cache.misses == 2
+
+
+def test_set_and_get():
+    cache = LRUCache()
+    cache.set('key', dict(id=1))
+    assert cache.get('key') == dict(id=1)
+    assert cache.hits == 1
+
+
+def test_least_recently_used_entry_is_dropped():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire():
+    cache = LRUCache(ttl=10)
+    with patch('app.utils.cache.time.monotonic', return_value=100):
+        cache.set('key', 1)
+    with patch('app.utils.cache.time.monotonic', return_value=109):
+        assert cache.get('key') == 1
+    with patch('app.utils.cache.time.monotonic', return_value=110):
+        assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_delete():
+    cache = LRUCache()
+    cache.set('key', 1)
+    cache.delete('key')
+    cache.delete('missing')
+    assert cache.get('key') is None
+
+
+def test_stats():
+    cache = LRUCache(max_size=10)
+    assert cache.stats()['hit_ratio'] is None
+    cache.set('key', 1)
+    cache.get('key')
+    cache.get('missing')
+    assert cache.stats() == dict(size=1, max_size=10, hits=1, misses=1, hit_ratio=0.5)
+
+
+def test_clear_caches():
+    caches = [LRUCache(), LRUCache()]
+    for cache in caches:
+        cache.set('key', 1)
+    clear_caches()
+    assert all(len(cache) == 0 for cache in caches)
+
+
+def test_generations():
+    generations = Generations()
+    assert generations.get('entity') == 0
+    generations.bump('entity')
+    assert generations.get('entity') == 1
+    assert generations.get('other') == 0
+
+
+def test_revalidations():
+    revalidations = Revalidations()
+    assert revalidations.start('key') is True
+    assert revalidations.start('key') is False
+    revalidations.finish('key')
+    assert revalidations.start('key') is True
+
+
+def test_single_flight_shares_concurrent_calls():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do('key', slow)))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flights.do('key', slow)))
+    follower.start()
+    while not flights._flights['key'].followers:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(calls) == 1
+    assert sorted(results) == [('value', False), ('value', True)]
+    assert len(flights) == 0
+    # Later calls run again
+    assert flights.do('key', lambda: 'other') == ('other', False)
+
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do('key', lambda: int('invalid'))
+    assert len(flights) == 0
+
+
+def test_single_flight_waits_up_to_timeout():
+    flights = SingleFlight(timeout=0.01)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flights.do('key', lambda: release.wait(5)))
+    leader.start()
+    while 'key' not in flights._flights:
+        time.sleep(0.001)
+    assert flights.do('key', lambda: 'own') == ('own', False)
+    release.set()
+    leader.join()
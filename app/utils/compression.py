@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import io
+import zlib
+
+from flask import current_app, request
+
+from app.utils.cache import LRUCache
+
+
+def gzip_bytes(data, level=6):
+    """Compresses `data` with gzip. A fixed `mtime` keeps the output the same
+    on every process.
+
+    Args:
+        data (bytes): Data to compress.
+        level (int, optional): Compression level, from 1 to 9.
+
+    Returns:
+        The compressed bytes.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=level, mtime=0) as file:
+        file.write(data)
+    return buffer.getvalue()
+
+
+class Compressor(object):
+    """
+    Compresses response bodies with gzip when the client accepts it.
+
+    Bodies smaller than `min_size` are sent as they are, since compressing
+    them costs more CPU than the bytes it saves. Compressed bodies are kept on
+    a bounded cache indexed by the digest of the body, so pages served from
+    the response caches are only compressed once.
+
+    Args:
+        level (int, optional): Compression level, from 1 to 9.
+        min_size (int, optional): Minimum size in bytes of the compressed
+            bodies. `None` disables compression.
+        cache_size (int, optional): Maximum amount of cached compressed
+            bodies. `0` disables the cache.
+    """
+
+    def __init__(self, level=6, min_size=1024, cache_size=256):
+        self.level = level
+        self.min_size = min_size
+        self.cache = LRUCache(max_size=cache_size) if cache_size > 0 else None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            level=config.get('COMPRESS_LEVEL', 6),
+            min_size=config.get('COMPRESS_MIN_SIZE', 1024),
+            cache_size=config.get('COMPRESS_CACHE_SIZE', 256),
+        )
+
+    def accepts(self):
+        """Returns `True` if compression is enabled and the client of the
+        current request accepts gzip."""
+        return self.min_size is not None and request.accept_encodings['gzip'] > 0
+
+    def compress(self, data):
+        """Returns the gzip compressed `data`, reading it from the cache when
+        it was already compressed."""
+        if self.cache is None:
+            return gzip_bytes(data, self.level)
+        key = hashlib.md5(data).digest()
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = gzip_bytes(data, self.level)
+            self.cache.set(key, compressed)
+        return compressed
+
+    def compress_response(self, response):
+        """Compresses the body of a response if it is big enough and the
+        client accepts it.
+
+        The `ETag` of a compressed response is made weak, since its bytes
+        are not the ones of the uncompressed response.
+
+        Args:
+            response (flask.Response): Response with a buffered body.
+
+        Returns:
+            The same response.
+        """
+        if self.min_size is None or response.direct_passthrough:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        if not self.accepts():
+            return response
+        response.set_data(self.compress(data))
+        response.headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def compress_stream(self, chunks):
+        """Compresses a streamed body as it is generated. Each chunk is
+        flushed, so the client gets the items as soon as they are sent.
+
+        Args:
+            chunks (iterable): Chunks of the body, as `str` or `bytes`.
+
+        Yields:
+            The compressed chunks.
+        """
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def init_compression(app):
+    """Creates the application's :class:`Compressor`.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    app.extensions['compression'] = Compressor.from_config(app.config)
+
+
+def get_compressor():
+    """Returns the :class:`Compressor` of the current application."""
+    compressor = current_app.extensions.get('compression')
+    if compressor is None:
+        init_compression(current_app)
+        compressor = current_app.extensions['compression']
+    return compressor
@@ -0,0 +1,53 @@
+import gzip
+from flask import Response
+
+from app.test.fixtures import app  # noqa
+from .compression import Compressor, gzip_bytes
+
+
+def test_gzip_bytes():
+    data = b'{"items": []}' * 100
+    assert gzip.decompress(gzip_bytes(data)) == data
+    assert gzip_bytes(data) == gzip_bytes(data)
+
+
+def test_compress_is_cached():
+    compressor = Compressor(cache_size=10)
+    data = b'x' * 2000
+    assert compressor.compress(data) is compressor.compress(data)
+    assert compressor.cache.stats()['hits'] == 1
+
+
+def test_compress_response_threshold(app):  # noqa
+    compressor = Compressor(min_size=100)
+    with app.test_request_context('/', headers={'Accept-Encoding': 'gzip, deflate'}):
+        small = compressor.compress_response(Response(b'x' * 99))
+        assert 'Content-Encoding' not in small.headers
+        assert 'Vary' not in small.headers
+        big = compressor.compress_response(Response(b'x' * 100))
+        assert big.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(big.get_data()) == b'x' * 100
+
+
+def test_compress_response_without_accept_encoding(app):  # noqa
+    compressor = Compressor(min_size=10)
+    for headers in ({}, {'Accept-Encoding': 'gzip;q=0, deflate'}):
+        with app.test_request_context('/', headers=headers):
+            response = compressor.compress_response(Response(b'x' * 100))
+            assert 'Content-Encoding' not in response.headers
+            assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_compression_disabled(app):  # noqa
+    compressor = Compressor(min_size=None)
+    with app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+        assert not compressor.accepts()
+        response = compressor.compress_response(Response(b'x' * 10000))
+        assert 'Content-Encoding' not in response.headers
+
+
+def test_compress_stream():
+    chunks = ['{"items": [', '1, 2', ', 3', ']}']
+    compressed = list(Compressor().compress_stream(chunks))
+    assert len(compressed) == len(chunks) + 1
+    assert gzip.decompress(b''.join(compressed)) == b'{"items": [1, 2, 3]}'
@@ -0,0 +1,203 @@
+import random
+import time
+
+import click
+
+from flask import g, has_app_context, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+# Header and cookie that carry the consistency token of a client
+CONSISTENCY_HEADER = 'X-Consistency-Token'
+CONSISTENCY_COOKIE = 'consistency_token'
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Runs `PRAGMA name=value` for each of the `pragmas` on a SQLite
+    connection.
+
+    Args:
+        dbapi_connection (sqlite3.Connection): New connection.
+        pragmas (dict): PRAGMA values by name.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that runs the queries of the current request on the read replica
+    chosen by :meth:`Database.use_replica`. Flushes, and models with their
+    own `__bind_key__`, always use their regular bind.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_app_context():
+            bind = g.get('read_bind', None)
+            info = getattr(getattr(mapper, 'persist_selectable', None), 'info', {})
+            if bind is not None and info.get('bind_key') is None:
+                return self.db.get_engine(self.app, bind=bind)
+        return super().get_bind(mapper, clause)
+
+
+class Database(SQLAlchemy):
+    """
+    `flask_sqlalchemy.SQLAlchemy` extension that makes the pool options of
+    `SQLALCHEMY_ENGINE_OPTIONS` work on SQLite files, runs the
+    `SQLITE_PRAGMAS` of the config on each new SQLite connection, and routes
+    reads to the `READ_REPLICAS` binds.
+
+    SQLAlchemy opens a new connection to a SQLite file for every checkout
+    (`NullPool`). When a `pool_size` is configured a `QueuePool` is used
+    instead, and its connections are allowed to move between threads, since
+    the pool hands each one to a single thread at a time.
+
+    Reads go to a replica only on `GET` and `HEAD` requests whose client
+    hasn't written in the last `READ_YOUR_WRITES_WINDOW` seconds. After a
+    write the response carries a consistency token, as a header and as a
+    cookie, that pins the next reads of the client to the primary until the
+    window ends.
+    """
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.after_request(self.add_consistency_token)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def use_replica(self):
+        """Sends the remaining queries of the current request to one of the
+        `READ_REPLICAS`, if the request only reads and its client is not
+        pinned to the primary."""
+        if not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return
+        replicas = self.get_app().config['READ_REPLICAS']
+        if not replicas or g.get('read_bind', None) is not None:
+            return
+        # Writes of this request, or of the last seconds, must be visible
+        if g.get('consistency_token', None) is not None or self.is_pinned():
+            return
+        g.read_bind = random.choice(replicas)
+
+    def reading_replica(self):
+        """Returns `True` if the current request reads from a replica, whose
+        results may lag behind the primary."""
+        return has_app_context() and g.get('read_bind', None) is not None
+
+    def record_write(self):
+        """Sends the remaining queries of the current request to the primary,
+        and pins the next reads of the client to it."""
+        if not has_app_context():
+            return
+        g.read_bind = None
+        g.consistency_token = time.time() + self.get_app().config['READ_YOUR_WRITES_WINDOW']
+
+    def is_pinned(self):
+        """Returns `True` if the client sent a consistency token that has not
+        expired. Tokens further in the future than the window are ignored."""
+        if not has_request_context():
+            return False
+        token = request.headers.get(CONSISTENCY_HEADER) or request.cookies.get(CONSISTENCY_COOKIE)
+        if not token:
+            return False
+        try:
+            expires = float(token)
+        except ValueError:
+            return False
+        now = time.time()
+        return now < expires <= now + self.get_app().config['READ_YOUR_WRITES_WINDOW']
+
+    def add_consistency_token(self, response):
+        token = g.get('consistency_token', None)
+        if token is not None:
+            value = f'{token:.3f}'
+            response.headers[CONSISTENCY_HEADER] = value
+            response.set_cookie(CONSISTENCY_COOKIE, value, httponly=True,
+                max_age=self.get_app().config['READ_YOUR_WRITES_WINDOW'])
+        return response
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername != 'sqlite':
+            return
+        if sa_url.database not in (None, '', ':memory:') \
+                and app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_size'):
+            options['poolclass'] = QueuePool
+            options.setdefault('connect_args', {})['check_same_thread'] = False
+        if app.config.get('SQLITE_PRAGMAS'):
+            # Taken out of the options by `create_engine`
+            options['sqlite_pragmas'] = app.config['SQLITE_PRAGMAS']
+
+    def create_engine(self, sa_url, engine_opts):
+        pragmas = engine_opts.pop('sqlite_pragmas', None)
+        engine = super().create_engine(sa_url, engine_opts)
+        if pragmas:
+            @event.listens_for(engine, 'connect')
+            # pylint: disable=unused-variable
+            def connect(dbapi_connection, connection_record):
+                apply_pragmas(dbapi_connection, pragmas)
+        return engine
+
+    def sync_replicas(self, app):
+        """Copies the primary SQLite database over each of the `READ_REPLICAS`,
+        so a local replica catches up with the writes. Other databases
+        replicate on their own.
+
+        Args:
+            app (flask.Flask): Flask application.
+
+        Returns:
+            The list of synced bind names.
+        """
+        primary = self.get_engine(app)
+        synced = []
+        for name in app.config['READ_REPLICAS']:
+            replica = self.get_engine(app, bind=name)
+            if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+                continue
+            source = primary.raw_connection()
+            target = replica.raw_connection()
+            try:
+                source.connection.backup(target.connection)
+            finally:
+                target.close()
+                source.close()
+            synced.append(name)
+        return synced
+
+    def dispose_engines(self, app):
+        """Closes the pooled connections of the primary and every bind.
+        Called before and after forking the workers, so no process uses a
+        connection opened by another one.
+
+        Args:
+            app (flask.Flask): Flask application.
+        """
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            self.get_engine(app, bind=bind).dispose()
+
+
+def init_replica_sync(app, db):
+    """Registers the `flask replica-sync` command.
+
+    Args:
+        app (flask.Flask): Flask application.
+        db (Database): Database extension.
+    """
+    @app.cli.command('replica-sync')
+    # pylint: disable=unused-variable
+    def replica_sync():
+        """Copies the primary SQLite database over the local read replicas."""
+        for name in db.sync_replicas(app):
+            click.echo(f'Synced {name}')
@@ -0,0 +1,109 @@
+import sqlite3
+import time
+
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import db
+from app.test.fixtures import app  # noqa
+from .database import CONSISTENCY_COOKIE, CONSISTENCY_HEADER, apply_pragmas
+
+
+def configure(app, tmpdir, **config):  # noqa
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmpdir.join("app.db")}'
+    app.config.update(config)
+
+
+def test_apply_pragmas(tmpdir):
+    connection = sqlite3.connect(str(tmpdir.join('pragmas.db')))
+    apply_pragmas(connection, dict(journal_mode='WAL', busy_timeout=1234))
+    assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert connection.execute('PRAGMA busy_timeout').fetchone() == (1234,)
+
+
+def test_sqlite_pragmas_on_connect(app, tmpdir):  # noqa
+    configure(app, tmpdir, SQLITE_PRAGMAS=dict(busy_timeout=2000, journal_mode='WAL', synchronous='NORMAL'))
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.execute('PRAGMA busy_timeout').scalar() == 2000
+            assert connection.execute('PRAGMA synchronous').scalar() == 1
+
+
+def test_sqlite_pool_options(app, tmpdir):  # noqa
+    configure(app, tmpdir, SQLALCHEMY_ENGINE_OPTIONS=dict(pool_size=2, max_overflow=1, pool_pre_ping=True))
+    with app.app_context():
+        engine = db.engine
+        assert isinstance(engine.pool, QueuePool)
+        assert engine.pool.size() == 2
+        assert engine.execute('SELECT 1').scalar() == 1
+
+
+def test_sqlite_without_pool_options(app, tmpdir):  # noqa
+    configure(app, tmpdir)
+    with app.app_context():
+        assert isinstance(db.engine.pool, NullPool)
+
+
+def configure_replica(app, tmpdir):  # noqa
+    configure(app, tmpdir,
+        SQLALCHEMY_BINDS=dict(replica=f'sqlite:///{tmpdir.join("replica.db")}'),
+        READ_REPLICAS=['replica'])
+    with app.app_context():
+        db.create_all()
+        db.Model.metadata.create_all(db.get_engine(app, bind='replica'))
+
+
+def get_names(response):
+    return [item['name'] for item in response.get_json()['items']]
+
+
+def test_write_returns_consistency_token(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    client = app.test_client()
+    response = client.post('/api/entity/', json=dict(name='Yin', purpose='thing', camelCase='x'))
+    token = float(response.headers[CONSISTENCY_HEADER])
+    assert time.time() < token <= time.time() + app.config['READ_YOUR_WRITES_WINDOW']
+    assert CONSISTENCY_COOKIE in response.headers['Set-Cookie']
+
+
+def test_reads_after_write_use_primary(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    writer = app.test_client()
+    writer.post('/api/entity/', json=dict(name='Yin', purpose='thing', camelCase='x'))
+    # Other clients read from the lagging replica, whose pages are not cached
+    assert get_names(app.test_client().get('/api/entity/')) == []
+    # The cookie of the writer pins it to the primary
+    assert get_names(writer.get('/api/entity/')) == ['Yin']
+
+
+def test_reads_with_token_header_use_primary(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    response = app.test_client().post('/api/entity/', json=dict(name='Yin', purpose='thing', camelCase='x'))
+    headers = {CONSISTENCY_HEADER: response.headers[CONSISTENCY_HEADER]}
+    assert get_names(app.test_client().get('/api/entity/', headers=headers)) == ['Yin']
+
+
+def test_invalid_tokens_are_ignored(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    app.test_client().post('/api/entity/', json=dict(name='Yin', purpose='thing', camelCase='x'))
+    for token in ('invalid', str(time.time() - 1), str(time.time() + 3600)):
+        response = app.test_client().get('/api/entity/', headers={CONSISTENCY_HEADER: token})
+        assert get_names(response) == []
+
+
+def test_sync_replicas(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    app.test_client().post('/api/entity/', json=dict(name='Yin', purpose='thing', camelCase='x'))
+    assert db.sync_replicas(app) == ['replica']
+    assert get_names(app.test_client().get('/api/entity/')) == ['Yin']
+
+
+def test_dispose_engines(app, tmpdir):  # noqa
+    configure_replica(app, tmpdir)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(pool_size=2)
+    with app.app_context():
+        pool = db.engine.pool
+        replica_pool = db.get_engine(app, bind='replica').pool
+        db.dispose_engines(app)
+        assert db.engine.pool is not pool
+        assert db.get_engine(app, bind='replica').pool is not replica_pool
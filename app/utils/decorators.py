@@ -1,6 +1,7 @@
 import functools
-from flask import request
+from flask import g, request
 
+from app.api_response import ApiResponse
 from app.utils.query import Query
 
 def parse_query_parameters(f):
@@ -9,3 +10,23 @@ def parse_query_parameters(f):
     Query.parse_request(request)    
     return f(*args, **kwargs)
   return decorated_function
+
+def conditional(service):
+  """
+  Answers conditional requests with `304 Not Modified` before running the
+  view, using the validators returned by `service.get_validators`, which
+  should be cheaper than loading and serializing the item. The validators
+  are stored on `g` so `ApiResponse` adds them as headers.
+
+  Args:
+    service (BaseService): Service of the resource.
+  """
+  def decorator(f):
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+      g.etag, g.last_modified = service.get_validators(**kwargs)
+      if ApiResponse.not_modified():
+        return ApiResponse(None, 304)
+      return f(*args, **kwargs)
+    return decorated_function
+  return decorator
@@ -0,0 +1,138 @@
+from marshmallow import fields as marshmallow_fields, utils
+from marshmallow.exceptions import ValidationError
+from marshmallow.utils import missing
+
+
+def _get_value(obj, key):
+    """Same lookup as `marshmallow.utils.get_value`, with fast paths for plain
+    dictionaries and for objects that can't be indexed, like models."""
+    if type(obj) is dict and key in obj:
+        return obj[key]
+    if '.' in key or hasattr(type(obj), '__getitem__'):
+        return utils.get_value(key, obj)
+    try:
+        value = getattr(obj, key)
+    except AttributeError:
+        return missing
+    return value() if callable(value) else value
+
+
+def _serialize_number(value, field, name, obj):
+    if value is None:
+        return None
+    try:
+        return field.num_type(value)
+    except (TypeError, ValueError, OverflowError) as error:
+        raise ValidationError(str(error))
+
+
+def _serialize_string(value, field, name, obj):
+    if value is None or type(value) is str:
+        return value
+    return utils.ensure_text_type(value)
+
+
+def _serialize_boolean(value, field, name, obj):
+    if value is None:
+        return None
+    if value in field.truthy:
+        return True
+    if value in field.falsy:
+        return False
+    return bool(value)
+
+
+# Serializers that reproduce `Field._serialize` for the most common field types.
+# Any other field falls back to its own `_serialize` method.
+FAST_SERIALIZERS = {
+    marshmallow_fields.Integer: _serialize_number,
+    marshmallow_fields.Float: _serialize_number,
+    marshmallow_fields.String: _serialize_string,
+    marshmallow_fields.Boolean: _serialize_boolean,
+}
+
+
+def _serialize_field(value, field, name, obj):
+    return field._serialize(value, name, obj)
+
+
+def _serializer_for(field):
+    serializer = FAST_SERIALIZERS.get(type(field))
+    if serializer is None or getattr(field, 'as_string', False):
+        return _serialize_field
+    return serializer
+
+
+class CompiledDumper(object):
+    """
+    Serializes objects to plain dictionaries with the same output as
+    `marshmallow.Schema.dump(obj).data`.
+
+    The fields of the schema are resolved only once: output key, attribute
+    name, default value and serializer. Dumping an object is then a single
+    loop over that plan, without marshmallow's per field and per object
+    bookkeeping. As with marshmallow, fields that fail to serialize are left
+    out of the result.
+
+    Args:
+        schema (marshmallow.Schema): Schema instance to compile.
+    """
+
+    def __init__(self, schema):
+        self.plan = []
+        for name, field in schema.fields.items():
+            if getattr(field, 'load_only', False):
+                continue
+            attribute = field.attribute or name
+            self.plan.append((
+                field.dump_to or name,
+                attribute,
+                '.' not in attribute,
+                name,
+                field,
+                field.default,
+                _serializer_for(field),
+            ))
+
+    def dump(self, obj, many=False):
+        """Serializes an object, or a list of objects if `many` is `True`.
+
+        Args:
+            obj: Object, or list of objects, to serialize.
+            many (bool, optional): Whether `obj` is a collection.
+
+        Returns:
+            A dictionary, or a list of dictionaries.
+        """
+        if many and obj is not None:
+            dump_one = self.dump_one
+            return [dump_one(item) for item in obj]
+        return self.dump_one(obj)
+
+    def dump_one(self, obj):
+        # Plain dictionaries and the instance `__dict__` of objects that can't
+        # be indexed (loaded columns of a model) are read directly.
+        if type(obj) is dict:
+            values = obj
+        elif hasattr(type(obj), '__getitem__'):
+            values = None
+        else:
+            values = getattr(obj, '__dict__', None)
+        result = {}
+        for key, attribute, direct, name, field, default, serialize in self.plan:
+            if direct and values is not None and attribute in values:
+                value = values[attribute]
+                if values is not obj and callable(value):
+                    value = value()
+            else:
+                value = _get_value(obj, attribute)
+            if value is missing:
+                if default is missing:
+                    continue
+                result[key] = default() if callable(default) else default
+                continue
+            try:
+                result[key] = serialize(value, field, name, obj)
+            except ValidationError:
+                continue
+        return result
@@ -0,0 +1,88 @@
+import sys
+
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import and_
+
+from app.errors import ApiException
+
+
+def starts_with(column, value):
+    """
+    Rewrites a prefix match as the range `value <= column < next value`, so
+    it is an index range scan on every database. `LIKE 'value%'` only uses
+    an index on some databases and collations.
+    """
+    if value == '':
+        return column.isnot(None)
+    last = ord(value[-1])
+    if last == sys.maxunicode:
+        return column >= value
+    return and_(column >= value, column < value[:-1] + chr(last + 1))
+
+
+# Operators of the filter grammar. A filter is sent as `<field>__<operator>`,
+# e.g. `name__eq=Yin` or `id__in=1,2,3`.
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'in': lambda column, values: column.in_(values),
+    'startswith': starts_with,
+    # Can't be backed by a regular index, so it should only be allowed on
+    # small tables.
+    'contains': lambda column, value: column.contains(value, autoescape=True),
+}
+
+# Operators whose value is a comma separated list.
+LIST_OPERATORS = ('in',)
+
+SEPARATOR = '__'
+
+
+def parse_filter(name):
+    """Splits a filter parameter name into its field and operator.
+
+    Args:
+        name (str): Parameter name, e.g. `name__eq`.
+
+    Returns:
+        A tuple with the field name and the operator.
+
+    Raises:
+        ApiException: If the operator doesn't exist.
+    """
+    field, separator, operator = name.rpartition(SEPARATOR)
+    if not separator or not field or operator not in OPERATORS:
+        raise ApiException(f'Invalid filter {name}', code='InvalidFilter')
+    return field, operator
+
+
+def compile_filter(column, operator, value, field=None, max_values=None):
+    """Compiles a filter to a SQLAlchemy expression.
+
+    Args:
+        column (sqlalchemy.Column): Filtered column.
+        operator (str): One of the `OPERATORS`.
+        value (str): Raw value of the query parameter.
+        field (marshmallow.fields.Field, optional): Field used to deserialize
+            the value, e.g. to turn `id__gt=3` into an integer.
+        max_values (int, optional): Maximum amount of values of list operators.
+
+    Returns:
+        A SQLAlchemy boolean expression.
+
+    Raises:
+        ApiException: If the value can't be deserialized.
+    """
+    values = value.split(',') if operator in LIST_OPERATORS else [value]
+    if max_values is not None and len(values) > max_values:
+        raise ApiException(f'Too many values for {operator}, the limit is {max_values}', code='InvalidFilter')
+    if field is not None:
+        try:
+            values = [field.deserialize(item) for item in values]
+        except ValidationError as error:
+            raise ApiException(f'Invalid filter value {value}: {" ".join(error.messages)}', code='InvalidFilter')
+    return OPERATORS[operator](column, values if operator in LIST_OPERATORS else values[0])
@@ -0,0 +1,62 @@
+import pytest
+from marshmallow import fields
+
+from app.errors import ApiException
+from app.entity.model import Entity
+from app.test.fixtures import app, db  # noqa
+from .filters import compile_filter, parse_filter
+
+
+def seed(db):  # noqa
+    names = ['a', 'ab', 'abz', 'ac', 'b', None]
+    for index, name in enumerate(names):
+        db.session.add(Entity(id=index + 1, name=name, purpose='100%'))
+    db.session.commit()
+
+
+def names(db, expression):  # noqa
+    return [item.name for item in Entity.query.filter(expression).order_by(Entity.id)]
+
+
+def test_parse_filter():
+    assert parse_filter('name__eq') == ('name', 'eq')
+    assert parse_filter('snake__case__in') == ('snake__case', 'in')
+
+
+@pytest.mark.parametrize('name', ['name', 'name__', '__eq', 'name__unknown'])
+def test_parse_invalid_filter(name):
+    with pytest.raises(ApiException):
+        parse_filter(name)
+
+
+def test_compile_filter_comparisons(db):  # noqa
+    seed(db)
+    assert names(db, compile_filter(Entity.name, 'eq', 'ab')) == ['ab']
+    assert names(db, compile_filter(Entity.name, 'gt', 'ac')) == ['b']
+    assert names(db, compile_filter(Entity.name, 'lte', 'ab')) == ['a', 'ab']
+    assert names(db, compile_filter(Entity.name, 'in', 'a,b')) == ['a', 'b']
+
+
+def test_compile_filter_startswith(db):  # noqa
+    seed(db)
+    assert names(db, compile_filter(Entity.name, 'startswith', 'ab')) == ['ab', 'abz']
+    assert names(db, compile_filter(Entity.name, 'startswith', '')) == ['a', 'ab', 'abz', 'ac', 'b']
+    assert 'LIKE' not in str(compile_filter(Entity.name, 'startswith', 'ab'))
+
+
+def test_compile_filter_contains_escapes_wildcards(db):  # noqa
+    seed(db)
+    assert len(names(db, compile_filter(Entity.purpose, 'contains', '0%'))) == 6
+    assert names(db, compile_filter(Entity.purpose, 'contains', '1_')) == []
+
+
+def test_compile_filter_deserializes_values(db):  # noqa
+    seed(db)
+    assert names(db, compile_filter(Entity.id, 'in', '1,3', fields.Int())) == ['a', 'abz']
+    with pytest.raises(ApiException):
+        compile_filter(Entity.id, 'gt', 'x', fields.Int())
+
+
+def test_compile_filter_max_values():
+    with pytest.raises(ApiException):
+        compile_filter(Entity.id, 'in', '1,2,3', max_values=2)
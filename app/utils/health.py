@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+from flask import jsonify
+
+# Body of the liveness probe, built once
+LIVE_BODY = '{"ok":true}\n'
+
+
+class Readiness(object):
+    """
+    Checks whether the app can serve requests: the database answers, its
+    schema is at the `head` revision of the migrations, and the public key
+    used to verify tokens was parsed.
+
+    The result is kept for `ttl` seconds. Once it is older, the next call
+    still gets it while a background thread runs the checks again, so
+    frequent probes add no database load or latency to the requests.
+
+    Args:
+        app (flask.Flask): Flask application.
+        ttl (float, optional): Seconds the result of the checks is kept.
+    """
+
+    def __init__(self, app, ttl=5):
+        self.app = app
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.result = None
+        self.checked_at = None
+        self.refreshing = False
+        self._heads = None
+
+    @classmethod
+    def from_config(cls, app):
+        return cls(app, ttl=app.config['READINESS_TTL'])
+
+    def get(self):
+        """Returns the last result of the checks, running them if there is
+        none yet, and refreshing it in the background when it is stale.
+
+        Returns:
+            A tuple with `True` if every check passed, and a dictionary with
+            the result of each one.
+        """
+        with self.lock:
+            result = self.result
+            stale = result is not None and not self.refreshing \
+                and time.monotonic() - self.checked_at >= self.ttl
+            if stale:
+                self.refreshing = True
+        if result is None:
+            return self.refresh()
+        if stale:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return result
+
+    def refresh(self):
+        """Runs the checks and stores their result."""
+        checks = self.check()
+        result = (all(check['ok'] for check in checks.values()), checks)
+        with self.lock:
+            self.result = result
+            self.checked_at = time.monotonic()
+            self.refreshing = False
+        return result
+
+    def check(self):
+        """Runs every check, returning a dictionary with `ok` and the `error`
+        of the failed ones by name."""
+        checks = {}
+        with self.app.app_context():
+            for name, check in (('database', self.check_database), ('migrations', self.check_migrations),
+                    ('keys', self.check_keys)):
+                try:
+                    check()
+                    checks[name] = dict(ok=True)
+                # pylint: disable=broad-except
+                except Exception as error:
+                    checks[name] = dict(ok=False, error=str(error) or type(error).__name__)
+        return checks
+
+    def check_database(self):
+        from app import db
+        with db.get_engine(self.app).connect() as connection:
+            connection.execute('SELECT 1').scalar()
+
+    def check_migrations(self):
+        """Compares the revision of the database with the `head` of the
+        migrations of `ALEMBIC_CONFIG`. Skipped when it is `None`."""
+        path = self.app.config['ALEMBIC_CONFIG']
+        if path is None:
+            return
+        from alembic.runtime.migration import MigrationContext
+        from app import db
+        heads = self.get_heads(path)
+        with db.get_engine(self.app).connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+        if current != heads:
+            raise RuntimeError(f'Database at revision {",".join(sorted(current)) or "base"}, '
+                f'expected {",".join(sorted(heads))}')
+
+    def get_heads(self, path):
+        """Returns the `head` revisions of the migrations, read only once."""
+        if self._heads is None:
+            from alembic.config import Config
+            from alembic.script import ScriptDirectory
+            config = Config(path)
+            location = config.get_main_option('script_location')
+            # Relative to the configuration file, instead of the working directory
+            config.set_main_option('script_location', os.path.join(os.path.dirname(os.path.abspath(path)), location))
+            self._heads = set(ScriptDirectory.from_config(config).get_heads())
+        return self._heads
+
+    def check_keys(self):
+        verifier = self.app.extensions.get('authorize')
+        if verifier is None or not verifier.public_key or not verifier.audience:
+            raise RuntimeError('Public key or audience is undefined')
+        if verifier.key is None:
+            raise RuntimeError(f'Invalid public key: {verifier.key_error}')
+
+
+def init_health(app):
+    """Serves the liveness probe on `/livez`, and the readiness probe on
+    `/readyz`.
+
+    `/livez` does no work, so it only fails when the process can't answer.
+    `/readyz` answers with the cached :class:`Readiness` checks, and a `503`
+    when any of them failed.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    readiness = app.extensions['readiness'] = Readiness.from_config(app)
+
+    @app.route('/livez')
+    # pylint: disable=unused-variable
+    def livez():
+        return LIVE_BODY, 200, {'Content-Type': 'application/json'}
+
+    @app.route('/readyz')
+    # pylint: disable=unused-variable
+    def readyz():
+        ready, checks = readiness.get()
+        return jsonify(dict(ok=ready, checks=checks)), 200 if ready else 503
@@ -0,0 +1,85 @@
+import time
+from unittest.mock import patch
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.test.fixtures import app, client, db  # noqa
+from app.test.keys import generate_keypair
+from .authorize import TokenVerifier
+from .health import Readiness
+
+PUBLIC_KEY, _ = generate_keypair()
+
+
+def set_key(app):  # noqa
+    app.extensions['authorize'] = TokenVerifier(PUBLIC_KEY, 'api')
+
+
+def test_livez(client):  # noqa
+    response = client.get('/livez')
+    assert response.status_code == 200
+    assert response.get_json() == dict(ok=True)
+
+
+def test_readyz(app, client, db):  # noqa
+    set_key(app)
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json() == dict(ok=True, checks=dict(
+        database=dict(ok=True), migrations=dict(ok=True), keys=dict(ok=True)))
+
+
+def test_readyz_fails_without_database(app, client, tmpdir):  # noqa
+    set_key(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmpdir.join("missing", "app.db")}'
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    checks = response.get_json()['checks']
+    assert checks['database']['ok'] is False
+    assert 'unable to open database file' in checks['database']['error']
+    assert checks['keys'] == dict(ok=True)
+
+
+def test_readyz_fails_without_key(app, client, db):  # noqa
+    app.extensions['authorize'] = TokenVerifier('invalid', 'api')
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['keys']['ok'] is False
+
+
+def test_readiness_checks_migrations(app, db):  # noqa
+    set_key(app)
+    app.config['ALEMBIC_CONFIG'] = 'alembic.ini'
+    head = ScriptDirectory.from_config(Config('alembic.ini')).get_current_head()
+    readiness = Readiness(app)
+    ready, checks = readiness.refresh()
+    assert not ready
+    assert checks['migrations']['error'].startswith('Database at revision base')
+    # Not a model table, so `drop_all` doesn't remove it
+    db.session.execute('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)')
+    try:
+        db.session.execute('INSERT INTO alembic_version VALUES (:head)', dict(head=head))
+        db.session.commit()
+        assert readiness.refresh()[0]
+    finally:
+        db.session.execute('DROP TABLE alembic_version')
+        db.session.commit()
+
+
+def test_readiness_is_refreshed_in_background(app):  # noqa
+    readiness = Readiness(app, ttl=60)
+    with patch.object(Readiness, 'check', return_value=dict(database=dict(ok=True))) as check:
+        assert readiness.get() == (True, dict(database=dict(ok=True)))
+        assert readiness.get()[0]
+        assert check.call_count == 1
+        check.return_value = dict(database=dict(ok=False, error='down'))
+        readiness.checked_at -= 60
+        # The stale result is served while it is refreshed
+        assert readiness.get()[0]
+        deadline = time.monotonic() + 5
+        while readiness.refreshing:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        assert check.call_count == 2
+        assert not readiness.get()[0]
@@ -4,3 +4,21 @@ index_query_params = dict(
     page="Requested items page. Defaults to 1.",
     per_page="Ammount of items per page. Defaults to 20."
 )
+
+
+class lazy_property(object):
+    """
+    Property computed on first access and then stored on the instance, so it
+    is built only if it is used.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+        self.name = func.__name__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.func(obj)
+        return value
@@ -0,0 +1,85 @@
+import threading
+
+from app.errors import ApiException
+from app.utils.filters import SEPARATOR
+
+
+class ModelMetadata(object):
+    """
+    Query metadata of a model, computed once instead of on every request:
+    the column names, the attribute and the ordering expressions of each
+    column, the primary key, and the filters allowed by the interfaces.
+
+    SQLAlchemy expressions are immutable, so the same `asc()` and `desc()`
+    expressions can be reused by every query.
+
+    Args:
+        model (db.Model): Described model.
+        interfaces (BaseInterfaces, optional): Interfaces whose `filters` are
+            resolved to columns.
+
+    Attributes:
+        table_name (str): Name of the table of the model.
+        columns (tuple): Column names, in table order.
+        column_set (frozenset): Column names, for membership checks.
+        attributes (dict): Maps each column name to the model attribute.
+        ascending (dict): Maps each column name to its `asc()` expression.
+        descending (dict): Maps each column name to its `desc()` expression.
+        primary_key (str): Name of the primary key column.
+        filters (dict): Maps each filtered field to a tuple with the model
+            attribute, the `marshmallow` field and the set of operators.
+    """
+
+    def __init__(self, model, interfaces=None):
+        self.model = model
+        self.table_name = model.__tablename__
+        table = model.__table__
+        self.columns = tuple(column.name for column in table.columns)
+        self.column_set = frozenset(self.columns)
+        self.attributes = {name: getattr(model, name) for name in self.columns}
+        self.ascending = {name: attribute.asc() for name, attribute in self.attributes.items()}
+        self.descending = {name: attribute.desc() for name, attribute in self.attributes.items()}
+        self.primary_key = table.primary_key.columns.values()[0].name
+        self.filters = {}
+        for field, operators in (interfaces.filters if interfaces is not None else {}).items():
+            attribute = interfaces.get_fields_attributes([field])[0]
+            self.filters[field] = (self.attributes[attribute], getattr(interfaces, field)['m'], frozenset(operators))
+
+    def order(self, column, descending=False):
+        """Returns the prebuilt ordering expression of a column."""
+        return self.descending[column] if descending else self.ascending[column]
+
+    def get_filter(self, field, operator):
+        """Returns the model attribute and the `marshmallow` field of an
+        allowed filter.
+
+        Raises:
+            ApiException: If the filter is not allowed.
+        """
+        attribute, schema_field, operators = self.filters.get(field, (None, None, ()))
+        if operator not in operators:
+            raise ApiException(f'Filter {field}{SEPARATOR}{operator} is not allowed', code='InvalidFilter')
+        return attribute, schema_field
+
+
+_registry = {}
+_lock = threading.Lock()
+
+
+def get_metadata(model, interfaces=None):
+    """Returns the :class:`ModelMetadata` of a model, building it on the first
+    call.
+
+    Args:
+        model (db.Model): Described model.
+        interfaces (BaseInterfaces, optional): Interfaces whose `filters` are
+            included.
+    """
+    key = (model, interfaces)
+    metadata = _registry.get(key)
+    if metadata is None:
+        with _lock:
+            metadata = _registry.get(key)
+            if metadata is None:
+                metadata = _registry[key] = ModelMetadata(model, interfaces)
+    return metadata
@@ -0,0 +1,47 @@
+import pytest
+
+from app.errors import ApiException
+from app.entity.model import Entity
+from app.entity.interfaces import EntityInterfaces
+from app.entity.service import EntityService
+from .metadata import ModelMetadata, get_metadata
+
+
+def test_model_metadata():
+    metadata = ModelMetadata(Entity)
+    assert metadata.table_name == 'entity'
+    assert metadata.columns[0] == 'id'
+    assert {'name', 'purpose', 'version'} <= metadata.column_set
+    assert metadata.primary_key == 'id'
+    assert metadata.attributes['name'] is Entity.name
+    assert str(metadata.order('name')) == str(Entity.name.asc())
+    assert str(metadata.order('name', descending=True)) == str(Entity.name.desc())
+    assert metadata.filters == {}
+
+
+def test_model_metadata_filters():
+    metadata = ModelMetadata(Entity, EntityInterfaces)
+    attribute, field = metadata.get_filter('camelCase', 'in')
+    assert attribute is Entity.snake_case
+    assert field is EntityInterfaces.camelCase['m']
+    for field, operator in (('name', 'contains'), ('admin', 'eq')):
+        with pytest.raises(ApiException):
+            metadata.get_filter(field, operator)
+
+
+@pytest.mark.parametrize('filters', [dict(name=['eq'], purpose=[]), dict(purpose=[])])
+def test_model_metadata_filters_without_operators(filters):
+    class FilteredInterfaces(EntityInterfaces):
+        pass
+    FilteredInterfaces.filters = filters
+    metadata = ModelMetadata(Entity, FilteredInterfaces)
+    attribute, _, operators = metadata.filters['purpose']
+    assert attribute is Entity.purpose
+    assert operators == frozenset()
+    with pytest.raises(ApiException):
+        metadata.get_filter('purpose', 'eq')
+
+
+def test_get_metadata_is_built_once():
+    assert get_metadata(Entity) is get_metadata(Entity)
+    assert EntityService.metadata is get_metadata(Entity, EntityInterfaces)
@@ -0,0 +1,406 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds of the latency buckets
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# Upper bounds of the queries per request buckets
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Type, help and buckets of each metric
+METRICS = dict(
+    http_requests_total=(
+        'counter', 'Requests by route, method and status.', None),
+    http_requests_shed_total=(
+        'counter', 'Requests rejected by the admission control, by reason.', None),
+    http_request_duration_seconds=(
+        'histogram', 'Request latency by route and method.', LATENCY_BUCKETS),
+    http_request_db_queries=(
+        'histogram', 'Database queries per request by route and method.', QUERY_BUCKETS),
+    http_request_db_duration_seconds=(
+        'histogram', 'Time spent on database queries per request by route and method.', LATENCY_BUCKETS),
+    http_request_serialization_seconds=(
+        'histogram', 'Time spent serializing the response by route and method.', LATENCY_BUCKETS),
+    auth_verification_seconds=(
+        'histogram', 'Time spent verifying the `X-API-Key` token.', LATENCY_BUCKETS),
+)
+
+
+class RequestMetrics(object):
+    """Times accumulated by the current request.
+
+    Attributes:
+        profile: Object whose `add_statement` receives each query of a
+            profiled request, or `None`.
+        serializing (int): Depth of the serializations running, so queries
+            made while serializing are attributed to them.
+    """
+    __slots__ = ('start', 'status', 'queries', 'db_time', 'serialization_time', 'auth_time',
+        'profile', 'serializing')
+
+    def __init__(self, start):
+        self.start = start
+        self.status = 500
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.auth_time = 0.0
+        self.profile = None
+        self.serializing = 0
+
+
+class Metrics(object):
+    """
+    Counters and histograms of the application, rendered in the Prometheus
+    text format.
+
+    Each process keeps its values in memory, and when a `directory` is given
+    writes them to its own file at most once every `flush_interval` seconds.
+    Rendering flushes the values of the process and sums the files of every
+    process, so any uwsgi worker answers with the totals of all of them, and
+    a file only ever grows. The files of dead workers are kept, and named
+    with a random token besides the pid, so a worker that reuses the pid of
+    a dead one doesn't replace its file. The directory must be emptied when
+    the whole server restarts.
+
+    Args:
+        directory (str, optional): Directory shared by the worker processes.
+            `None` keeps the metrics of the current process only.
+        flush_interval (float, optional): Minimum seconds between writes of
+            the file of the process.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Held while writing the file, so threads don't write it at once
+        self.flush_lock = threading.Lock()
+        # `(name, labels)` to value, or to bucket counts plus sum and count
+        self.values = {}
+        self.flushed_at = 0.0
+        self.changed = False
+        # Pid and name of the file of the process, renamed after a fork
+        self.file_pid = None
+        self.file_name = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush_at_exit)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            directory=config.get('METRICS_DIR'),
+            flush_interval=config.get('METRICS_FLUSH_INTERVAL', 1.0),
+        )
+
+    def inc(self, name, labels=(), value=1):
+        """Increments a counter.
+
+        Args:
+            name (str): Name of the metric.
+            labels (tuple, optional): Pairs of label name and value.
+            value (float, optional): Amount to add.
+        """
+        with self.lock:
+            self._inc(name, labels, value)
+
+    def observe(self, name, labels=(), value=0.0):
+        """Adds a value to a histogram.
+
+        Args:
+            name (str): Name of the metric.
+            labels (tuple, optional): Pairs of label name and value.
+            value (float): Observed value.
+        """
+        with self.lock:
+            self._observe(name, labels, value)
+
+    def record_request(self, method, route, status, metrics, now):
+        """Records all the metrics of a request with a single lock."""
+        labels = (('method', method), ('route', route))
+        with self.lock:
+            self._inc('http_requests_total', labels + (('status', str(status)),), 1)
+            self._observe('http_request_duration_seconds', labels, now - metrics.start)
+            self._observe('http_request_db_queries', labels, metrics.queries)
+            self._observe('http_request_db_duration_seconds', labels, metrics.db_time)
+            self._observe('http_request_serialization_seconds', labels, metrics.serialization_time)
+        if self.directory and now - self.flushed_at >= self.flush_interval:
+            self.flush(now, blocking=False)
+
+    def _inc(self, name, labels, value):
+        key = (name, labels)
+        self.values[key] = self.values.get(key, 0) + value
+        self.changed = True
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        buckets = METRICS[name][2]
+        counts = self.values.get(key)
+        if counts is None:
+            # One count per bucket, `+Inf`, the sum and the count
+            counts = self.values[key] = [0] * (len(buckets) + 3)
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+        self.changed = True
+
+    def clear(self):
+        """Removes the values of every process. Called once when the server
+        starts, before the workers are forked."""
+        with self.lock:
+            self.values.clear()
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                os.remove(path)
+
+    def get_path(self):
+        """Returns the path of the file of the current process."""
+        pid = os.getpid()
+        if pid != self.file_pid:
+            self.file_pid = pid
+            self.file_name = f'{pid}-{uuid.uuid4().hex}.json'
+        return os.path.join(self.directory, self.file_name)
+
+    def snapshot(self):
+        """Returns the values of the process as a JSON serializable list."""
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return [[name, [list(label) for label in labels], list(value) if isinstance(value, list) else value]
+            for (name, labels), value in self.values.items()]
+
+    def flush(self, now=None, blocking=True):
+        """Writes the values of the process to its file, replacing it
+        atomically so readers never see a partial file.
+
+        Only one thread writes the file at a time.
+
+        Args:
+            now (float, optional): Current `time.perf_counter()`.
+            blocking (bool, optional): Whether to wait for a flush running on
+                another thread. Otherwise the values are left for the next
+                flush.
+        """
+        if not self.flush_lock.acquire(blocking):
+            return
+        try:
+            self.flushed_at = now or time.perf_counter()
+            if not self.directory:
+                return
+            with self.lock:
+                if not self.changed:
+                    return
+                self.changed = False
+                snapshot = self._snapshot()
+            path = self.get_path()
+            temporary = path + '.tmp'
+            with open(temporary, 'w') as file:
+                json.dump(snapshot, file, separators=(',', ':'))
+            os.replace(temporary, path)
+        finally:
+            self.flush_lock.release()
+
+    def flush_at_exit(self):
+        try:
+            self.flush()
+        except OSError:
+            # The directory was removed
+            pass
+
+    def collect(self):
+        """Returns the values of every process, summed by metric and labels.
+
+        The values of the current process are flushed first, so every
+        process is read from its file, and the totals never go back between
+        renders of different processes.
+        """
+        totals = {}
+        if self.directory:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path) as file:
+                        snapshots.append(json.load(file))
+                except (OSError, ValueError):
+                    continue
+        else:
+            snapshots = [self.snapshot()]
+        for snapshot in snapshots:
+            for name, labels, value in snapshot:
+                if name not in METRICS:
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                current = totals.get(key)
+                if current is None:
+                    totals[key] = value
+                elif isinstance(value, list):
+                    totals[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    totals[key] = current + value
+        return totals
+
+    def render(self):
+        """Renders the metrics of every process in the Prometheus text
+        format."""
+        totals = self.collect()
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in series:
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value):
+                    cumulative += count
+                    bucket_labels = labels + (('le', format_value(bound)),)
+                    lines.append(f'{name}_bucket{format_labels(bucket_labels)} {format_value(cumulative)}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(value[-2])}')
+                lines.append(f'{name}_count{format_labels(labels)} {format_value(value[-1])}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    values = ','.join('{0}="{1}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')) for name, value in labels)
+    return '{' + values + '}'
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def get_request_metrics():
+    """Returns the :class:`RequestMetrics` of the current request, or
+    `None`."""
+    return g.get('metrics', None) if has_request_context() else None
+
+
+def start_serialization():
+    """Starts timing a serialization of the current request.
+
+    Returns:
+        The value passed to :func:`add_serialization_time`.
+    """
+    metrics = get_request_metrics()
+    if metrics is None:
+        return None
+    metrics.serializing += 1
+    return time.perf_counter(), metrics.db_time
+
+
+def add_serialization_time(start):
+    """Adds the time spent since :func:`start_serialization` to the
+    serialization time of the current request. The queries made meanwhile,
+    e.g. by lazy loaded relationships, count as database time only."""
+    metrics = get_request_metrics()
+    if metrics is None or start is None:
+        return
+    metrics.serializing -= 1
+    metrics.serialization_time += time.perf_counter() - start[0] - (metrics.db_time - start[1])
+
+
+def add_auth_time(seconds):
+    """Adds time spent verifying the token of the current request."""
+    metrics = get_request_metrics()
+    if metrics is not None:
+        metrics.auth_time += seconds
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start'].pop()
+    metrics = get_request_metrics()
+    if metrics is not None:
+        duration = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += duration
+        if metrics.profile is not None:
+            metrics.profile.add_statement(statement, parameters, duration, metrics.serializing > 0)
+
+
+def handle_error(context):
+    # `after_cursor_execute` doesn't run for failed queries
+    if context.connection is not None:
+        starts = context.connection.info.get('query_start')
+        if starts:
+            starts.pop()
+
+
+def listen_queries():
+    """Counts and times the queries of every engine. Listens only once."""
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(Engine, 'handle_error', handle_error)
+
+
+def init_metrics(app):
+    """Creates the application's :class:`Metrics`, instruments its requests
+    and queries, and serves them on `/metrics`.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    metrics = app.extensions['metrics'] = Metrics.from_config(app.config)
+    listen_queries()
+
+    @app.before_request
+    # pylint: disable=unused-variable
+    def start_request_metrics():
+        g.metrics = RequestMetrics(time.perf_counter())
+
+    @app.after_request
+    # pylint: disable=unused-variable
+    def keep_status(response):
+        request_metrics = g.get('metrics', None)
+        if request_metrics is not None:
+            request_metrics.status = response.status_code
+        return response
+
+    @app.teardown_request
+    # pylint: disable=unused-variable
+    def record_request_metrics(exception=None):
+        # Runs once streamed responses are sent
+        request_metrics = g.get('metrics', None)
+        if request_metrics is None:
+            return
+        g.metrics = None
+        # Unmatched urls share a route, to bound the amount of series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.record_request(request.method, route, request_metrics.status, request_metrics, time.perf_counter())
+
+    @app.route('/metrics')
+    # pylint: disable=unused-variable
+    def render_metrics():
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def get_metrics():
+    """Returns the :class:`Metrics` of the current application, or `None`."""
+    return current_app.extensions.get('metrics')
@@ -0,0 +1,142 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.test.fixtures import app, client, db  # noqa
+from .metrics import Metrics, format_labels
+
+
+def test_counter():
+    metrics = Metrics()
+    metrics.inc('http_requests_total', (('method', 'GET'), ('route', '/'), ('status', '200')))
+    metrics.inc('http_requests_total', (('method', 'GET'), ('route', '/'), ('status', '200')), 2)
+    text = metrics.render()
+    assert '# TYPE http_requests_total counter' in text
+    assert 'http_requests_total{method="GET",route="/",status="200"} 3\n' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    for value in (0.0005, 0.001, 0.02, 20):
+        metrics.observe('auth_verification_seconds', value=value)
+    lines = metrics.render().splitlines()
+    assert 'auth_verification_seconds_bucket{le="0.001"} 2' in lines
+    assert 'auth_verification_seconds_bucket{le="0.025"} 3' in lines
+    assert 'auth_verification_seconds_bucket{le="10"} 3' in lines
+    assert 'auth_verification_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'auth_verification_seconds_count 4' in lines
+    assert 'auth_verification_seconds_sum 20.0215' in lines
+
+
+def test_format_labels_escapes_values():
+    assert format_labels((('route', 'a"b\\c\nd'),)) == '{route="a\\"b\\\\c\\nd"}'
+
+
+def record_in_child(directory):
+    metrics = Metrics(directory=directory)
+    metrics.inc('http_requests_total', (('method', 'GET'), ('route', '/'), ('status', '200')), 5)
+    metrics.observe('auth_verification_seconds', value=0.002)
+    metrics.flush()
+
+
+def test_metrics_are_summed_across_processes(tmpdir):
+    directory = str(tmpdir.join('metrics'))
+    metrics = Metrics(directory=directory)
+    metrics.inc('http_requests_total', (('method', 'GET'), ('route', '/'), ('status', '200')), 2)
+    metrics.observe('auth_verification_seconds', value=0.002)
+    for _ in range(2):
+        process = multiprocessing.Process(target=record_in_child, args=(directory,))
+        process.start()
+        process.join()
+    lines = metrics.render().splitlines()
+    assert 'http_requests_total{method="GET",route="/",status="200"} 12' in lines
+    assert 'auth_verification_seconds_count 3' in lines
+    metrics.clear()
+    assert tmpdir.join('metrics').listdir() == []
+
+
+def test_totals_do_not_depend_on_the_rendering_process(tmpdir):
+    directory = str(tmpdir)
+    first = Metrics(directory=directory)
+    second = Metrics(directory=directory)
+    labels = (('method', 'GET'), ('route', '/'), ('status', '200'))
+    second.inc('http_requests_total', labels)
+    first.inc('http_requests_total', labels, 2)
+    line = 'http_requests_total{method="GET",route="/",status="200"} 3'
+    # Each render flushes the values of its process first
+    assert line not in first.render().splitlines()
+    assert line in second.render().splitlines()
+    assert line in first.render().splitlines()
+
+
+def test_files_are_not_shared_by_reused_pids(tmpdir):
+    first = Metrics(directory=str(tmpdir))
+    second = Metrics(directory=str(tmpdir))
+    assert first.get_path() != second.get_path()
+    assert first.get_path() == first.get_path()
+
+
+def test_failed_queries_are_not_left_started(app, db):  # noqa
+    with db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute('SELECT * FROM missing')
+        assert connection.info['query_start'] == []
+
+
+def test_concurrent_flushes(tmpdir):
+    metrics = Metrics(directory=str(tmpdir))
+    labels = (('method', 'GET'), ('route', '/'), ('status', '200'))
+    errors = []
+
+    def record():
+        try:
+            for _ in range(200):
+                metrics.inc('http_requests_total', labels)
+                metrics.flush()
+        # pylint: disable=broad-except
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    metrics.flush()
+    with open(metrics.get_path()) as file:
+        assert json.load(file) == [['http_requests_total', [list(label) for label in labels], 1600]]
+
+
+def test_request_flush_skips_running_flush(tmpdir):
+    metrics = Metrics(directory=str(tmpdir), flush_interval=0)
+    metrics.inc('http_requests_total')
+    with metrics.flush_lock:
+        metrics.flush(blocking=False)
+    assert not os.path.exists(metrics.get_path())
+    metrics.flush(blocking=False)
+    assert os.path.exists(metrics.get_path())
+
+
+def test_requests_are_instrumented(app, client, db):  # noqa
+    client.get('/api/entity/')
+    client.get('/api/entity/')
+    client.get('/unknown/url')
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    assert 'http_requests_total{method="GET",route="/api/entity/",status="200"} 2' in lines
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/entity/"} 2' in lines
+    # The second page comes from the list cache, without queries
+    assert 'http_request_db_queries_bucket{method="GET",route="/api/entity/",le="0"} 1' in lines
+    assert 'http_request_db_queries_bucket{method="GET",route="/api/entity/",le="1"} 2' in lines
+    assert 'http_request_serialization_seconds_count{method="GET",route="/api/entity/"} 2' in lines
+
+
+def test_auth_verification_is_timed(app, client):  # noqa
+    client.get('/api/protected-entity/', headers={'X-API-Key': 'invalid'})
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    assert 'auth_verification_seconds_count 1' in lines
@@ -0,0 +1,359 @@
+import base64
+import binascii
+import json
+import time
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+from app.errors import ApiException
+from app.utils.cache import LRUCache
+from app.utils.metadata import get_metadata
+
+
+def encode_value(value):
+    """Encodes the boundary values that JSON doesn't support, e.g. the
+    `updated_at` of a row."""
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def decode_value(value):
+    """Parses the values encoded by :func:`encode_value`."""
+    if len(value) == 1 and isinstance(value.get('datetime'), str):
+        return datetime.fromisoformat(value['datetime'])
+    if len(value) == 1 and isinstance(value.get('date'), str):
+        return date.fromisoformat(value['date'])
+    return value
+
+
+class Cursor(object):
+    """
+    Opaque keyset pagination cursor.
+
+    A cursor remembers the ordering of the listing and the `(order_by, id)`
+    values of the row where the previous page stopped, so the next page can
+    be fetched with a `WHERE (order_by, id) > (value, id)` seek instead of an
+    `OFFSET`. The cost of a seek does not depend on how deep the page is, and
+    rows inserted or deleted while a client walks the listing do not shift
+    the pages.
+
+    Args:
+        order_by (str): Column used to sort the results, or comma separated
+            columns, e.g. `purpose,name`.
+        order_dir (str, optional): Sort direction, `asc` or `desc`.
+        values (list, optional): Values of the `order_by` columns of the
+            boundary row, followed by its `id`. `None` means the cursor points
+            at the first page.
+        direction (str, optional): `next` to read the rows after the boundary
+            row, `prev` to read the rows before it.
+    """
+
+    DIRECTIONS = ('next', 'prev')
+
+    def __init__(self, order_by='id', order_dir='asc', values=None, direction='next'):
+        self.order_by = order_by
+        self.order_dir = 'desc' if order_dir == 'desc' else 'asc'
+        self.values = values
+        self.direction = direction
+
+    @property
+    def forward(self):
+        return self.direction == 'next'
+
+    @property
+    def columns(self):
+        return self.order_by.split(',')
+
+    def encode(self):
+        """Serializes the cursor as an url safe string.
+
+        Returns:
+            The cursor token.
+        """
+        payload = json.dumps([self.order_by, self.order_dir, self.direction, self.values],
+            separators=(',', ':'), default=encode_value)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def decode(cls, token):
+        """Parses a cursor token created by `encode`.
+
+        Args:
+            token (str): The cursor token.
+
+        Returns:
+            A :class:`Cursor` instance.
+
+        Raises:
+            ApiException: If the token is not a valid cursor.
+        """
+        try:
+            padding = '=' * (-len(token) % 4)
+            payload = base64.urlsafe_b64decode((token + padding).encode('ascii'))
+            order_by, order_dir, direction, values = json.loads(payload.decode('utf-8'), object_hook=decode_value)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise ApiException('Invalid cursor', code='InvalidCursor')
+        if (not isinstance(order_by, str)
+                or order_dir not in ('asc', 'desc')
+                or direction not in cls.DIRECTIONS):
+            raise ApiException('Invalid cursor', code='InvalidCursor')
+        cursor = cls(order_by, order_dir, values, direction)
+        if not (values is None or (isinstance(values, list) and len(values) == len(cursor.columns) + 1)):
+            raise ApiException('Invalid cursor', code='InvalidCursor')
+        return cursor
+
+    @classmethod
+    def from_item(cls, item, order_by, order_dir, direction):
+        """Builds a cursor that points to the rows next to `item`.
+
+        Args:
+            item (db.Model): Boundary row.
+            order_by (str): Columns used to sort the results.
+            order_dir (str): Sort direction, `asc` or `desc`.
+            direction (str): `next` or `prev`.
+
+        Returns:
+            A :class:`Cursor` instance.
+        """
+        values = [getattr(item, column) for column in order_by.split(',')] + [item.id]
+        return cls(order_by, order_dir, values, direction)
+
+    def keys(self, model):
+        """Returns the list of `(column name, descending)` sort keys of the
+        cursor.
+
+        The primary key is always included as the last key, so the ordering is
+        total even when `order_by` has repeated values.
+        """
+        descending = self.order_dir == 'desc'
+        columns = self.columns
+        keys = [(column, descending) for column in columns]
+        if 'id' not in columns:
+            keys.append((get_metadata(model).primary_key, descending))
+        return keys
+
+    def boundary(self):
+        """Returns the boundary values aligned with `keys`."""
+        if self.values is None:
+            return None
+        if 'id' in self.columns:
+            return list(self.values[:-1])
+        return list(self.values)
+
+
+def seek(keys, values, forward=True):
+    """
+    Builds the `WHERE` clause that selects the rows strictly after `values`
+    when walking the `keys` ordering forward (or strictly before them when
+    walking backward).
+
+    The clause expands the tuple comparison `(k1, k2) > (v1, v2)` into
+    `k1 > v1 OR (k1 = v1 AND k2 > v2)`, which every database is able to run
+    as an index range scan. `NULL` values are treated as the lowest ones,
+    which is how SQLite and MySQL sort them.
+
+    Args:
+        keys (:obj:`list` of :obj:`tuple`): `(column, descending)` sort keys.
+        values (list): Values of the boundary row, one for each key.
+        forward (bool, optional): Walk direction.
+
+    Returns:
+        A SQLAlchemy boolean expression.
+    """
+    clauses = []
+    equals = []
+    for (column, descending), value in zip(keys, values):
+        ascending = not descending if forward else descending
+        if ascending:
+            after = column.isnot(None) if value is None else column > value
+        else:
+            after = None if value is None else or_(column < value, column.is_(None))
+        if after is not None:
+            clauses.append(and_(*equals, after))
+        equals.append(column.is_(None) if value is None else column == value)
+    return or_(*clauses)
+
+
+def keyset_query(query, model, cursor):
+    """
+    Filters and orders a query to walk it from the given cursor.
+
+    Args:
+        query (flask_sqlalchemy.BaseQuery): Base query.
+        model (db.Model): Queried model.
+        cursor (Cursor): Page cursor.
+
+    Returns:
+        The ordered query. When the cursor walks backward the rows come in
+        reverse order.
+    """
+    metadata = get_metadata(model)
+    keys = cursor.keys(model)
+    values = cursor.boundary()
+    forward = cursor.forward
+    if values is not None:
+        attributes = metadata.attributes
+        query = query.filter(seek([(attributes[name], descending) for name, descending in keys], values, forward))
+    return query.order_by(*[metadata.order(name, descending == forward) for name, descending in keys])
+
+
+def keyset_cursors(cursor, first, last, has_more):
+    """
+    Builds the cursors of the pages next to a page read with `cursor`.
+
+    Args:
+        cursor (Cursor): Cursor used to read the page.
+        first (db.Model): First item of the page, in display order.
+        last (db.Model): Last item of the page, in display order.
+        has_more (bool): Whether more rows were found after the page, in the
+            direction the cursor walks.
+
+    Returns:
+        A tuple with the cursor of the next page and the cursor of the
+        previous page. The cursors are `None` when there are no more pages in
+        that direction.
+    """
+    if cursor.forward:
+        has_next, has_prev = has_more, cursor.values is not None
+    else:
+        has_next, has_prev = True, has_more
+    next_cursor = None
+    prev_cursor = None
+    if last is not None and has_next:
+        next_cursor = Cursor.from_item(last, cursor.order_by, cursor.order_dir, 'next')
+    if first is not None and has_prev:
+        prev_cursor = Cursor.from_item(first, cursor.order_by, cursor.order_dir, 'prev')
+    return next_cursor, prev_cursor
+
+
+def keyset_paginate(query, model, cursor, per_page):
+    """
+    Fetches a page of rows seeking from the given cursor.
+
+    One extra row is requested to know if there are more rows after the page,
+    so no `COUNT` query is needed.
+
+    Args:
+        query (flask_sqlalchemy.BaseQuery): Base query.
+        model (db.Model): Queried model.
+        cursor (Cursor): Page cursor.
+        per_page (int): Amount of items per page.
+
+    Returns:
+        A tuple with the list of items, the cursor of the next page and the
+        cursor of the previous page. The cursors are `None` when there are
+        no more pages in that direction.
+    """
+    rows = keyset_query(query, model, cursor).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if not cursor.forward:
+        items.reverse()
+    first = items[0] if items else None
+    last = items[-1] if items else None
+    next_cursor, prev_cursor = keyset_cursors(cursor, first, last, has_more)
+    return items, next_cursor, prev_cursor
+
+
+def stream_rows(query, per_page, chunk_size, done):
+    """
+    Yields at most `per_page` rows of a query, fetching them from the
+    database `chunk_size` rows at a time.
+
+    One extra row is requested to know if there are more rows after the
+    page. Once the page is exhausted `done(first, last, has_more)` is called,
+    so the pagination links can be built after the rows were sent.
+
+    Args:
+        query (flask_sqlalchemy.BaseQuery): Ordered query.
+        per_page (int): Amount of items per page.
+        chunk_size (int): Amount of rows fetched from the database at once.
+        done (callable): Called with the first row, the last row, and whether
+            there are more rows.
+    """
+    rows = query.limit(per_page + 1) \
+        .yield_per(chunk_size) \
+        .execution_options(stream_results=True)
+    first = None
+    last = None
+    count = 0
+    has_more = False
+    for row in rows:
+        if count == per_page:
+            has_more = True
+            break
+        if first is None:
+            first = row
+        last = row
+        count += 1
+        yield row
+    done(first, last, has_more)
+
+
+def offset_paginate(query, page, per_page):
+    """
+    Fetches a page of rows using `LIMIT` and `OFFSET` without counting the
+    total amount of rows.
+
+    One extra row is requested to know if there is a next page.
+
+    Args:
+        query (flask_sqlalchemy.BaseQuery): Ordered query.
+        page (int): Requested page, starting at 1.
+        per_page (int): Amount of items per page.
+
+    Returns:
+        A tuple with the list of items and a flag that is `True` when there
+        is a next page.
+    """
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+class RowCountCache(object):
+    """
+    Per process cache of row counts.
+
+    Counting every row of a big table usually costs more than fetching a page
+    of it, so list responses that ask for a `total` get a count that can be
+    up to `ttl` seconds old.
+
+    Keys include the filter values sent by the clients, so only the
+    `max_size` most recently used counts are kept.
+
+    Args:
+        max_size (int, optional): Maximum amount of cached counts.
+    """
+
+    def __init__(self, max_size=1024):
+        self._counts = LRUCache(max_size=max_size)
+
+    def get(self, key, query, ttl):
+        """Returns the row count of `query`, counting again only when the cached
+        value is older than `ttl` seconds.
+
+        Args:
+            key (hashable): Cache key, usually the table name.
+            query (flask_sqlalchemy.BaseQuery): Query to count.
+            ttl (float): Staleness window in seconds.
+
+        Returns:
+            The amount of rows.
+        """
+        now = time.monotonic()
+        entry = self._counts.get(key)
+        if entry is not None and now - entry[1] < ttl:
+            return entry[0]
+        count = query.order_by(None).count()
+        self._counts.set(key, (count, now))
+        return count
+
+    def clear(self):
+        self._counts.clear()
+
+
+row_counts = RowCountCache()
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.errors import ApiException
+from app.entity.model import Entity
+from app.test.fixtures import app, db  # noqa
+from .pagination import Cursor, RowCountCache, keyset_paginate, keyset_query, offset_paginate, stream_rows
+
+
+def seed(db):  # noqa
+    names = ['b', None, 'a', 'b', 'c', None, 'a']
+    for index, name in enumerate(names):
+        db.session.add(Entity(id=index + 1, name=name, purpose='purpose'))
+    db.session.commit()
+
+
+def walk(cursor, per_page):
+    pages = []
+    while cursor is not None:
+        items, cursor, _ = keyset_paginate(Entity.query, Entity, cursor, per_page)
+        pages.append([item.id for item in items])
+    return pages
+
+
+def test_cursor_encode_decode():
+    cursor = Cursor('name', 'desc', ['Yin', 3], 'prev')
+    actual = Cursor.decode(cursor.encode())
+    assert actual.order_by == 'name'
+    assert actual.order_dir == 'desc'
+    assert actual.values == ['Yin', 3]
+    assert actual.direction == 'prev'
+
+
+def test_cursor_encodes_datetimes():
+    updated_at = datetime(2019, 1, 2, 3, 4, 5, 6)
+    actual = Cursor.decode(Cursor('updated_at', 'asc', [updated_at, 3]).encode())
+    assert actual.values == [updated_at, 3]
+
+
+def test_keyset_paginate_by_datetime(db):  # noqa
+    start = datetime(2019, 1, 1)
+    for id, minutes in enumerate([3, 1, 2, 1, 0], 1):
+        db.session.add(Entity(id=id, name='name', purpose='purpose', updated_at=start + timedelta(minutes=minutes)))
+    db.session.commit()
+    cursor = Cursor.decode(Cursor('updated_at', 'asc').encode())
+    pages = []
+    while cursor is not None:
+        items, next_cursor, _ = keyset_paginate(Entity.query, Entity, cursor, 2)
+        pages.append([item.id for item in items])
+        cursor = Cursor.decode(next_cursor.encode()) if next_cursor is not None else None
+    assert pages == [[5, 2], [4, 3], [1]]
+
+
+def test_cursor_is_url_safe():
+    token = Cursor('name', 'asc', ['?&=/+', 1]).encode()
+    assert all(char.isalnum() or char in '-_' for char in token)
+
+
+@pytest.mark.parametrize('token', ['not a cursor', 'e30', Cursor('name', 'up').encode()[:-2]])
+def test_cursor_decode_invalid(token):
+    with pytest.raises(ApiException):
+        Cursor.decode(token)
+
+
+def test_keyset_paginate_by_id(db):  # noqa
+    seed(db)
+    assert walk(Cursor('id', 'asc'), 3) == [[1, 2, 3], [4, 5, 6], [7]]
+
+
+def test_keyset_paginate_matches_offset_order(db):  # noqa
+    seed(db)
+    for order_dir in ('asc', 'desc'):
+        column = Entity.name.asc() if order_dir == 'asc' else Entity.name.desc()
+        identifier = Entity.id.asc() if order_dir == 'asc' else Entity.id.desc()
+        expected = [item.id for item in Entity.query.order_by(column, identifier).all()]
+        pages = walk(Cursor('name', order_dir), 2)
+        assert [id for page in pages for id in page] == expected
+
+
+def test_keyset_paginate_prev_returns_previous_page(db):  # noqa
+    seed(db)
+    cursor = Cursor('name', 'asc')
+    first, cursor, _ = keyset_paginate(Entity.query, Entity, cursor, 3)
+    second, _, prev_cursor = keyset_paginate(Entity.query, Entity, cursor, 3)
+    previous, next_cursor, prev_cursor = keyset_paginate(Entity.query, Entity, prev_cursor, 3)
+    assert [item.id for item in previous] == [item.id for item in first]
+    assert prev_cursor is None
+    assert next_cursor is not None
+
+
+def test_keyset_paginate_last_page_has_no_next(db):  # noqa
+    seed(db)
+    items, next_cursor, prev_cursor = keyset_paginate(Entity.query, Entity, Cursor('id'), 10)
+    assert len(items) == 7
+    assert next_cursor is None
+    assert prev_cursor is None
+
+
+def test_offset_paginate(db):  # noqa
+    seed(db)
+    query = Entity.query.order_by(Entity.id)
+    items, has_next = offset_paginate(query, 2, 3)
+    assert [item.id for item in items] == [4, 5, 6]
+    assert has_next is True
+    items, has_next = offset_paginate(query, 3, 3)
+    assert [item.id for item in items] == [7]
+    assert has_next is False
+
+
+def test_row_count_cache(db):  # noqa
+    seed(db)
+    cache = RowCountCache()
+    assert cache.get('entity', Entity.query, 60) == 7
+    db.session.add(Entity(id=8, name='d', purpose='purpose'))
+    db.session.commit()
+    assert cache.get('entity', Entity.query, 60) == 7
+    assert cache.get('entity', Entity.query, 0) == 8
+
+
+def test_row_count_cache_is_bounded(db):  # noqa
+    seed(db)
+    cache = RowCountCache(max_size=2)
+    for name in ('a', 'b', 'c'):
+        cache.get(('entity', ('name__eq', name)), Entity.query.filter(Entity.name == name), 60)
+    assert len(cache._counts) == 2
+    assert cache._counts.get(('entity', ('name__eq', 'a'))) is None
+
+
+def test_stream_rows(db):  # noqa
+    seed(db)
+    result = {}
+    def done(first, last, has_more):
+        result.update(first=first.id, last=last.id, has_more=has_more)
+    rows = stream_rows(Entity.query.order_by(Entity.id), 5, 2, done)
+    assert result == {}
+    assert [row.id for row in rows] == [1, 2, 3, 4, 5]
+    assert result == dict(first=1, last=5, has_more=True)
+
+
+def test_stream_rows_keyset(db):  # noqa
+    seed(db)
+    cursor = Cursor('name', 'desc')
+    expected, _, _ = keyset_paginate(Entity.query, Entity, cursor, 10)
+    result = {}
+    def done(first, last, has_more):
+        result.update(has_more=has_more)
+    rows = stream_rows(keyset_query(Entity.query, Entity, cursor), 10, 3, done)
+    assert [row.id for row in rows] == [item.id for item in expected]
+    assert result == dict(has_more=False)
+
+
+def test_keyset_paginate_multiple_columns(db):  # noqa
+    seed(db)
+    for index, entity in enumerate(Entity.query.order_by(Entity.id)):
+        entity.purpose = 'even' if index % 2 == 0 else 'odd'
+    db.session.commit()
+    expected = [item.id for item in Entity.query.order_by(Entity.purpose, Entity.name, Entity.id)]
+    pages = walk(Cursor('purpose,name'), 2)
+    assert [id for page in pages for id in page] == expected
+
+
+def test_cursor_decode_checks_values_length():
+    token = Cursor('purpose,name', values=['a', 1]).encode()
+    with pytest.raises(ApiException):
+        Cursor.decode(token)
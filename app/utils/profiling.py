@@ -0,0 +1,166 @@
+import hmac
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+from app.utils.base_service import BaseService
+from app.utils.metrics import get_request_metrics
+
+# Quoted strings and numbers, replaced by `?` in the shape of a statement
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|(?<!:):\w+")
+# `IN` lists of any length share the same shape
+PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+SKIPPED_PATHS = (os.path.abspath(__file__), os.path.join(APP_PATH, 'utils', 'metrics.py'))
+
+
+def statement_shape(statement):
+    """Returns the shape of a SQL statement: its text without literals,
+    parameters or whitespace differences, so the queries of an N+1 share it.
+
+    Args:
+        statement (str): SQL statement.
+    """
+    shape = PLACEHOLDER_LISTS.sub('(?)', LITERALS.sub('?', statement))
+    return ' '.join(shape.split())
+
+
+def find_origin():
+    """Returns where the current query was made: the service method that
+    made it, e.g. `EntityService.get_all`, or else the innermost line of the
+    app."""
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    origin = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(APP_PATH) and code.co_filename not in SKIPPED_PATHS:
+            owner = frame.f_locals.get('cls')
+            if isinstance(owner, type) and issubclass(owner, BaseService):
+                return f'{owner.__name__}.{code.co_name}'
+            if origin is None:
+                origin = f'{os.path.relpath(code.co_filename, os.path.dirname(APP_PATH))}:{frame.f_lineno}'
+        frame = frame.f_back
+    return origin
+
+
+class Profile(object):
+    """SQL statements run by a profiled request."""
+
+    def __init__(self):
+        self.statements = []
+
+    def add_statement(self, statement, parameters, duration, serializing):
+        """Records a statement along with where it was made.
+
+        Args:
+            statement (str): SQL statement.
+            parameters: Parameters of the statement.
+            duration (float): Duration in seconds.
+            serializing (bool): Whether it was made while serializing the
+                response, e.g. by a lazy loaded relationship.
+        """
+        self.statements.append(dict(
+            statement=statement,
+            parameters=parameters,
+            duration=duration,
+            phase='serialize' if serializing else 'service',
+            origin=find_origin(),
+        ))
+
+    def repeated(self, threshold):
+        """Returns the shapes run more than `threshold` times, as
+        dictionaries with the `shape`, its `count`, total `duration` and the
+        `origins` that ran it."""
+        shapes = OrderedDict()
+        for statement in self.statements:
+            shape = statement_shape(statement['statement'])
+            entry = shapes.get(shape)
+            if entry is None:
+                entry = shapes[shape] = dict(shape=shape, count=0, duration=0.0, origins=[])
+            entry['count'] += 1
+            entry['duration'] += statement['duration']
+            if statement['origin'] not in entry['origins']:
+                entry['origins'].append(statement['origin'])
+        return [entry for entry in shapes.values() if entry['count'] > threshold]
+
+
+def server_timing(metrics, now):
+    """Builds the `Server-Timing` header of a request, with the time spent on
+    the database, serializing, verifying the token, on the rest of the app,
+    and in total, in milliseconds.
+
+    Args:
+        metrics (RequestMetrics): Times of the request.
+        now (float): Current `time.perf_counter()`.
+    """
+    total = now - metrics.start
+    other = max(total - metrics.db_time - metrics.serialization_time - metrics.auth_time, 0.0)
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+        f'serialize;dur={metrics.serialization_time * 1000:.2f}',
+        f'auth;dur={metrics.auth_time * 1000:.2f}',
+        f'app;dur={other * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+
+def is_profiled():
+    """Returns `True` if the current request must be profiled: always with
+    `PROFILE_REQUESTS`, or when it sends the `PROFILE_HEADER` with the
+    `PROFILE_TOKEN`, or with any value in debug mode."""
+    config = current_app.config
+    if config['PROFILE_REQUESTS']:
+        return True
+    value = request.headers.get(config['PROFILE_HEADER']) if config['PROFILE_HEADER'] else None
+    if not value:
+        return False
+    if config['PROFILE_TOKEN']:
+        return hmac.compare_digest(value, config['PROFILE_TOKEN'])
+    return current_app.debug
+
+
+def log_profile(profile, threshold):
+    """Logs the statements of a profiled request, and a warning for each
+    statement shape run more than `threshold` times."""
+    logger = current_app.logger
+    logger.info('Profile of %s %s: %d statements', request.method, request.full_path, len(profile.statements))
+    for statement in profile.statements:
+        logger.info('%8.2f ms  %-9s  %s  %s  %r', statement['duration'] * 1000, statement['phase'],
+            statement['origin'], statement['statement'], statement['parameters'])
+    for entry in profile.repeated(threshold):
+        logger.warning('%s %s ran %d times (%.2f ms) the statement: %s, from %s', request.method,
+            request.path, entry['count'], entry['duration'] * 1000, entry['shape'], ', '.join(entry['origins']))
+
+
+def init_profiling(app):
+    """Profiles the requests selected by :func:`is_profiled`: their SQL
+    statements are logged, statements run too many times are warned about,
+    and the response gets a `Server-Timing` header. Must be called after
+    `init_metrics`, whose times it uses.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    @app.before_request
+    # pylint: disable=unused-variable
+    def start_profile():
+        metrics = get_request_metrics()
+        if metrics is not None and is_profiled():
+            metrics.profile = Profile()
+
+    @app.after_request
+    # pylint: disable=unused-variable
+    def add_server_timing(response):
+        metrics = get_request_metrics()
+        if metrics is None or metrics.profile is None:
+            return response
+        response.headers['Server-Timing'] = server_timing(metrics, time.perf_counter())
+        log_profile(metrics.profile, current_app.config['PROFILE_REPEATED_STATEMENTS'])
+        g.profile = metrics.profile
+        metrics.profile = None
+        return response
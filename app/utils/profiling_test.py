@@ -0,0 +1,61 @@
+import logging
+
+from flask import g
+
+from app.test.fixtures import app, client, db  # noqa
+from .profiling import Profile, statement_shape
+
+
+def test_statement_shape():
+    assert statement_shape("SELECT * FROM entity WHERE id = 12 AND name = 'it''s'") \
+        == 'SELECT * FROM entity WHERE id = ? AND name = ?'
+    assert statement_shape('SELECT *\n  FROM entity WHERE id IN (?, ?, ?)') == 'SELECT * FROM entity WHERE id IN (?)'
+    assert statement_shape('SELECT * FROM entity WHERE id IN (?)') == 'SELECT * FROM entity WHERE id IN (?)'
+    assert statement_shape('SELECT * FROM table_1 WHERE id = %(id_1)s') == 'SELECT * FROM table_1 WHERE id = ?'
+
+
+def test_repeated_statements():
+    profile = Profile()
+    for id in range(6):
+        profile.add_statement(f'SELECT * FROM entity WHERE id = {id}', (), 0.001, True)
+    profile.add_statement('SELECT count(*) FROM entity', (), 0.001, False)
+    repeated = profile.repeated(5)
+    assert len(repeated) == 1
+    assert repeated[0]['shape'] == 'SELECT * FROM entity WHERE id = ?'
+    assert repeated[0]['count'] == 6
+    assert profile.statements[0]['phase'] == 'serialize'
+
+
+def test_profiled_request(app, client, db):  # noqa
+    with client:
+        response = client.get('/api/entity/', headers={'X-Profile': '1'})
+        timing = response.headers['Server-Timing']
+        for phase in ('db', 'serialize', 'auth', 'app', 'total'):
+            assert f'{phase};dur=' in timing
+        assert 'desc="1 queries"' in timing
+        statement = g.profile.statements[0]
+        assert statement['origin'] == 'EntityService.get_all'
+        assert statement['phase'] == 'service'
+        assert statement['statement'].startswith('SELECT')
+
+
+def test_requests_are_not_profiled_by_default(app, client, db):  # noqa
+    response = client.get('/api/entity/')
+    assert 'Server-Timing' not in response.headers
+
+
+def test_profile_header_requires_token(app, client, db):  # noqa
+    app.config['PROFILE_TOKEN'] = 'secret'
+    assert 'Server-Timing' not in client.get('/api/entity/', headers={'X-Profile': '1'}).headers
+    assert 'Server-Timing' in client.get('/api/entity/', headers={'X-Profile': 'secret'}).headers
+
+
+def test_repeated_statements_are_warned(app, client, db, caplog):  # noqa
+    app.config['PROFILE_REQUESTS'] = True
+    app.config['PROFILE_REPEATED_STATEMENTS'] = 0
+    with caplog.at_level(logging.INFO):
+        client.get('/api/entity/')
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert warnings[0].startswith('GET /api/entity/ ran 1 times')
+    assert 'from EntityService.get_all' in warnings[0]
@@ -9,10 +9,28 @@ class Query:
             'description': 'Ammount of items per page. Defaults to 20.'
         },
         'order_by': {
-            'description': 'Identifies the column in which to order the results.'
+            'description': 'Identifies the columns in which to order the results, separated by commas, e.g. `purpose,name`.'
         },
         'order_dir': {
             'description': 'Selects the direction in which the results should be sorted. Only allows `asc` and `desc` as values.'
+        },
+        'pagination': {
+            'description': 'Pagination mode. `page` (default) uses `page` and `per_page`. `offset` also uses them but skips counting the rows. `cursor` seeks on `(order_by, id)` and returns `next` and `prev` cursor links.'
+        },
+        'cursor': {
+            'description': 'Opaque cursor taken from the `next` or `prev` links of a previous response. Implies `pagination=cursor`.'
+        },
+        'total': {
+            'description': 'Set to `true` to include the `total` amount of items. The value is cached and may be a few seconds old.'
+        },
+        'stream': {
+            'description': 'Set to `true` to stream the items as they are read from the database. Allows `per_page` values up to `STREAM_MAX_PER_PAGE`.'
+        },
+        'fields': {
+            'description': 'Comma separated list of the fields to return, e.g. `name,camelCase`. Defaults to every field.'
+        },
+        'ids': {
+            'description': 'Comma separated list of ids, e.g. `1,2,3`. Returns those items, in the same order, with a `WHERE id IN (...)` query instead of a page. Ids that don\'t exist are listed on `missing`.'
         }
     }
 
@@ -20,10 +38,56 @@ class Query:
     def get_param(name):
         return g.get(name, current_app.config.get(name.upper(), None))
 
+    @staticmethod
+    def get_int_param(name):
+        """Returns a query parameter as an `int`, falling back to the configured
+        default value when the parameter is not a valid integer.
+        """
+        try:
+            return int(Query.get_param(name))
+        except (TypeError, ValueError):
+            return current_app.config.get(name.upper(), None)
+
+    @staticmethod
+    def parse_bool(value):
+        """Returns `True` if a value is `true`, `1` or `yes`."""
+        return str(value).lower() in ('true', '1', 'yes')
+
+    @staticmethod
+    def get_bool_param(name):
+        """Returns `True` if a query parameter is set to `true`, `1` or `yes`."""
+        return Query.parse_bool(Query.get_param(name))
+
+    @staticmethod
+    def get_per_page(stream=False):
+        """
+        Returns the requested `per_page` limited by `max_per_page`, or by
+        `stream_max_per_page` when the response is streamed.
+        """
+        max_per_page = Query.get_int_param('stream_max_per_page' if stream else 'max_per_page')
+        return max(min(Query.get_int_param('per_page'), max_per_page), 1)
+
+    @staticmethod
+    def get_list_param(name):
+        """Returns a comma separated query parameter as a list, or `None`."""
+        value = Query.get_param(name)
+        if not value:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()] or None
+
     @staticmethod
     def parse_request(request):
         g.page = request.args.get('page', current_app.config['PAGE'])
         g.per_page = request.args.get('per_page', current_app.config['PER_PAGE'])
         g.order_by = request.args.get('order_by', None)
         g.order_dir = request.args.get('order_dir', None)
-
+        g.cursor = request.args.get('cursor', None)
+        g.pagination = request.args.get('pagination',
+            'cursor' if g.cursor is not None else current_app.config['PAGINATION'])
+        # `g.total` is kept for the row count
+        g.want_total = Query.parse_bool(request.args.get('total', None))
+        g.stream = request.args.get('stream', None)
+        g.fields = request.args.get('fields', None)
+        g.ids = request.args.get('ids', None)
+        # Filters are sent as `<field>__<operator>=<value>`
+        g.filters = {name: value for name, value in request.args.items() if '__' in name.strip('_')}
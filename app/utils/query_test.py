@@ -12,10 +12,28 @@ def test_index_query_params(app):
                 'description': 'Ammount of items per page. Defaults to 20.'
             },
             'order_by': {
-                'description': 'Identifies the column in which to order the results.'
+                'description': 'Identifies the columns in which to order the results, separated by commas, e.g. `purpose,name`.'
             },
             'order_dir': {
                 'description': 'Selects the direction in which the results should be sorted. Only allows `asc` and `desc` as values.'
+            },
+            'pagination': {
+                'description': 'Pagination mode. `page` (default) uses `page` and `per_page`. `offset` also uses them but skips counting the rows. `cursor` seeks on `(order_by, id)` and returns `next` and `prev` cursor links.'
+            },
+            'cursor': {
+                'description': 'Opaque cursor taken from the `next` or `prev` links of a previous response. Implies `pagination=cursor`.'
+            },
+            'total': {
+                'description': 'Set to `true` to include the `total` amount of items. The value is cached and may be a few seconds old.'
+            },
+            'stream': {
+                'description': 'Set to `true` to stream the items as they are read from the database. Allows `per_page` values up to `STREAM_MAX_PER_PAGE`.'
+            },
+            'fields': {
+                'description': 'Comma separated list of the fields to return, e.g. `name,camelCase`. Defaults to every field.'
+            },
+            'ids': {
+                'description': 'Comma separated list of ids, e.g. `1,2,3`. Returns those items, in the same order, with a `WHERE id IN (...)` query instead of a page. Ids that don\'t exist are listed on `missing`.'
             }
         }
         assert Query.index_query_params == expected
@@ -27,4 +45,27 @@ def test_parse_request(app):
         assert g.per_page == '40'
         assert g.order_by == 'test'
         assert g.order_dir == 'up'
+        assert g.pagination == 'page'
 
+def test_parse_request_cursor_implies_cursor_pagination(app):
+    with app.test_request_context('/healthz/?cursor=abc'):
+        Query.parse_request(request)
+        assert g.cursor == 'abc'
+        assert g.pagination == 'cursor'
+
+def test_get_int_param(app):
+    with app.test_request_context('/healthz/?page=3&per_page=nope'):
+        Query.parse_request(request)
+        assert Query.get_int_param('page') == 3
+        assert Query.get_int_param('per_page') == app.config['PER_PAGE']
+
+def test_get_list_param(app):
+    with app.test_request_context('/healthz/?fields=name, camelCase,'):
+        Query.parse_request(request)
+        assert Query.get_list_param('fields') == ['name', 'camelCase']
+        assert Query.get_list_param('order_by') is None
+
+def test_parse_request_filters(app):
+    with app.test_request_context('/healthz/?name__eq=Yin&id__in=1,2&page=2&__=x'):
+        Query.parse_request(request)
+        assert g.filters == {'name__eq': 'Yin', 'id__in': '1,2'}
@@ -0,0 +1,159 @@
+import fcntl
+import gc
+import json
+import subprocess
+import sys
+
+import click
+
+# Runs on a fresh interpreter, so the modules already imported by the current
+# process don't hide their cost.
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+sys.stderr.write('{marker}\\n')
+sys.stderr.flush()
+create_app(sys.argv[1] or None)
+created = time.perf_counter()
+print(json.dumps(dict(import_time=imported - start, create_app_time=created - imported)))
+"""
+
+MARKER = 'startup-profile: create_app'
+
+
+def parse_importtime(lines):
+    """Parses the output of `python -X importtime`.
+
+    Lines printed after the `MARKER` belong to modules imported by
+    `create_app`.
+
+    Args:
+        lines (:obj:`list` of :obj:`str`): Lines written to `stderr`.
+
+    Returns:
+        The list of imported modules, as dictionaries with their `module`
+        name, `self` and `cumulative` times in seconds, and the `phase` they
+        were imported on, `import` or `create_app`.
+    """
+    modules = []
+    phase = 'import'
+    for line in lines:
+        if line.strip() == MARKER:
+            phase = 'create_app'
+            continue
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        modules.append(dict(
+            module=name.strip(),
+            self=int(own) / 1e6,
+            cumulative=int(cumulative) / 1e6,
+            phase=phase,
+        ))
+    return modules
+
+
+def profile_startup(env=None, python=sys.executable):
+    """Measures the import of the app and `create_app` on a new interpreter.
+
+    Args:
+        env (str, optional): Environment passed to `create_app`.
+        python (str, optional): Python executable.
+
+    Returns:
+        A dictionary with the total `import_time` and `create_app_time` in
+        seconds, and the `modules` returned by :func:`parse_importtime`.
+    """
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', SCRIPT.format(marker=MARKER), env or ''],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    profile['modules'] = parse_importtime(result.stderr.splitlines())
+    return profile
+
+
+def run_migrations(uri, config_file='alembic.ini', lock_path='/tmp/flask-migrations.lock'):
+    """Upgrades the database to the `head` revision while holding an
+    exclusive lock on `lock_path`. Processes that start at the same time on
+    the same host run them one after the other, and the later ones find the
+    database already upgraded.
+
+    Args:
+        uri (str): Database url.
+        config_file (str, optional): `alembic` configuration file.
+        lock_path (str, optional): File locked while migrating.
+    """
+    from alembic import command
+    from alembic.config import Config
+    config = Config(config_file)
+    config.set_main_option('sqlalchemy.url', uri)
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            command.upgrade(config, 'head')
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def prepare_fork(app):
+    """Runs on the master process once the app is loaded, right before the
+    workers are forked.
+
+    The connections opened while loading are closed, so no worker inherits
+    them. Every object is moved to the permanent generation of the garbage
+    collector, so the collections of the workers don't write to the memory
+    pages they share with the master.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    from app import db
+    db.dispose_engines(app)
+    gc.freeze()
+
+
+def after_fork(app):
+    """Runs on each worker right after it is forked. Creates new connection
+    pools, and enables the garbage collector the master disabled while
+    loading the app.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    from app import db
+    db.dispose_engines(app)
+    gc.enable()
+
+
+def init_startup_profile(app):
+    """Registers the `flask startup-profile` command.
+
+    Args:
+        app (flask.Flask): Flask application.
+    """
+    @app.cli.command('startup-profile')
+    @click.option('--env', default=None, help='Environment passed to `create_app`.')
+    @click.option('--limit', default=20, help='Amount of modules to show.')
+    @click.option('--all', 'all_modules', is_flag=True, help='Include third party modules.')
+    # pylint: disable=unused-variable
+    def startup_profile(env, limit, all_modules):
+        """Reports the import and `create_app` time of each module."""
+        profile = profile_startup(env or app.config.get('CONFIG_NAME'))
+        modules = [module for module in profile['modules']
+            if all_modules or module['module'] == 'app' or module['module'].startswith('app.')]
+        modules.sort(key=lambda module: module['cumulative'], reverse=True)
+        click.echo(f'import app:  {profile["import_time"] * 1000:8.1f} ms')
+        click.echo(f'create_app:  {profile["create_app_time"] * 1000:8.1f} ms')
+        click.echo('')
+        click.echo(f'{"self ms":>9} {"total ms":>9}  {"phase":<10}  module')
+        for module in modules[:limit]:
+            click.echo(f'{module["self"] * 1000:9.1f} {module["cumulative"] * 1000:9.1f}  '
+                f'{module["phase"]:<10}  {module["module"]}')
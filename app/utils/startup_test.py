@@ -0,0 +1,60 @@
+import fcntl
+from unittest.mock import patch
+
+import pytest
+
+from app import db
+from app.test.fixtures import app  # noqa
+from .startup import MARKER, after_fork, parse_importtime, prepare_fork, run_migrations
+
+
+def test_parse_importtime():
+    lines = [
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        150 |   app.errors',
+        MARKER,
+        'import time:      2000 |       5000 | app.entity.controller',
+    ]
+    assert parse_importtime(lines) == [
+        dict(module='app.errors', self=0.00012, cumulative=0.00015, phase='import'),
+        dict(module='app.entity.controller', self=0.002, cumulative=0.005, phase='create_app'),
+    ]
+
+
+def test_startup_profile_command(app):  # noqa
+    profile = dict(import_time=0.5, create_app_time=0.25, modules=[
+        dict(module='jose', self=0.1, cumulative=0.4, phase='create_app'),
+        dict(module='app.entity', self=0.001, cumulative=0.02, phase='create_app'),
+    ])
+    with patch('app.utils.startup.profile_startup', return_value=profile) as profile_startup:
+        result = app.test_cli_runner().invoke(args=['startup-profile'])
+    profile_startup.assert_called_once_with('test')
+    assert 'create_app:     250.0 ms' in result.output
+    assert 'app.entity' in result.output
+    assert 'jose' not in result.output
+
+
+def test_run_migrations_holds_lock(tmpdir):
+    lock_path = str(tmpdir.join('migrations.lock'))
+
+    def upgrade(config, revision):
+        with open(lock_path) as lock:
+            # Another process can't take the lock while migrating
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert config.get_main_option('sqlalchemy.url') == 'sqlite:///app.db'
+        assert revision == 'head'
+
+    with patch('alembic.command.upgrade', side_effect=upgrade) as command_upgrade:
+        run_migrations('sqlite:///app.db', lock_path=lock_path)
+    command_upgrade.assert_called_once()
+
+
+def test_fork_hooks(app):  # noqa
+    with patch.object(db, 'dispose_engines') as dispose_engines, patch('gc.freeze') as freeze, \
+            patch('gc.enable') as enable:
+        prepare_fork(app)
+        freeze.assert_called_once_with()
+        after_fork(app)
+        enable.assert_called_once_with()
+    assert dispose_engines.call_count == 2
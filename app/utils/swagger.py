@@ -0,0 +1,44 @@
+import os
+
+import click
+
+
+def export_swagger(app, api, output):
+    """Writes the Swagger spec to `output`, and its gzip compressed version to
+    `output.gz`, so a web server can serve them without the app.
+
+    Args:
+        app (flask.Flask): Flask application.
+        api (ApiFlask): Api whose spec is exported.
+        output (str): Path of the JSON file.
+
+    Raises:
+        click.ClickException: If the spec could not be generated.
+    """
+    with app.test_request_context():
+        document = api.get_specs_document()
+    if document is None:
+        raise click.ClickException('The Swagger spec could not be generated')
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'wb') as file:
+        file.write(document.body)
+    with open(output + '.gz', 'wb') as file:
+        file.write(document.gzipped)
+
+
+def init_swagger_export(app, api):
+    """Registers the `flask export-swagger` command.
+
+    Args:
+        app (flask.Flask): Flask application.
+        api (ApiFlask): Api whose spec is exported.
+    """
+    @app.cli.command('export-swagger')
+    @click.argument('output', default='static/swagger.json')
+    # pylint: disable=unused-variable
+    def export_swagger_command(output):
+        """Writes the Swagger spec to a static file."""
+        export_swagger(app, api, output)
+        click.echo(f'Swagger spec written to {output}')
@@ -0,0 +1,79 @@
+"""
+Goodput of an overloaded process with and without admission control.
+
+Usage:
+
+    python -m benchmarks.admission_benchmark [clients] [seconds]
+
+Each client sends requests in a loop and gives up on those that take more
+than `DEADLINE` seconds. A request holds one of the `CONNECTIONS` of a slow
+database for `SERVICE_TIME` seconds. Without admission control every request
+waits for a connection, and once the wait is longer than the deadline almost
+no response arrives in time. With it, the extra requests are rejected right
+away and retried after `RETRY_AFTER` seconds, so the admitted ones keep
+their latency.
+"""
+import statistics
+import sys
+import threading
+import time
+
+from app.utils.admission import Budget
+
+CONNECTIONS = 4
+SERVICE_TIME = 0.01
+DEADLINE = 0.25
+RETRY_AFTER = 0.05
+
+
+def run(clients, seconds, budget):
+    # First come, first served, like the listen queue
+    database = Budget(CONNECTIONS, clients, 3600)
+    lock = threading.Lock()
+    latencies = []
+    counts = dict(ok=0, late=0, rejected=0)
+    stop = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < stop:
+            start = time.monotonic()
+            if budget is not None and budget.acquire() is not None:
+                with lock:
+                    counts['rejected'] += 1
+                time.sleep(RETRY_AFTER)
+                continue
+            try:
+                database.acquire()
+                time.sleep(SERVICE_TIME)
+                database.release()
+            finally:
+                if budget is not None:
+                    budget.release()
+            latency = time.monotonic() - start
+            with lock:
+                if latency <= DEADLINE:
+                    counts['ok'] += 1
+                    latencies.append(latency)
+                else:
+                    counts['late'] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    return counts['ok'] / seconds, counts['late'], counts['rejected'], p50, p99
+
+
+def main(clients=128, seconds=3):
+    print(f'{"mode":<12} {"goodput/s":>10} {"late":>6} {"rejected":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for name, budget in (('unbounded', None), ('admission', Budget(CONNECTIONS, CONNECTIONS * 2, 0.05))):
+        goodput, late, rejected, p50, p99 = run(clients, seconds, budget)
+        print(f'{name:<12} {goodput:10.1f} {late:6d} {rejected:9d} {p50:8.1f} {p99:8.1f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
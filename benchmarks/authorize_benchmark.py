@@ -0,0 +1,56 @@
+"""
+Protected GET throughput with and without the verified token cache.
+
+Usage:
+
+    python -m benchmarks.authorize_benchmark [requests]
+
+A throwaway RSA keypair is generated for the run, so no real keys are needed.
+"""
+import os
+import sys
+import time
+
+from app.test.keys import generate_keypair, make_token
+
+PUBLIC_KEY, PRIVATE_KEY = generate_keypair(2048)
+os.environ['PUBLIC_KEY'] = ''.join(PUBLIC_KEY.strip().splitlines()[1:-1])
+os.environ.setdefault('AUDIENCE', 'api')
+
+from app import create_app, db  # noqa: E402
+from app.protected.model import ProtectedEntity  # noqa: E402
+from app.utils.authorize import init_authorize  # noqa: E402
+
+
+def run(app, token, requests):
+    client = app.test_client()
+    headers = {'X-API-Key': token}
+    response = client.get('/api/protected-entity/1', headers=headers)
+    assert response.status_code == 200, response.data
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/protected-entity/1', headers=headers)
+    return requests / (time.perf_counter() - start)
+
+
+def main(requests=500):
+    app, _ = create_app('test')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(ProtectedEntity(id=1, name='Benchmark', purpose='Benchmark'))
+        db.session.commit()
+    token = make_token(PRIVATE_KEY, audience=app.config['AUDIENCE'], expires_in=600)
+    results = {}
+    for name, cache_size in (('uncached', 0), ('cached', app.config['AUTH_CACHE_SIZE'])):
+        app.config['AUTH_CACHE_SIZE'] = cache_size
+        init_authorize(app)
+        results[name] = run(app, token, requests)
+        print(f'{name:>10}: {results[name]:8.1f} req/s')
+    print(f'{"speedup":>10}: {results["cached"] / results["uncached"]:8.2f}x')
+    with app.app_context():
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,48 @@
+"""
+Entity ingestion throughput with single item requests and with the bulk
+endpoint.
+
+Usage:
+
+    python -m benchmarks.bulk_benchmark [items]
+"""
+import sys
+import time
+
+from app import create_app, db
+
+
+def reset(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def single(client, items):
+    for item in items:
+        client.post('/api/entity/', json=item)
+
+
+def bulk(client, items):
+    response = client.post('/api/entity/bulk', json=items)
+    assert response.status_code == 200, response.data
+
+
+def main(items=2000):
+    app, _ = create_app('test')
+    client = app.test_client()
+    body = [dict(name=f'Entity {index}', purpose='Benchmark') for index in range(items)]
+    results = {}
+    for name, run in (('single', single), ('bulk', bulk)):
+        reset(app)
+        start = time.perf_counter()
+        run(client, body)
+        results[name] = items / (time.perf_counter() - start)
+        print(f'{name:>10}: {results[name]:10.1f} items/s')
+    print(f'{"speedup":>10}: {results["bulk"] / results["single"]:10.2f}x')
+    with app.app_context():
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
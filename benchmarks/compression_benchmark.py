@@ -0,0 +1,50 @@
+"""
+Bytes saved and CPU spent compressing list pages of different sizes.
+
+Usage:
+
+    python -m benchmarks.compression_benchmark [repetitions]
+
+The pages have the same envelope as a list response of `/api/entity/`.
+"""
+import json
+import sys
+import time
+
+from app.utils.compression import gzip_bytes
+
+PER_PAGE = (3, 20, 100, 1000, 10000)
+LEVELS = (1, 6, 9)
+
+
+def make_page(per_page):
+    items = [dict(
+        id=index,
+        name=f'Entity {index}',
+        purpose=f'Purpose of the entity number {index}',
+        camelCase='Something',
+    ) for index in range(1, per_page + 1)]
+    return json.dumps(dict(
+        items=items,
+        count=per_page,
+        current=f'http://localhost/api/entity/?page=1&per_page={per_page}',
+        next=f'http://localhost/api/entity/?page=2&per_page={per_page}',
+    )).encode('utf-8')
+
+
+def main(repetitions=20):
+    print(f'{"per_page":>8} {"level":>5} {"raw":>10} {"gzip":>10} {"saved":>7} {"ms/page":>8} {"MB/s":>7}')
+    for per_page in PER_PAGE:
+        body = make_page(per_page)
+        for level in LEVELS:
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                compressed = gzip_bytes(body, level)
+            elapsed = (time.perf_counter() - start) / repetitions
+            print(f'{per_page:>8} {level:>5} {len(body):>10} {len(compressed):>10} '
+                f'{1 - len(compressed) / len(body):>7.1%} {elapsed * 1000:>8.3f} '
+                f'{len(body) / elapsed / 1e6:>7.1f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,59 @@
+"""
+Python overhead of `BaseService.get_all`, with the database mocked out.
+
+Usage:
+
+    python -m benchmarks.get_all_benchmark [calls]
+
+The queries are built as usual, but they are never sent to the database, so
+the result only measures the per request work done by the service.
+"""
+import sys
+import time
+from unittest.mock import patch
+
+from flask import g
+from flask_sqlalchemy import BaseQuery, Pagination
+
+from app import create_app
+from app.entity.service import EntityService
+
+SCENARIOS = {
+    'page': dict(),
+    'ordered': dict(order_by='name', order_dir='desc'),
+    'filtered': dict(order_by='purpose,name', filters={'purpose__eq': 'thing', 'id__gt': '10'}),
+    'offset': dict(pagination='offset', order_by='name', fields='name,purpose'),
+    'cursor': dict(pagination='cursor', order_by='name'),
+}
+
+
+def paginate(query, page=None, per_page=None, error_out=True, max_per_page=None):
+    query.statement
+    return Pagination(query, page, per_page, 0, [])
+
+
+def all_rows(query):
+    query.statement
+    return []
+
+
+def run(app, params, calls):
+    with app.test_request_context('/api/entity/'):
+        for name, value in params.items():
+            setattr(g, name, value)
+        EntityService.get_all()
+        start = time.perf_counter()
+        for _ in range(calls):
+            EntityService.get_all()
+        return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(calls=5000):
+    app, _ = create_app('test')
+    with patch.object(BaseQuery, 'paginate', paginate), patch.object(BaseQuery, 'all', all_rows):
+        for name, params in SCENARIOS.items():
+            print(f'{name:>10}: {run(app, params, calls):8.1f} us/call')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
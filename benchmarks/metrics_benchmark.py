@@ -0,0 +1,46 @@
+"""
+Cost of recording the metrics of a request, with and without the file
+shared by the worker processes.
+
+Usage:
+
+    python -m benchmarks.metrics_benchmark [requests]
+
+Each recorded request has the same amount of series as a request to
+`/api/entity/`: a counter and four histograms.
+"""
+import sys
+import tempfile
+import time
+
+from app.utils.metrics import Metrics, RequestMetrics
+
+ROUTES = ('/api/entity/', '/api/entity/<int:id>', '/api/entity/bulk', '/api/protected-entity/')
+
+
+def measure(metrics, requests):
+    start = time.perf_counter()
+    for index in range(requests):
+        request_metrics = RequestMetrics(time.perf_counter())
+        request_metrics.queries = index % 3
+        request_metrics.status = 200
+        metrics.record_request('GET', ROUTES[index % len(ROUTES)], 200, request_metrics, time.perf_counter())
+    return (time.perf_counter() - start) / requests
+
+
+def main(requests=100000):
+    print(f'{"store":<28} {"us/request":>10}')
+    print(f'{"memory":<28} {measure(Metrics(), requests) * 1e6:10.2f}')
+    with tempfile.TemporaryDirectory() as directory:
+        metrics = Metrics(directory=directory)
+        print(f'{"file, flush every 1s":<28} {measure(metrics, requests) * 1e6:10.2f}')
+        start = time.perf_counter()
+        metrics.flush()
+        print(f'{"flush":<28} {(time.perf_counter() - start) * 1e6:10.2f}')
+        start = time.perf_counter()
+        metrics.render()
+        print(f'{"render":<28} {(time.perf_counter() - start) * 1e6:10.2f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
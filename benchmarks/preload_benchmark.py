@@ -0,0 +1,128 @@
+"""
+Startup time and memory of the `uwsgi` workers when each of them loads the
+app, and when the master loads it once before forking them, with and
+without `gc.freeze`.
+
+Usage:
+
+    python -m benchmarks.preload_benchmark [workers] [requests]
+
+Each mode runs on a new interpreter. Every worker serves `requests` list
+requests and runs a full collection, as it eventually does when serving,
+and then reports its unique memory: the pages it doesn't share with any
+other process (`Private_Clean` plus `Private_Dirty` of
+`/proc/self/smaps_rollup`, Linux only). The startup time goes from the
+start of the master until the slowest worker is ready to serve.
+"""
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('lazy', 'preload', 'preload_freeze')
+ROWS = 100
+
+
+def private_memory():
+    """Returns the unique memory of the process in bytes."""
+    total = 0
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def load(path):
+    # Imported here, so the master of the `lazy` mode doesn't load the app
+    from app import create_app
+    app, _ = create_app('test')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    return app
+
+
+def setup(path):
+    from app import db
+    from app.entity.model import Entity
+    app = load(path)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Entity(name=f'Entity {id}', purpose='Benchmark') for id in range(ROWS)])
+        db.session.commit()
+
+
+def worker(output, app, path, requests, start):
+    if app is None:
+        app = load(path)
+    else:
+        from app.utils.startup import after_fork
+        after_fork(app)
+    ready = time.monotonic() - start
+    client = app.test_client()
+    for _ in range(requests):
+        assert client.get('/api/entity/?per_page=20').status_code == 200
+    gc.collect()
+    os.write(output, json.dumps(dict(ready=ready, private=private_memory())).encode() + b'\n')
+    os._exit(0)
+
+
+def run_mode(mode, path, workers, requests):
+    start = time.monotonic()
+    app = None
+    if mode != 'lazy':
+        if mode == 'preload_freeze':
+            gc.disable()
+        app = load(path)
+        from app import db
+        from app.utils.startup import prepare_fork
+        if mode == 'preload_freeze':
+            prepare_fork(app)
+        else:
+            db.dispose_engines(app)
+    read, write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            worker(write, app, path, requests, start)
+        pids.append(pid)
+    os.close(write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read) as file:
+        results = [json.loads(line) for line in file]
+    return dict(
+        mode=mode,
+        startup=max(result['ready'] for result in results),
+        worker_private=statistics.mean(result['private'] for result in results),
+        master_private=private_memory(),
+    )
+
+
+def main(workers=5, requests=50):
+    print(f'{"mode":<16} {"startup ms":>11} {"worker MB":>10} {"total MB":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'preload.db')
+        subprocess.run([sys.executable, '-m', 'benchmarks.preload_benchmark', 'setup', path], check=True)
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.preload_benchmark', mode, path, str(workers), str(requests)],
+                stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            total = result['master_private'] + result['worker_private'] * workers
+            print(f'{mode:<16} {result["startup"] * 1000:11.1f} {result["worker_private"] / 2 ** 20:10.1f} '
+                f'{total / 2 ** 20:9.1f}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'setup':
+        setup(sys.argv[2])
+    elif len(sys.argv) > 1 and sys.argv[1] in MODES:
+        print(json.dumps(run_mode(sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))))
+    else:
+        main(*map(int, sys.argv[1:3]))
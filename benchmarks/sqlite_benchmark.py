@@ -0,0 +1,110 @@
+"""
+Mixed read/write throughput on a SQLite file, with the default engine
+settings and with the ones of `ProductionConfig`.
+
+Usage:
+
+    python -m benchmarks.sqlite_benchmark [seconds] [processes] [threads]
+
+Like `uwsgi`, several processes with a few threads each run the requests.
+Each request opens an app context, runs a query and tears the session down.
+One request out of five is a write.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.config import ProductionConfig
+from app.entity.model import Entity
+
+ROWS = 1000
+WRITE_RATIO = 0.2
+SCENARIOS = {
+    'default': dict(SQLALCHEMY_ENGINE_OPTIONS={}, SQLITE_PRAGMAS={}),
+    'tuned': dict(
+        SQLALCHEMY_ENGINE_OPTIONS=ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        SQLITE_PRAGMAS=ProductionConfig.SQLITE_PRAGMAS,
+    ),
+}
+
+
+def make_app(path, config):
+    app, _ = create_app('test')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config.update(config)
+    return app
+
+
+def seed(path, config):
+    app = make_app(path, config)
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(Entity, [
+            dict(id=id, name=f'Entity {id}', purpose='Benchmark') for id in range(1, ROWS + 1)])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def work(app, deadline, counts):
+    reads = writes = errors = 0
+    while time.monotonic() < deadline:
+        id = random.randint(1, ROWS)
+        with app.app_context():
+            try:
+                if random.random() < WRITE_RATIO:
+                    Entity.query.filter(Entity.id == id).update(dict(name=f'Entity {id} {time.time()}'))
+                    db.session.commit()
+                    writes += 1
+                else:
+                    Entity.query.filter(Entity.id >= id).order_by(Entity.id).limit(20).all()
+                    reads += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    counts.append((reads, writes, errors))
+
+
+def process(path, config, seconds, threads, queue):
+    app = make_app(path, config)
+    deadline = time.monotonic() + seconds
+    counts = []
+    workers = [threading.Thread(target=work, args=(app, deadline, counts)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(tuple(map(sum, zip(*counts))))
+
+
+def run(config, seconds, processes, threads):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'benchmark.db')
+    seed(path, config)
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=process, args=(path, config, seconds, threads, queue))
+        for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    results = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    reads, writes, errors = map(sum, zip(*results))
+    return reads / seconds, writes / seconds, errors
+
+
+def main(seconds=5, processes=5, threads=2):
+    print(f'{processes} processes x {threads} threads, {seconds}s each')
+    for name, config in SCENARIOS.items():
+        reads, writes, errors = run(config, seconds, processes, threads)
+        print(f'{name:>8}: {reads:8.1f} reads/s {writes:8.1f} writes/s {errors:5d} errors')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,232 @@
+"""
+Latency of the CRUD hot paths of the real app, over SQLite databases of
+different sizes.
+
+Usage:
+
+    python -m benchmarks.suite run [--sizes 1000,100000,1000000] [--requests 100]
+        [--output results.json] [--data-dir DIR]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.1]
+
+`run` seeds one database of `Entity` rows per size, kept in `--data-dir` so
+later runs reuse it, and sends every scenario through the WSGI test client
+to a copy of it. Reads are measured with the response caches cleared before
+each request, so they always reach the database. Protected scenarios use a
+throwaway RSA keypair.
+
+`compare` prints the change of the median latency of each scenario, and exits
+with status 1 if any of them is slower than the baseline by more than the
+`--threshold` ratio.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from app.test.keys import generate_keypair, make_token
+
+PUBLIC_KEY, PRIVATE_KEY = generate_keypair(2048)
+os.environ['PUBLIC_KEY'] = ''.join(PUBLIC_KEY.strip().splitlines()[1:-1])
+os.environ.setdefault('AUDIENCE', 'api')
+
+from app import create_app, db  # noqa: E402
+from app.entity.model import Entity  # noqa: E402
+from app.protected.model import ProtectedEntity  # noqa: E402
+from app.utils.cache import clear_caches  # noqa: E402
+
+SIZES = (1000, 100000, 1000000)
+ORDER_BY = ('id', 'name', 'purpose', 'snake_case')
+PER_PAGE = 20
+SEED_CHUNK_SIZE = 10000
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliett')
+
+
+def make_rows(start, stop, rng):
+    return [dict(
+        id=id,
+        name=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {id}',
+        purpose=f'purpose {id % 100}',
+        snake_case=rng.choice(WORDS),
+        version=1,
+        updated_at=datetime(2019, 1, 1),
+    ) for id in range(start, stop)]
+
+
+def seed(app, path, size):
+    """Creates the database of `size` rows at `path`, unless it exists."""
+    if os.path.exists(path):
+        return
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}.tmp'
+    rng = random.Random(size)
+    with app.app_context():
+        db.create_all()
+        for start in range(1, size + 1, SEED_CHUNK_SIZE):
+            db.session.execute(Entity.__table__.insert(), make_rows(start, min(start + SEED_CHUNK_SIZE, size + 1), rng))
+        db.session.add(ProtectedEntity(id=1, name='Benchmark', purpose='Benchmark'))
+        db.session.commit()
+        db.session.remove()
+        db.get_engine(app).dispose()
+    os.replace(f'{path}.tmp', path)
+
+
+def scenarios(size, token):
+    """Returns the scenarios of a database of `size` rows, as tuples of
+    name, whether the caches are cleared before each request, and a
+    function that receives the request index and returns the `method`,
+    `url` and keyword arguments of the request."""
+    rng = random.Random(0)
+    last_page = max(size // PER_PAGE, 1)
+    protected = {'X-API-Key': token}
+    body = dict(name='Benchmark', purpose='Benchmark purpose', camelCase='benchmark')
+    result = []
+    for column in ORDER_BY:
+        result.append((f'list_shallow_{column}', True,
+            lambda index, column=column: ('GET', f'/api/entity/?order_by={column}&per_page={PER_PAGE}', {})))
+        result.append((f'list_deep_{column}', True, lambda index, column=column: (
+            'GET', f'/api/entity/?order_by={column}&per_page={PER_PAGE}&page={last_page}', {})))
+    result += [
+        ('list_cached', False, lambda index: ('GET', f'/api/entity/?per_page={PER_PAGE}', {})),
+        ('get_by_id', True, lambda index: ('GET', f'/api/entity/{rng.randint(1, size)}', {})),
+        ('create', False, lambda index: ('POST', '/api/entity/', dict(json=body))),
+        ('update', False, lambda index: ('PUT', f'/api/entity/{rng.randint(1, size)}', dict(json=body))),
+        # Deletes from the end, so each request removes an existing row
+        ('delete', False, lambda index: ('DELETE', f'/api/entity/{size - index}', {})),
+        ('protected_get_by_id', True, lambda index: ('GET', '/api/protected-entity/1', dict(headers=protected))),
+        ('protected_list', True, lambda index: ('GET', '/api/protected-entity/', dict(headers=protected))),
+    ]
+    return result
+
+
+def measure(client, requests, clear, make_request):
+    """Sends `requests` requests and returns their latency statistics in
+    milliseconds."""
+    latencies = []
+    # The controllers print some request bodies
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for index in range(requests):
+            method, url, kwargs = make_request(index)
+            if clear:
+                clear_caches()
+            start = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code < 400, (method, url, response.status_code, response.data)
+    latencies.sort()
+    return dict(
+        requests=requests,
+        mean_ms=round(statistics.mean(latencies), 4),
+        p50_ms=round(statistics.median(latencies), 4),
+        p95_ms=round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 4),
+        rps=round(1000 / statistics.mean(latencies), 2),
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, requests, output, data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    app, _ = create_app('test')
+    token = make_token(PRIVATE_KEY, audience=app.config['AUDIENCE'], expires_in=3600)
+    results = dict(
+        created_at=datetime.utcnow().isoformat(),
+        commit=git_commit(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        requests=requests,
+        results={},
+    )
+    for size in sizes:
+        seeded = os.path.join(data_dir, f'entity-{size}.db')
+        print(f'Seeding {size} rows...', flush=True)
+        seed(create_app('test')[0], seeded, size)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.db')
+            shutil.copyfile(seeded, path)
+            app, _ = create_app('test')
+            app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+            client = app.test_client()
+            results['results'][str(size)] = measured = {}
+            for name, clear, make_request in scenarios(size, token):
+                measured[name] = measure(client, requests, clear, make_request)
+                print(f'{size:>8} {name:<24} p50 {measured[name]["p50_ms"]:9.3f} ms  '
+                    f'p95 {measured[name]["p95_ms"]:9.3f} ms', flush=True)
+            with app.app_context():
+                db.session.remove()
+                db.get_engine(app).dispose()
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    print(f'Results written to {output}')
+
+
+def compare(baseline, current, threshold):
+    """Prints the change of the median latency of each scenario.
+
+    Returns:
+        The list of `(size, scenario)` slower than `baseline` by more than
+        `threshold`.
+    """
+    regressions = []
+    print(f'{"size":>8} {"scenario":<24} {"baseline":>10} {"current":>10} {"change":>8}')
+    for size, scenarios_results in sorted(current['results'].items(), key=lambda item: int(item[0])):
+        for name, result in sorted(scenarios_results.items()):
+            before = baseline['results'].get(size, {}).get(name)
+            if before is None:
+                print(f'{size:>8} {name:<24} {"-":>10} {result["p50_ms"]:10.3f}      new')
+                continue
+            change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+            flag = '  REGRESSION' if change > threshold else ''
+            if flag:
+                regressions.append((size, name))
+            print(f'{size:>8} {name:<24} {before["p50_ms"]:10.3f} {result["p50_ms"]:10.3f} {change:+8.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help='Run the benchmarks.')
+    run_parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='Comma separated row counts.')
+    run_parser.add_argument('--requests', type=int, default=100, help='Requests per scenario.')
+    run_parser.add_argument('--output', default='benchmark-results.json')
+    run_parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'flask-blueprint-benchmarks'),
+        help='Directory of the seeded databases, reused between runs.')
+    compare_parser = commands.add_parser('compare', help='Compare two results files.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+        help='Allowed slowdown of the median latency, as a ratio.')
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run([int(size) for size in args.sizes.split(',')], args.requests, args.output, args.data_dir)
+    elif args.command == 'compare':
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        with open(args.current) as file:
+            current = json.load(file)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regressions beyond {args.threshold:.0%}')
+            return 1
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""add keyset pagination indexes
+
+Revision ID: 5b2f9a1c7d3e
+Revises: 44ce70d8983e
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2f9a1c7d3e'
+down_revision = '44ce70d8983e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_entity_name_id', 'entity', ['name', 'id'])
+    op.create_index('ix_entity_purpose_id', 'entity', ['purpose', 'id'])
+    op.create_index('ix_entity_snake_case_id', 'entity', ['snake_case', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_entity_snake_case_id', 'entity')
+    op.drop_index('ix_entity_purpose_id', 'entity')
+    op.drop_index('ix_entity_name_id', 'entity')
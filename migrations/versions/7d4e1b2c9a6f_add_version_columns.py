@@ -0,0 +1,27 @@
+"""add version columns
+
+Revision ID: 7d4e1b2c9a6f
+Revises: 5b2f9a1c7d3e
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4e1b2c9a6f'
+down_revision = '5b2f9a1c7d3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('entity', sa.Column('version', sa.Integer, nullable=False, server_default='1'))
+    op.add_column('entity', sa.Column('updated_at', sa.DateTime, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('entity') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
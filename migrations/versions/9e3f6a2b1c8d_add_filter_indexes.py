@@ -0,0 +1,27 @@
+"""add filter indexes
+
+Revision ID: 9e3f6a2b1c8d
+Revises: 7d4e1b2c9a6f
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3f6a2b1c8d'
+down_revision = '7d4e1b2c9a6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The single column filters of the default allow-list are backed by the
+    # keyset pagination indexes. This one backs `purpose` filters ordered by
+    # `name`, and the `order_by=purpose,name` ordering.
+    op.create_index('ix_entity_purpose_name_id', 'entity', ['purpose', 'name', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_entity_purpose_name_id', 'entity')
@@ -1,11 +1,30 @@
+import gc
 import os
 
-from app import create_app
-from alembic.config import Config
-from alembic import command
+try:
+    import uwsgi
+except ImportError:
+    # Imported outside of `uwsgi`
+    uwsgi = None
 
-alembic_cfg = Config("./alembic.ini")
-alembic_cfg.set_main_option('sqlalchemy.url', os.environ['DATABASE_URI'])
-command.upgrade(alembic_cfg, "head")
+if uwsgi is not None:
+    # The master loads the app once and `uwsgi` forks the workers from it.
+    # Without collections while loading, the objects of the app aren't
+    # written to, and the workers share their memory pages.
+    gc.disable()
+
+from app import create_app  # noqa: E402
+from app.utils.startup import after_fork, prepare_fork, run_migrations  # noqa: E402
+
+# Runs once, on the master, before the workers are forked
+run_migrations(os.environ['DATABASE_URI'], lock_path=os.environ.get('MIGRATIONS_LOCK', '/tmp/flask-migrations.lock'))
 
 (app, _) = create_app("prod")
+# Metrics of the previous run, before `uwsgi` forks the workers
+app.extensions['metrics'].clear()
+
+if uwsgi is not None:
+    from uwsgidecorators import postfork
+
+    prepare_fork(app)
+    postfork(lambda: after_fork(app))